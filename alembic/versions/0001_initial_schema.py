@@ -0,0 +1,162 @@
+"""initial schema
+
+Matches the tables previously created by Base.metadata.create_all.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0001"
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "users",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("username", sa.String(), nullable=False),
+        sa.Column("email", sa.String(), nullable=False),
+        sa.Column("password_hash", sa.String(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.Column("mfa_enabled", sa.Boolean(), nullable=False),
+        sa.Column("totp_secret", sa.String(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("email"),
+        sa.UniqueConstraint("username"),
+    )
+    op.create_index("ix_users_id", "users", ["id"])
+
+    op.create_table(
+        "personas",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=True),
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("category", sa.String(), nullable=False),
+        sa.Column("description", sa.String(), nullable=True),
+        sa.Column("is_public", sa.Boolean(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_personas_id", "personas", ["id"])
+
+    op.create_table(
+        "persona_profiles",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("persona_id", sa.Integer(), nullable=True),
+        sa.Column("display_name", sa.String(), nullable=True),
+        sa.Column("avatar_url", sa.String(), nullable=True),
+        sa.Column("bio", sa.String(), nullable=True),
+        sa.ForeignKeyConstraint(["persona_id"], ["personas.id"]),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("persona_id"),
+    )
+    op.create_index("ix_persona_profiles_id", "persona_profiles", ["id"])
+
+    op.create_table(
+        "category_messages",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("category", sa.String(), nullable=False),
+        sa.Column("sender_persona_id", sa.Integer(), nullable=False),
+        sa.Column("content", sa.String(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(["sender_persona_id"], ["personas.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_category_messages_id", "category_messages", ["id"])
+
+    op.create_table(
+        "dm_threads",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("persona_a_id", sa.Integer(), nullable=False),
+        sa.Column("persona_b_id", sa.Integer(), nullable=False),
+        sa.Column("category", sa.String(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(["persona_a_id"], ["personas.id"]),
+        sa.ForeignKeyConstraint(["persona_b_id"], ["personas.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_dm_threads_id", "dm_threads", ["id"])
+
+    op.create_table(
+        "dm_messages",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("thread_id", sa.Integer(), nullable=False),
+        sa.Column("sender_persona_id", sa.Integer(), nullable=False),
+        sa.Column("content", sa.String(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(["sender_persona_id"], ["personas.id"]),
+        sa.ForeignKeyConstraint(["thread_id"], ["dm_threads.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_dm_messages_id", "dm_messages", ["id"])
+
+    op.create_table(
+        "external_identities",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("persona_id", sa.Integer(), nullable=False),
+        sa.Column("provider", sa.String(), nullable=False),
+        sa.Column("provider_user_id", sa.String(), nullable=False),
+        sa.Column("email", sa.String(), nullable=True),
+        sa.Column("name", sa.String(), nullable=True),
+        sa.Column("picture", sa.String(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(["persona_id"], ["personas.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_external_identities_id", "external_identities", ["id"])
+
+    op.create_table(
+        "persona_follows",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("follower_persona_id", sa.Integer(), nullable=False),
+        sa.Column("following_persona_id", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(["follower_persona_id"], ["personas.id"]),
+        sa.ForeignKeyConstraint(["following_persona_id"], ["personas.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_persona_follows_id", "persona_follows", ["id"])
+
+    op.create_table(
+        "notifications",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("type", sa.String(), nullable=False),
+        sa.Column("title", sa.String(), nullable=False),
+        sa.Column("message", sa.String(), nullable=True),
+        sa.Column("link", sa.String(), nullable=True),
+        sa.Column("is_read", sa.Boolean(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_notifications_id", "notifications", ["id"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in (
+        "notifications",
+        "persona_follows",
+        "external_identities",
+        "dm_messages",
+        "dm_threads",
+        "category_messages",
+        "persona_profiles",
+        "personas",
+        "users",
+    ):
+        op.drop_index(f"ix_{table}_id", table_name=table)
+        op.drop_table(table)
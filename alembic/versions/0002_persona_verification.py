@@ -0,0 +1,59 @@
+"""persona verification columns
+
+Adds the denormalized Persona.is_verified / verified_providers columns and
+fills them from external_identities. Databases that create_all() built from
+the models after the columns were added, but before this migration history
+existed, are stamped at 0001 with the columns already present; they are
+left in place and only refilled.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17 09:10:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0002"
+down_revision: Union[str, Sequence[str], None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Mirrors security.verification.PROVIDER_FLAGS at the time of this revision
+PROVIDER_FLAGS = {"google": 1, "steam": 2}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    existing = {c["name"] for c in sa.inspect(op.get_bind()).get_columns("personas")}
+    if "is_verified" not in existing:
+        with op.batch_alter_table("personas") as batch_op:
+            batch_op.add_column(
+                sa.Column("is_verified", sa.Boolean(), nullable=False, server_default=sa.false())
+            )
+            batch_op.add_column(
+                sa.Column("verified_providers", sa.Integer(), nullable=False, server_default="0")
+            )
+    op.execute("UPDATE personas SET is_verified = 0, verified_providers = 0")
+
+    op.execute(
+        "UPDATE personas SET is_verified = 1 WHERE EXISTS ("
+        "SELECT 1 FROM external_identities ei WHERE ei.persona_id = personas.id)"
+    )
+    for provider, flag in PROVIDER_FLAGS.items():
+        op.execute(
+            f"UPDATE personas SET verified_providers = verified_providers + {flag} "
+            "WHERE EXISTS (SELECT 1 FROM external_identities ei "
+            f"WHERE ei.persona_id = personas.id AND ei.provider = '{provider}')"
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table("personas") as batch_op:
+        batch_op.drop_column("verified_providers")
+        batch_op.drop_column("is_verified")
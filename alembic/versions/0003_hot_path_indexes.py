@@ -0,0 +1,130 @@
+"""hot path indexes
+
+Composite indexes for the chat history, inbox, notification, follow,
+identity and persona directory queries.
+
+Duplicate external identities linked to the same persona are dropped
+before the unique index is built; duplicates linked to different personas
+stop the upgrade, since picking one would silently unlink an account.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17 09:20:00.000000
+
+"""
+import logging
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0003"
+down_revision: Union[str, Sequence[str], None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+logger = logging.getLogger("alembic.runtime.migration")
+
+# Mirrors security.verification.PROVIDER_FLAGS at the time of this revision
+PROVIDER_FLAGS = {"google": 1, "steam": 2}
+
+
+def _dedupe_external_identities() -> None:
+    bind = op.get_bind()
+
+    conflicts = bind.execute(sa.text(
+        "SELECT provider, provider_user_id FROM external_identities "
+        "GROUP BY provider, provider_user_id "
+        "HAVING COUNT(DISTINCT persona_id) > 1"
+    )).all()
+    if conflicts:
+        listed = ", ".join(f"{provider}:{user_id}" for provider, user_id in conflicts[:10])
+        raise RuntimeError(
+            f"{len(conflicts)} external identities are linked to more than one persona "
+            f"({listed}); unlink the extra rows before upgrading"
+        )
+
+    duplicates = bind.execute(sa.text(
+        "DELETE FROM external_identities WHERE id NOT IN ("
+        "SELECT MIN(id) FROM external_identities "
+        "GROUP BY provider, provider_user_id)"
+    )).rowcount
+    if not duplicates:
+        return
+    logger.warning("Removed %d duplicate external identity rows", duplicates)
+
+    # 0002 filled the verification columns from the rows just removed
+    op.execute(
+        "UPDATE personas SET is_verified = EXISTS ("
+        "SELECT 1 FROM external_identities ei WHERE ei.persona_id = personas.id), "
+        "verified_providers = 0"
+    )
+    for provider, flag in PROVIDER_FLAGS.items():
+        op.execute(
+            f"UPDATE personas SET verified_providers = verified_providers + {flag} "
+            "WHERE EXISTS (SELECT 1 FROM external_identities ei "
+            f"WHERE ei.persona_id = personas.id AND ei.provider = '{provider}')"
+        )
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index("ix_category_messages_category_id", "category_messages", ["category", "id"])
+    op.create_index("ix_dm_messages_thread_id_id", "dm_messages", ["thread_id", "id"])
+    op.create_index("ix_notifications_user_id_id", "notifications", ["user_id", "id"])
+
+    # Drop duplicate follow rows before enforcing uniqueness
+    op.execute(
+        "DELETE FROM persona_follows WHERE id NOT IN ("
+        "SELECT MIN(id) FROM persona_follows "
+        "GROUP BY follower_persona_id, following_persona_id)"
+    )
+    op.create_index(
+        "uq_persona_follows_pair",
+        "persona_follows",
+        ["follower_persona_id", "following_persona_id"],
+        unique=True,
+    )
+    op.create_index(
+        "ix_persona_follows_following",
+        "persona_follows",
+        ["following_persona_id", "follower_persona_id"],
+    )
+
+    op.create_index(
+        "ix_dm_threads_pair_category",
+        "dm_threads",
+        ["persona_a_id", "persona_b_id", "category"],
+    )
+    op.create_index("ix_dm_threads_persona_b_id", "dm_threads", ["persona_b_id"])
+
+    op.create_index("ix_external_identities_persona_id", "external_identities", ["persona_id"])
+    _dedupe_external_identities()
+    op.create_index(
+        "uq_external_identities_provider_user",
+        "external_identities",
+        ["provider", "provider_user_id"],
+        unique=True,
+    )
+
+    op.create_index(
+        "ix_personas_category_public_name",
+        "personas",
+        ["category", "is_public", "name"],
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_personas_category_public_name", table_name="personas")
+    op.drop_index("uq_external_identities_provider_user", table_name="external_identities")
+    op.drop_index("ix_external_identities_persona_id", table_name="external_identities")
+    op.drop_index("ix_dm_threads_persona_b_id", table_name="dm_threads")
+    op.drop_index("ix_dm_threads_pair_category", table_name="dm_threads")
+    op.drop_index("ix_persona_follows_following", table_name="persona_follows")
+    op.drop_index("uq_persona_follows_pair", table_name="persona_follows")
+    op.drop_index("ix_notifications_user_id_id", table_name="notifications")
+    op.drop_index("ix_dm_messages_thread_id_id", table_name="dm_messages")
+    op.drop_index("ix_category_messages_category_id", table_name="category_messages")
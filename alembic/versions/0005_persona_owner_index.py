@@ -0,0 +1,30 @@
+"""persona owner index
+
+Looks up a user's personas without scanning the table; the DM inbox query
+resolves "my personas" through it.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17 10:40:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0005"
+down_revision: Union[str, Sequence[str], None] = "0004"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index("ix_personas_user_id", "personas", ["user_id"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_personas_user_id", table_name="personas")
@@ -0,0 +1,35 @@
+"""notification item count
+
+Lets one unread notification stand for several coalesced events
+("5 new messages from X").
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-17 11:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0006"
+down_revision: Union[str, Sequence[str], None] = "0005"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table("notifications") as batch_op:
+        batch_op.add_column(
+            sa.Column("item_count", sa.Integer(), nullable=False, server_default="1")
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table("notifications") as batch_op:
+        batch_op.drop_column("item_count")
@@ -0,0 +1,56 @@
+"""persona follow counts
+
+Denormalized follower / following / mutual counts on personas, filled in
+from persona_follows.
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-17 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0008"
+down_revision: Union[str, Sequence[str], None] = "0007"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+COUNT_COLUMNS = ("follower_count", "following_count", "mutual_count")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table("personas") as batch_op:
+        for column in COUNT_COLUMNS:
+            batch_op.add_column(sa.Column(column, sa.Integer(), nullable=False, server_default="0"))
+
+    op.execute("""
+        UPDATE personas SET
+            follower_count = (
+                SELECT COUNT(*) FROM persona_follows f
+                WHERE f.following_persona_id = personas.id
+            ),
+            following_count = (
+                SELECT COUNT(*) FROM persona_follows f
+                WHERE f.follower_persona_id = personas.id
+            ),
+            mutual_count = (
+                SELECT COUNT(*) FROM persona_follows f
+                JOIN persona_follows r
+                  ON r.follower_persona_id = f.following_persona_id
+                 AND r.following_persona_id = f.follower_persona_id
+                WHERE f.follower_persona_id = personas.id
+            )
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table("personas") as batch_op:
+        for column in COUNT_COLUMNS:
+            batch_op.drop_column(column)
@@ -1,14 +1,183 @@
-from sqlalchemy import create_engine
+import os
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process lock, migrate as a deploy step
+    fcntl = None
+
+from sqlalchemy import create_engine, event, inspect
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
+from starlette.requests import Request
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+DATABASE_URL = os.environ.get("DATABASE_URL", "sqlite:///./identity.db")
+
+# Optional replica for read-only routes. When unset, a file-backed SQLite
+# primary is reopened read-only (mode=ro); anything else reads the primary.
+READ_DATABASE_URL = os.environ.get("READ_DATABASE_URL")
+
+# How long after a write a browser session keeps reading from the primary
+READ_YOUR_WRITES_SECONDS = float(os.environ.get("READ_YOUR_WRITES_SECONDS", "5"))
+
+# Async drivers used when ASYNC_DATABASE_URL is not set explicitly
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "mysql": "mysql+aiomysql",
+}
+
+# Connection pool sizing (all drivers)
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = int(os.environ.get("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.environ.get("DB_POOL_RECYCLE", "1800"))
+
+# Compiled-statement caches: SQLAlchemy's per-engine cache and pysqlite's
+# per-connection prepared statement cache
+DB_QUERY_CACHE_SIZE = int(os.environ.get("DB_QUERY_CACHE_SIZE", "1000"))
+DB_STATEMENT_CACHE_SIZE = int(os.environ.get("DB_STATEMENT_CACHE_SIZE", "256"))
+
+# SQLite connection pragmas
+SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_CACHE_SIZE_KIB = int(os.environ.get("SQLITE_CACHE_SIZE_KIB", "65536"))
+SQLITE_MMAP_SIZE = int(os.environ.get("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+
+# Revision matching the schema that Base.metadata.create_all used to produce
+BASELINE_REVISION = "0001"
+
+# Whether importing main upgrades the schema. Deploys that run
+# ``alembic upgrade head`` first can turn it off; otherwise workers starting
+# together take MIGRATION_LOCK_PATH in turn.
+MIGRATE_ON_STARTUP = os.environ.get("MIGRATE_ON_STARTUP", "1") == "1"
+MIGRATION_LOCK_PATH = os.environ.get("MIGRATION_LOCK_PATH", os.path.join(BASE_DIR, ".migrate.lock"))
+
+
+def _is_memory_sqlite(url) -> bool:
+    return url.database in (None, "", ":memory:") or "mode=memory" in str(url)
+
+
+def _is_readonly_sqlite(url) -> bool:
+    return url.query.get("mode") == "ro"
+
+
+def apply_sqlite_pragmas(dbapi_connection, connection_record=None, readonly=False):
+    cursor = dbapi_connection.cursor()
+    try:
+        if readonly:
+            cursor.execute("PRAGMA query_only=ON")
+        else:
+            # WAL lets readers keep going while a writer commits; NORMAL only
+            # fsyncs at checkpoints, which is safe under WAL
+            cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        cursor.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KIB}")
+        cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+    finally:
+        cursor.close()
+
+
+def apply_sqlite_read_pragmas(dbapi_connection, connection_record=None):
+    apply_sqlite_pragmas(dbapi_connection, connection_record, readonly=True)
+
+
+def _engine_options(sa_url, overrides: dict) -> dict:
+    options = {"query_cache_size": DB_QUERY_CACHE_SIZE}
+    sized_pool = "poolclass" not in overrides
+
+    if sa_url.get_backend_name() == "sqlite":
+        options["connect_args"] = {
+            "check_same_thread": False,
+            "cached_statements": DB_STATEMENT_CACHE_SIZE,
+            "timeout": SQLITE_BUSY_TIMEOUT_MS / 1000,
+        }
+        sized_pool = sized_pool and not _is_memory_sqlite(sa_url)
+    else:
+        options.update(pool_recycle=DB_POOL_RECYCLE, pool_pre_ping=True)
+
+    if sized_pool:
+        options.update(
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+        )
+
+    options.update(overrides)
+    return options
+
+
+def build_engine(url: str, **overrides):
+    """Create an engine using the production profile for the URL's backend."""
+    sa_url = make_url(url)
+    new_engine = create_engine(url, **_engine_options(sa_url, overrides))
+
+    if sa_url.get_backend_name() == "sqlite":
+        pragmas = apply_sqlite_read_pragmas if _is_readonly_sqlite(sa_url) else apply_sqlite_pragmas
+        event.listen(new_engine, "connect", pragmas)
+    return new_engine
+
+
+def read_url_for(primary_url: str, read_url: str | None = None) -> str | None:
+    """URL for the read-only engine, or None to read from the primary."""
+    if read_url:
+        return read_url
 
-DATABASE_URL = "sqlite:///./identity.db"
+    sa_url = make_url(primary_url)
+    if sa_url.get_backend_name() != "sqlite" or _is_memory_sqlite(sa_url):
+        return None
 
-engine = create_engine(
-    DATABASE_URL, connect_args={"check_same_thread": False}
-)
+    return f"sqlite:///file:{sa_url.database}?mode=ro&uri=true"
+
+
+def async_url_for(url: str) -> str:
+    sa_url = make_url(url)
+    if sa_url.drivername in ASYNC_DRIVERS.values():
+        return url
+
+    driver = ASYNC_DRIVERS.get(sa_url.get_backend_name())
+    if driver is None:
+        raise ValueError(f"No async driver configured for {sa_url.drivername!r}")
+    return sa_url.set(drivername=driver).render_as_string(hide_password=False)
+
+
+def build_async_engine(url: str, **overrides):
+    """Async counterpart of build_engine, sharing the same profile."""
+    sa_url = make_url(url)
+    options = _engine_options(sa_url, overrides)
+    if sa_url.get_backend_name() == "sqlite":
+        # aiosqlite runs each connection on its own thread already
+        options["connect_args"].pop("check_same_thread", None)
+
+    new_engine = create_async_engine(url, **options)
+
+    if sa_url.get_backend_name() == "sqlite":
+        event.listen(new_engine.sync_engine, "connect", apply_sqlite_pragmas)
+    return new_engine
+
+
+engine = build_engine(DATABASE_URL)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+_read_url = read_url_for(DATABASE_URL, READ_DATABASE_URL)
+read_engine = build_engine(_read_url) if _read_url else engine
+
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+
+ASYNC_DATABASE_URL = os.environ.get("ASYNC_DATABASE_URL") or async_url_for(DATABASE_URL)
+
+async_engine = build_async_engine(ASYNC_DATABASE_URL)
+
+# expire_on_commit=False: websocket handlers keep using loaded rows after
+# committing, and async sessions cannot lazy-load expired attributes
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 Base = declarative_base()
 
 def get_db():
@@ -17,3 +186,68 @@ def get_db():
         yield db
     finally:
         db.close()
+
+def mark_write(request):
+    """Pin this browser session to the primary for READ_YOUR_WRITES_SECONDS."""
+    session = request.scope.get("session")
+    if session is not None:
+        session["last_write_at"] = time.time()
+
+def recently_wrote(request) -> bool:
+    session = request.scope.get("session") or {}
+    last_write_at = session.get("last_write_at")
+    return last_write_at is not None and time.time() - last_write_at < READ_YOUR_WRITES_SECONDS
+
+def get_read_db(request: Request):
+    """Session for read-only routes; falls back to the primary right after a write."""
+    factory = SessionLocal if recently_wrote(request) else ReadSessionLocal
+    db = factory()
+    try:
+        yield db
+    finally:
+        db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+def alembic_config():
+    from alembic.config import Config
+
+    # No ini file here: alembic.ini's logging setup is only for the CLI
+    config = Config()
+    config.set_main_option("script_location", os.path.join(BASE_DIR, "alembic"))
+    return config
+
+@contextmanager
+def _migration_lock():
+    if fcntl is None:
+        yield
+        return
+    with open(MIGRATION_LOCK_PATH, "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+def run_migrations(bind=None):
+    """Upgrade the database to the latest Alembic revision.
+
+    Databases created before migrations existed (tables present, no
+    alembic_version) are stamped at the baseline revision first. Processes
+    on one host migrate one at a time; the rest find the schema current.
+    """
+    from alembic import command
+
+    bind = bind if bind is not None else engine
+    config = alembic_config()
+
+    with _migration_lock(), bind.begin() as connection:
+        config.attributes["connection"] = connection
+
+        tables = inspect(connection).get_table_names()
+        if "users" in tables and "alembic_version" not in tables:
+            command.stamp(config, BASELINE_REVISION)
+
+        command.upgrade(config, "head")
@@ -0,0 +1,30 @@
+"""Conditional GET support for the JSON API.
+
+Endpoints build their ETag from a cheap query over the keys and version
+columns of exactly the rows they would return. A request whose
+If-None-Match already holds that tag is answered 304 before the full
+query and serialization run.
+"""
+import hashlib
+import json
+
+from fastapi import Request, Response
+
+
+def compute_etag(*parts) -> str:
+    raw = json.dumps(parts, separators=(",", ":"), default=str).encode()
+    return '"' + hashlib.sha1(raw).hexdigest() + '"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # If-None-Match uses the weak comparison
+    return etag in (tag.strip().removeprefix("W/") for tag in header.split(","))
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag})
@@ -0,0 +1,163 @@
+"""Follow-graph queries over persona_follows, and the counters derived from it.
+
+The *_query helpers return an unordered Persona query so callers can
+filter, page it with pagination.keyset_page() over PERSONA_ORDER and count
+it with count_rows(). Follows are only created and removed through
+add_follow() and remove_follow(), which keep Persona.follower_count,
+following_count and mutual_count in step inside the caller's transaction;
+repair_follow_counts() recomputes them from scratch.
+"""
+from sqlalchemy import and_, func
+from sqlalchemy.orm import Session, aliased
+
+import models
+
+# Keyset order for persona lists; id makes (name, id) unique
+PERSONA_ORDER = (models.Persona.name, models.Persona.id)
+
+
+def following_query(db: Session, persona_id: int):
+    return (
+        db.query(models.Persona)
+        .join(models.PersonaFollow, models.PersonaFollow.following_persona_id == models.Persona.id)
+        .filter(models.PersonaFollow.follower_persona_id == persona_id)
+    )
+
+
+def followers_query(db: Session, persona_id: int):
+    return (
+        db.query(models.Persona)
+        .join(models.PersonaFollow, models.PersonaFollow.follower_persona_id == models.Persona.id)
+        .filter(models.PersonaFollow.following_persona_id == persona_id)
+    )
+
+
+def mutuals_query(db: Session, persona_id: int):
+    """Personas that ``persona_id`` follows and that follow it back.
+
+    A self-join on persona_follows: each outgoing follow is matched with
+    its reverse through the unique (follower, following) pair index.
+    """
+    outgoing = aliased(models.PersonaFollow)
+    reverse = aliased(models.PersonaFollow)
+
+    return (
+        db.query(models.Persona)
+        .join(outgoing, outgoing.following_persona_id == models.Persona.id)
+        .join(reverse, and_(
+            reverse.follower_persona_id == outgoing.following_persona_id,
+            reverse.following_persona_id == outgoing.follower_persona_id,
+        ))
+        .filter(outgoing.follower_persona_id == persona_id)
+    )
+
+
+def _follow_exists(db: Session, follower_id: int, following_id: int) -> bool:
+    return (
+        db.query(models.PersonaFollow.id)
+        .filter(models.PersonaFollow.follower_persona_id == follower_id)
+        .filter(models.PersonaFollow.following_persona_id == following_id)
+        .first()
+    ) is not None
+
+
+def _lock_pair(db: Session, follower_id: int, following_id: int) -> None:
+    # Two reciprocal follows committing at once could each miss the other's
+    # row and leave mutual_count short; locking both personas (in id order)
+    # serializes them. SQLite has no row locks, but its single writer already
+    # does. Counts that drift anyway are fixed by repair_follow_counts().
+    if db.get_bind().dialect.name == "sqlite":
+        return
+    (
+        db.query(models.Persona.id)
+        .filter(models.Persona.id.in_((follower_id, following_id)))
+        .order_by(models.Persona.id)
+        .with_for_update()
+        .all()
+    )
+
+
+def _adjust_counts(db: Session, follower_id: int, following_id: int, delta: int) -> None:
+    # Relative UPDATEs, so concurrent follows can't overwrite each other's counts
+    _lock_pair(db, follower_id, following_id)
+    mutual = _follow_exists(db, following_id, follower_id)
+    Persona = models.Persona
+
+    for persona_id, count_column in (
+        (follower_id, Persona.following_count),
+        (following_id, Persona.follower_count),
+    ):
+        values = {count_column: count_column + delta, Persona.version: Persona.version + 1}
+        if mutual:
+            values[Persona.mutual_count] = Persona.mutual_count + delta
+        db.query(Persona).filter(Persona.id == persona_id).update(values)
+
+
+def add_follow(db: Session, follower_id: int, following_id: int) -> models.PersonaFollow:
+    """Stage a follow and its counter updates; the caller commits."""
+    follow = models.PersonaFollow(follower_persona_id=follower_id, following_persona_id=following_id)
+    db.add(follow)
+    db.flush()
+    _adjust_counts(db, follower_id, following_id, 1)
+    return follow
+
+
+def remove_follow(db: Session, follow: models.PersonaFollow) -> None:
+    """Stage deleting ``follow`` and its counter updates; the caller commits."""
+    db.delete(follow)
+    db.flush()
+    _adjust_counts(db, follow.follower_persona_id, follow.following_persona_id, -1)
+
+
+def _counts_by(query, column, ids) -> dict[int, int]:
+    return dict(query.filter(column.in_(ids)).group_by(column).all())
+
+
+def repair_follow_counts(db: Session, batch_size: int = 500) -> int:
+    """Recompute follower / following / mutual counts for every persona.
+
+    Returns the number of personas whose stored counts changed.
+    """
+    Follow = models.PersonaFollow
+    reverse = aliased(models.PersonaFollow)
+
+    changed = 0
+    last_id = 0
+
+    while True:
+        personas = (
+            db.query(models.Persona)
+            .filter(models.Persona.id > last_id)
+            .order_by(models.Persona.id.asc())
+            .limit(batch_size)
+            .all()
+        )
+        if not personas:
+            break
+
+        ids = [p.id for p in personas]
+        followers = _counts_by(
+            db.query(Follow.following_persona_id, func.count()), Follow.following_persona_id, ids,
+        )
+        following = _counts_by(
+            db.query(Follow.follower_persona_id, func.count()), Follow.follower_persona_id, ids,
+        )
+        mutuals = _counts_by(
+            db.query(Follow.follower_persona_id, func.count())
+            .join(reverse, and_(
+                reverse.follower_persona_id == Follow.following_persona_id,
+                reverse.following_persona_id == Follow.follower_persona_id,
+            )),
+            Follow.follower_persona_id, ids,
+        )
+
+        for p in personas:
+            counts = (followers.get(p.id, 0), following.get(p.id, 0), mutuals.get(p.id, 0))
+            if (p.follower_count, p.following_count, p.mutual_count) != counts:
+                p.follower_count, p.following_count, p.mutual_count = counts
+                changed += 1
+
+        db.commit()
+        last_id = personas[-1].id
+
+    return changed
@@ -1,3 +1,6 @@
+import asyncio
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI, Request, Form, Depends
 from fastapi.responses import HTMLResponse
 from fastapi.templating import Jinja2Templates
@@ -6,20 +9,40 @@ from sqlalchemy.orm import Session
 
 from starlette.middleware.sessions import SessionMiddleware
 
-from database import engine, SessionLocal
+from database import MIGRATE_ON_STARTUP, SessionLocal, mark_write, run_migrations
 import models
 from routers import users, auth, chat, api, steam
 from auth_utils import hash_password
 
-models.Base.metadata.create_all(bind=engine)
+if MIGRATE_ON_STARTUP:
+    run_migrations()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    reaper = asyncio.create_task(chat.reaper.run())
+    yield
+    reaper.cancel()
+    await chat.dm_notifications.drain()
+    await chat.broadcast_backend.close()
 
-app = FastAPI()
+
+app = FastAPI(lifespan=lifespan)
 app.include_router(users.router)
 app.include_router(chat.router)
 app.include_router(auth.router)
 app.include_router(api.router)
 app.include_router(steam.router)
 
+# Registered before SessionMiddleware so it runs inside it and can see
+# request.session
+@app.middleware("http")
+async def read_your_writes(request: Request, call_next):
+    response = await call_next(request)
+    if request.method not in ("GET", "HEAD", "OPTIONS") and response.status_code < 400:
+        mark_write(request)
+    return response
+
 app.add_middleware(SessionMiddleware, 
                    secret_key="change-this-to-a-random-secret",
                    https_only=False)
@@ -0,0 +1,92 @@
+import argparse
+import asyncio
+from datetime import timedelta
+
+from database import SessionLocal
+from follows import repair_follow_counts
+from messaging.archive import ARCHIVE_AFTER_DAYS, archive_messages
+from realtime.broker import Broker
+from security.verification import backfill_verification
+
+
+def cmd_backfill_verification(args):
+    db = SessionLocal()
+    try:
+        changed = backfill_verification(db, batch_size=args.batch_size)
+    finally:
+        db.close()
+
+    print(f"Updated verification state on {changed} persona(s).")
+
+
+def cmd_repair_follow_counts(args):
+    db = SessionLocal()
+    try:
+        changed = repair_follow_counts(db, batch_size=args.batch_size)
+    finally:
+        db.close()
+
+    print(f"Repaired follow counts on {changed} persona(s).")
+
+
+def cmd_archive_messages(args):
+    db = SessionLocal()
+    try:
+        moved = archive_messages(
+            db,
+            older_than=timedelta(days=args.older_than_days),
+            batch_size=args.batch_size,
+        )
+    finally:
+        db.close()
+
+    print(f"Archived {moved} message(s).")
+
+
+def cmd_broker(args):
+    print(f"Broker listening on {args.path}")
+    try:
+        asyncio.run(Broker(args.path).serve_forever())
+    except KeyboardInterrupt:
+        pass
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Maintenance commands")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    backfill = subparsers.add_parser(
+        "backfill-verification",
+        help="recompute Persona.is_verified / verified_providers from linked identities",
+    )
+    backfill.add_argument("--batch-size", type=int, default=500)
+    backfill.set_defaults(func=cmd_backfill_verification)
+
+    repair = subparsers.add_parser(
+        "repair-follow-counts",
+        help="recompute Persona.follower_count / following_count / mutual_count from persona_follows",
+    )
+    repair.add_argument("--batch-size", type=int, default=500)
+    repair.set_defaults(func=cmd_repair_follow_counts)
+
+    archive = subparsers.add_parser(
+        "archive-messages",
+        help="move old chat and DM messages into the segment-file archive",
+    )
+    archive.add_argument("--older-than-days", type=int, default=ARCHIVE_AFTER_DAYS)
+    archive.add_argument("--batch-size", type=int, default=1000)
+    archive.set_defaults(func=cmd_archive_messages)
+
+    broker = subparsers.add_parser(
+        "broker",
+        help="run the pub/sub broker workers share via BROADCAST_URL=unix://<path>",
+    )
+    broker.add_argument("--path", default="/tmp/personas-broker.sock")
+    broker.set_defaults(func=cmd_broker)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,402 @@
+"""Append-only archive of cold chat history.
+
+Each room ("category:<name>" or "dm:<thread_id>") gets its own directory of
+segment files. A segment holds one JSON record per line in ascending id
+order; a sidecar ``.idx`` file stores a sparse (id, byte offset) entry every
+INDEX_STRIDE_BYTES so reads can seek straight to the right region of the
+memory-mapped segment instead of scanning it.
+
+A crash mid-append can leave a partial record after a segment's last
+newline. Readers stop at that newline, and the next append() truncates the
+partial tail before writing.
+"""
+import bisect
+import json
+import mmap
+import os
+import struct
+from datetime import datetime, timedelta
+from urllib.parse import quote
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+import models
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ARCHIVE_DIR = os.environ.get("CHAT_ARCHIVE_DIR", os.path.join(BASE_DIR, "archive"))
+ARCHIVE_AFTER_DAYS = int(os.environ.get("CHAT_ARCHIVE_AFTER_DAYS", "30"))
+
+# Rows per room that always stay in the live table, whatever their age
+KEEP_LIVE_PER_ROOM = 50
+
+SEGMENT_MAX_BYTES = 4 * 1024 * 1024
+INDEX_STRIDE_BYTES = 4096
+
+_INDEX_ENTRY = struct.Struct("<qq")
+
+
+def category_room(category: str) -> str:
+    return f"category:{category}"
+
+
+def dm_room(thread_id: int) -> str:
+    return f"dm:{thread_id}"
+
+
+class _mapped:
+    """Read-only mmap context manager that tolerates empty files."""
+
+    def __init__(self, f):
+        self.f = f
+        self.map = None
+
+    def __enter__(self):
+        if os.fstat(self.f.fileno()).st_size == 0:
+            return None
+        self.map = mmap.mmap(self.f.fileno(), 0, access=mmap.ACCESS_READ)
+        return self.map
+
+    def __exit__(self, *exc):
+        if self.map is not None:
+            self.map.close()
+
+
+def _complete_size(data) -> int:
+    """Bytes up to and including the last newline; anything after is a partial record."""
+    return data.rfind(b"\n") + 1
+
+
+class Segment:
+    def __init__(self, path: str, first_id: int):
+        self.path = path
+        self.first_id = first_id
+        self._index = None
+
+    @property
+    def index_path(self) -> str:
+        return self.path[: -len(".seg")] + ".idx"
+
+    def index(self) -> tuple[list[int], list[int]]:
+        if self._index is None:
+            ids, offsets = [], []
+            if os.path.exists(self.index_path):
+                with open(self.index_path, "rb") as f:
+                    raw = f.read()
+                raw = raw[: len(raw) - len(raw) % _INDEX_ENTRY.size]
+                for record_id, offset in _INDEX_ENTRY.iter_unpack(raw):
+                    ids.append(record_id)
+                    offsets.append(offset)
+            self._index = (ids, offsets)
+        return self._index
+
+    def _seek_offset(self, record_id: int, size: int) -> int:
+        """Offset of the last indexed record with id <= record_id within ``size`` bytes."""
+        ids, offsets = self.index()
+        pos = bisect.bisect_right(ids, record_id) - 1
+        while pos >= 0 and offsets[pos] >= size:
+            pos -= 1
+        return offsets[pos] if pos >= 0 else 0
+
+    def read_after(self, after_id: int, limit: int) -> list[dict]:
+        out = []
+        with open(self.path, "rb") as f, _mapped(f) as data:
+            if data is None:
+                return out
+            size = _complete_size(data)
+            offset = self._seek_offset(after_id, size)
+            while offset < size and len(out) < limit:
+                end = data.find(b"\n", offset)
+                record = json.loads(data[offset:end])
+                if record["id"] > after_id:
+                    out.append(record)
+                offset = end + 1
+        return out
+
+    def read_before(self, before_id: int, limit: int) -> list[dict]:
+        """Up to ``limit`` newest records with id < before_id, ascending."""
+        out = []
+        with open(self.path, "rb") as f, _mapped(f) as data:
+            if data is None:
+                return out
+
+            # Find the end boundary: first record with id >= before_id
+            size = _complete_size(data)
+            offset = self._seek_offset(before_id, size)
+            end_offset = size
+            while offset < size:
+                end = data.find(b"\n", offset)
+                if json.loads(data[offset:end])["id"] >= before_id:
+                    end_offset = offset
+                    break
+                offset = end + 1
+
+            # Walk backwards line by line from the boundary
+            cursor = end_offset - 1
+            while cursor > 0 and len(out) < limit:
+                start = data.rfind(b"\n", 0, cursor) + 1
+                out.append(json.loads(data[start:cursor]))
+                cursor = start - 1
+
+        out.reverse()
+        return out
+
+
+class RoomArchive:
+    def __init__(self, room_key: str, root: str | None = None):
+        kind, _, name = room_key.partition(":")
+        self.path = os.path.join(root or ARCHIVE_DIR, kind, quote(name, safe=""))
+
+    def segments(self) -> list[Segment]:
+        if not os.path.isdir(self.path):
+            return []
+        first_ids = sorted(
+            int(name[: -len(".seg")])
+            for name in os.listdir(self.path)
+            if name.endswith(".seg")
+        )
+        return [Segment(os.path.join(self.path, f"{i:012d}.seg"), i) for i in first_ids]
+
+    def last_id(self) -> int:
+        for segment in reversed(self.segments()):
+            with open(segment.path, "rb") as f, _mapped(f) as data:
+                size = _complete_size(data) if data is not None else 0
+                if size:
+                    start = data.rfind(b"\n", 0, size - 1) + 1
+                    return json.loads(data[start:size - 1])["id"]
+        return 0
+
+    def _truncate_partial_tail(self) -> None:
+        """Drop what a crashed append left half-written in the last segment and its index."""
+        segments = self.segments()
+        if not segments:
+            return
+        segment = segments[-1]
+        with open(segment.path, "rb") as f, _mapped(f) as data:
+            size = _complete_size(data) if data is not None else 0
+            total = len(data) if data is not None else 0
+
+        if size == 0:
+            os.remove(segment.path)
+            if os.path.exists(segment.index_path):
+                os.remove(segment.index_path)
+            return
+
+        _, offsets = segment.index()
+        index_size = bisect.bisect_left(offsets, size) * _INDEX_ENTRY.size
+        if os.path.exists(segment.index_path) and os.path.getsize(segment.index_path) != index_size:
+            with open(segment.index_path, "r+b") as idx:
+                idx.truncate(index_size)
+                os.fsync(idx.fileno())
+        if size != total:
+            with open(segment.path, "r+b") as seg:
+                seg.truncate(size)
+                os.fsync(seg.fileno())
+
+    def append(self, records: list[dict]) -> int:
+        """Append records (ascending ids); ids already archived are skipped."""
+        self._truncate_partial_tail()
+        last_id = self.last_id()
+        records = [r for r in records if r["id"] > last_id]
+        if not records:
+            return 0
+
+        os.makedirs(self.path, exist_ok=True)
+        segments = self.segments()
+        segment = segments[-1] if segments else None
+
+        written = 0
+        while written < len(records):
+            if segment is None or os.path.getsize(segment.path) >= SEGMENT_MAX_BYTES:
+                first_id = records[written]["id"]
+                segment = Segment(os.path.join(self.path, f"{first_id:012d}.seg"), first_id)
+
+            ids, offsets = segment.index()
+            last_indexed = offsets[-1] if offsets else None
+
+            with open(segment.path, "ab") as seg, open(segment.index_path, "ab") as idx:
+                offset = seg.tell()
+                while written < len(records) and offset < SEGMENT_MAX_BYTES:
+                    record = records[written]
+                    line = json.dumps(record, separators=(",", ":")).encode() + b"\n"
+
+                    if last_indexed is None or offset - last_indexed >= INDEX_STRIDE_BYTES:
+                        idx.write(_INDEX_ENTRY.pack(record["id"], offset))
+                        ids.append(record["id"])
+                        offsets.append(offset)
+                        last_indexed = offset
+
+                    seg.write(line)
+                    offset += len(line)
+                    written += 1
+
+                seg.flush()
+                os.fsync(seg.fileno())
+                idx.flush()
+                os.fsync(idx.fileno())
+
+        return written
+
+    def read_before(self, before_id: int | None, limit: int) -> list[dict]:
+        before_id = before_id if before_id is not None else 2 ** 62
+        out: list[dict] = []
+        for segment in reversed(self.segments()):
+            if segment.first_id >= before_id:
+                continue
+            out = segment.read_before(before_id, limit - len(out)) + out
+            if len(out) >= limit:
+                break
+        return out
+
+    def read_after(self, after_id: int, limit: int) -> list[dict]:
+        segments = self.segments()
+        first_ids = [s.first_id for s in segments]
+        start = max(bisect.bisect_right(first_ids, after_id) - 1, 0)
+
+        out: list[dict] = []
+        for segment in segments[start:]:
+            out.extend(segment.read_after(after_id, limit - len(out)))
+            if len(out) >= limit:
+                break
+        return out
+
+
+def _record(message) -> dict:
+    return {
+        "id": message.id,
+        "sender_persona_id": message.sender_persona_id,
+        "content": message.content,
+        "created_at": message.created_at.isoformat(),
+    }
+
+
+def _delete_archived_live_rows(db: Session, model, room_column, room_value, archive, last_id, batch_size) -> int:
+    """Delete live rows at or below the archive's last id that it already holds.
+
+    These are left behind by a run that crashed between append() and the
+    DELETE. Rows the archive doesn't hold stay live rather than being lost.
+    """
+    stale = [
+        i for (i,) in
+        db.query(model.id)
+        .filter(room_column == room_value)
+        .filter(model.id <= last_id)
+        .order_by(model.id.asc())
+        .all()
+    ]
+    if not stale:
+        return 0
+
+    archived = set()
+    after_id = stale[0] - 1
+    while after_id < stale[-1]:
+        records = archive.read_after(after_id, batch_size)
+        if not records:
+            break
+        archived.update(r["id"] for r in records)
+        after_id = records[-1]["id"]
+
+    ids = [i for i in stale if i in archived]
+    if ids:
+        db.query(model).filter(model.id.in_(ids)).delete(synchronize_session=False)
+        db.commit()
+    return len(ids)
+
+
+def _archive_room(db: Session, model, room_column, room_value, room_key, cutoff, batch_size, root) -> int:
+    newest_kept = (
+        db.query(model.id)
+        .filter(room_column == room_value)
+        .order_by(model.id.desc())
+        .offset(KEEP_LIVE_PER_ROOM - 1)
+        .limit(1)
+        .scalar()
+    )
+    if newest_kept is None:
+        return 0
+
+    # created_at isn't monotonic in id, so archive by id range: everything up
+    # to the newest old-enough row, never leaving gaps behind in the archive
+    boundary = (
+        db.query(func.max(model.id))
+        .filter(room_column == room_value)
+        .filter(model.id < newest_kept)
+        .filter(model.created_at < cutoff)
+        .scalar()
+    )
+    if boundary is None:
+        return 0
+
+    archive = RoomArchive(room_key, root)
+    last_id = archive.last_id()
+    moved = _delete_archived_live_rows(db, model, room_column, room_value, archive, last_id, batch_size)
+
+    while True:
+        rows = (
+            db.query(model)
+            .filter(room_column == room_value)
+            .filter(model.id > last_id)
+            .filter(model.id <= boundary)
+            .order_by(model.id.asc())
+            .limit(batch_size)
+            .all()
+        )
+        if not rows:
+            break
+
+        # Segment data is fsynced before the rows are deleted; a crash in
+        # between leaves archived rows live until the next run deletes them
+        archive.append([_record(m) for m in rows])
+
+        ids = [m.id for m in rows]
+        db.query(model).filter(model.id.in_(ids)).delete(synchronize_session=False)
+        db.commit()
+        moved += len(ids)
+        last_id = ids[-1]
+
+    return moved
+
+
+def archive_messages(
+    db: Session,
+    older_than: timedelta | None = None,
+    batch_size: int = 1000,
+    root: str | None = None,
+) -> int:
+    """Move messages older than ``older_than`` out of the live tables.
+
+    The newest KEEP_LIVE_PER_ROOM rows of every room always stay live.
+    Returns the number of rows moved.
+    """
+    older_than = older_than if older_than is not None else timedelta(days=ARCHIVE_AFTER_DAYS)
+    cutoff = datetime.utcnow() - older_than
+    moved = 0
+
+    categories = [
+        c for (c,) in
+        db.query(models.CategoryMessage.category)
+        .filter(models.CategoryMessage.created_at < cutoff)
+        .distinct()
+        .all()
+    ]
+    for category in categories:
+        moved += _archive_room(
+            db, models.CategoryMessage, models.CategoryMessage.category, category,
+            category_room(category), cutoff, batch_size, root,
+        )
+
+    thread_ids = [
+        t for (t,) in
+        db.query(models.DMMessage.thread_id)
+        .filter(models.DMMessage.created_at < cutoff)
+        .distinct()
+        .all()
+    ]
+    for thread_id in thread_ids:
+        moved += _archive_room(
+            db, models.DMMessage, models.DMMessage.thread_id, thread_id,
+            dm_room(thread_id), cutoff, batch_size, root,
+        )
+
+    return moved
@@ -0,0 +1,130 @@
+"""Chat history reads spanning the live tables and the cold archive."""
+from datetime import datetime
+from typing import NamedTuple
+
+from sqlalchemy.orm import Session
+
+import models
+from messaging.archive import RoomArchive, category_room, dm_room
+
+
+class HistoryRow(NamedTuple):
+    id: int
+    sender_persona_id: int
+    sender_name: str
+    sender_verified: bool
+    content: str
+    created_at: datetime
+
+
+def history_payload(row: HistoryRow, viewer_persona_id: int | None) -> dict:
+    return {
+        "id": row.id,
+        "sender_persona_id": row.sender_persona_id,
+        "sender_name": row.sender_name,
+        "content": row.content,
+        "created_at": row.created_at.isoformat(timespec="seconds"),
+        "is_me": row.sender_persona_id == viewer_persona_id,
+        "is_verified": row.sender_verified,
+    }
+
+
+def _live_rows(
+    db: Session, model, room_filter, limit: int,
+    before_id: int | None = None, after_id: int | None = None,
+) -> list[HistoryRow]:
+    query = (
+        db.query(model, models.Persona.name, models.Persona.is_verified)
+        .join(models.Persona, models.Persona.id == model.sender_persona_id)
+        .filter(room_filter)
+    )
+
+    # Keyset pagination: both directions are index range scans on (room, id)
+    if after_id is not None:
+        rows = query.filter(model.id > after_id).order_by(model.id.asc()).limit(limit).all()
+    else:
+        if before_id is not None:
+            query = query.filter(model.id < before_id)
+        rows = query.order_by(model.id.desc()).limit(limit).all()
+        rows.reverse()
+
+    return [
+        HistoryRow(m.id, m.sender_persona_id, name, bool(verified), m.content, m.created_at)
+        for m, name, verified in rows
+    ]
+
+
+def _archived_rows(
+    db: Session, room_key: str, limit: int,
+    before_id: int | None = None, after_id: int | None = None,
+) -> list[HistoryRow]:
+    archive = RoomArchive(room_key)
+    if after_id is not None:
+        records = archive.read_after(after_id, limit)
+    else:
+        records = archive.read_before(before_id, limit)
+    if not records:
+        return []
+
+    sender_ids = {r["sender_persona_id"] for r in records}
+    senders = {
+        pid: (name, bool(verified))
+        for pid, name, verified in
+        db.query(models.Persona.id, models.Persona.name, models.Persona.is_verified)
+        .filter(models.Persona.id.in_(sender_ids))
+        .all()
+    }
+
+    return [
+        HistoryRow(
+            r["id"],
+            r["sender_persona_id"],
+            *senders.get(r["sender_persona_id"], ("Unknown", False)),
+            r["content"],
+            datetime.fromisoformat(r["created_at"]),
+        )
+        for r in records
+    ]
+
+
+def _history(db, model, room_filter, room_key, limit, before_id, after_id) -> list[HistoryRow]:
+    # Archived ids are all older than anything still live in the room
+    if after_id is not None:
+        archived = _archived_rows(db, room_key, limit, after_id=after_id)
+        if len(archived) >= limit:
+            return archived
+        live_after = archived[-1].id if archived else after_id
+        return archived + _live_rows(db, model, room_filter, limit - len(archived), after_id=live_after)
+
+    rows = _live_rows(db, model, room_filter, limit, before_id=before_id)
+    if len(rows) >= limit:
+        return rows
+
+    archive_before = rows[0].id if rows else before_id
+    return _archived_rows(db, room_key, limit - len(rows), before_id=archive_before) + rows
+
+
+def category_history(
+    db: Session, category: str, limit: int = 50,
+    before_id: int | None = None, after_id: int | None = None,
+) -> list[HistoryRow]:
+    """A page of room history, oldest first.
+
+    With ``after_id`` returns the oldest ``limit`` messages newer than it;
+    otherwise the newest ``limit`` messages older than ``before_id``.
+    """
+    return _history(
+        db, models.CategoryMessage, models.CategoryMessage.category == category,
+        category_room(category), limit, before_id, after_id,
+    )
+
+
+def dm_history(
+    db: Session, thread_id: int, limit: int = 50,
+    before_id: int | None = None, after_id: int | None = None,
+) -> list[HistoryRow]:
+    """Same as category_history, for a DM thread."""
+    return _history(
+        db, models.DMMessage, models.DMMessage.thread_id == thread_id,
+        dm_room(thread_id), limit, before_id, after_id,
+    )
@@ -0,0 +1,150 @@
+"""DM inbox listing built from a single query per page."""
+from datetime import datetime
+from typing import NamedTuple
+
+from fastapi import HTTPException
+from sqlalchemy import func, or_, select
+from sqlalchemy.orm import Session, aliased
+
+import models
+from pagination import DEFAULT_PAGE_SIZE, decode_cursor, encode_cursor
+
+
+class InboxPersona(NamedTuple):
+    id: int
+    name: str
+    is_verified: bool
+
+
+class InboxMessage(NamedTuple):
+    id: int
+    sender_persona_id: int
+    content: str
+    created_at: datetime
+
+
+class InboxThread(NamedTuple):
+    thread_id: int
+    category: str
+    my_persona: InboxPersona
+    other_persona: InboxPersona
+    last_message: InboxMessage | None
+
+
+def _last_message_id():
+    return (
+        select(func.max(models.DMMessage.id))
+        .where(models.DMMessage.thread_id == models.DMThread.id)
+        .correlate(models.DMThread)
+        .scalar_subquery()
+    )
+
+
+def _my_threads(query, user_id: int):
+    my_persona_ids = select(models.Persona.id).where(models.Persona.user_id == user_id)
+    return query.filter(or_(
+        models.DMThread.persona_a_id.in_(my_persona_ids),
+        models.DMThread.persona_b_id.in_(my_persona_ids),
+    ))
+
+
+def inbox_query(db: Session, user_id: int):
+    """Threads involving any of the user's personas, newest first.
+
+    Both personas are joined in, and each thread's latest message is picked
+    by a correlated MAX(id) lookup on (thread_id, id).
+    """
+    persona_a = aliased(models.Persona)
+    persona_b = aliased(models.Persona)
+
+    query = (
+        db.query(
+            models.DMThread.id,
+            models.DMThread.category,
+            persona_a.user_id.label("a_user_id"),
+            persona_a.id.label("a_id"),
+            persona_a.name.label("a_name"),
+            persona_a.is_verified.label("a_verified"),
+            persona_b.id.label("b_id"),
+            persona_b.name.label("b_name"),
+            persona_b.is_verified.label("b_verified"),
+            models.DMMessage.id.label("message_id"),
+            models.DMMessage.sender_persona_id,
+            models.DMMessage.content,
+            models.DMMessage.created_at,
+        )
+        .join(persona_a, persona_a.id == models.DMThread.persona_a_id)
+        .join(persona_b, persona_b.id == models.DMThread.persona_b_id)
+        .outerjoin(models.DMMessage, models.DMMessage.id == _last_message_id())
+        .order_by(models.DMThread.id.desc())
+    )
+    return _my_threads(query, user_id)
+
+
+def inbox_versions_query(db: Session, user_id: int):
+    """What an inbox page depends on, without loading names or messages.
+
+    One row per thread: its id and version, both personas' versions and
+    the id of its latest message.
+    """
+    persona_a = aliased(models.Persona)
+    persona_b = aliased(models.Persona)
+
+    query = (
+        db.query(
+            models.DMThread.id,
+            models.DMThread.version,
+            persona_a.version,
+            persona_b.version,
+            _last_message_id(),
+        )
+        .join(persona_a, persona_a.id == models.DMThread.persona_a_id)
+        .join(persona_b, persona_b.id == models.DMThread.persona_b_id)
+        .order_by(models.DMThread.id.desc())
+    )
+    return _my_threads(query, user_id)
+
+
+def _page(query, cursor: str | None, limit: int):
+    if cursor:
+        values = decode_cursor(cursor)
+        if len(values) != 1 or not isinstance(values[0], int):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        query = query.filter(models.DMThread.id < values[0])
+
+    rows = query.limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].id)
+
+    return rows, next_cursor
+
+
+def _inbox_thread(row, user_id: int) -> InboxThread:
+    a = InboxPersona(row.a_id, row.a_name, bool(row.a_verified))
+    b = InboxPersona(row.b_id, row.b_name, bool(row.b_verified))
+    mine, other = (a, b) if row.a_user_id == user_id else (b, a)
+
+    last_message = None
+    if row.message_id is not None:
+        last_message = InboxMessage(row.message_id, row.sender_persona_id, row.content, row.created_at)
+
+    return InboxThread(row.id, row.category, mine, other, last_message)
+
+
+def inbox_page(
+    db: Session, user_id: int, cursor: str | None = None, limit: int = DEFAULT_PAGE_SIZE,
+) -> tuple[list[InboxThread], str | None]:
+    """One page of the user's DM inbox and the cursor for the next one."""
+    rows, next_cursor = _page(inbox_query(db, user_id), cursor, limit)
+    return [_inbox_thread(row, user_id) for row in rows], next_cursor
+
+
+def inbox_versions(
+    db: Session, user_id: int, cursor: str | None = None, limit: int = DEFAULT_PAGE_SIZE,
+) -> list[tuple]:
+    """Version rows for the same page inbox_page() would return."""
+    rows, _ = _page(inbox_versions_query(db, user_id), cursor, limit)
+    return [tuple(row) for row in rows]
@@ -0,0 +1,135 @@
+"""Coalesced DM notifications.
+
+The first DM of a burst to a (recipient, thread) pair is notified straight
+away with a new notification. DMs arriving after it are folded into that
+notification while it is unread ("5 new messages from X"), with one write
+and one push per DM_NOTIFY_DEBOUNCE_MS window for as long as the burst
+lasts. A later burst gets a notification of its own, so it is listed as new
+instead of refreshing an old unread row further down the list.
+"""
+import asyncio
+import os
+from datetime import datetime
+from typing import Awaitable, Callable
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import models
+
+DM_NOTIFY_DEBOUNCE_MS = float(os.environ.get("DM_NOTIFY_DEBOUNCE_MS", "2000"))
+
+Publish = Callable[[int, models.Notification], Awaitable[None]]
+
+
+def dm_notification_title(sender_name: str, count: int) -> str:
+    if count == 1:
+        return f"New DM from {sender_name}"
+    return f"{count} new messages from {sender_name}"
+
+
+class _Burst:
+    __slots__ = ("count", "sender_name", "content", "notification_id", "timer", "lock")
+
+    def __init__(self):
+        self.count = 0
+        self.notification_id = None
+        self.sender_name = None
+        self.content = None
+        self.timer = None
+        self.lock = asyncio.Lock()
+
+
+class DMNotificationCoalescer:
+    def __init__(
+        self,
+        session_factory: Callable[[], AsyncSession],
+        publish: Publish,
+        window: float = DM_NOTIFY_DEBOUNCE_MS / 1000,
+    ):
+        self.session_factory = session_factory
+        self.publish = publish
+        self.window = window
+        self._loop = None
+        self._bursts: dict[tuple[int, int], _Burst] = {}
+        self._tasks: set[asyncio.Task] = set()
+
+    def add(self, user_id: int, thread_id: int, sender_name: str, content: str) -> None:
+        """Record a DM for ``user_id``; never waits on the database."""
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            # Bursts and timers belong to the loop they were opened on
+            self._loop, self._bursts, self._tasks = loop, {}, set()
+
+        key = (user_id, thread_id)
+        burst = self._bursts.get(key)
+        leading = burst is None
+        if leading:
+            burst = self._bursts[key] = _Burst()
+
+        burst.count += 1
+        burst.sender_name = sender_name
+        burst.content = content
+
+        if leading:
+            self._spawn(self._flush(key, burst))
+            burst.timer = loop.call_later(self.window, self._window_closed, key)
+
+    def _spawn(self, coro) -> None:
+        task = asyncio.get_running_loop().create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def _window_closed(self, key) -> None:
+        burst = self._bursts.get(key)
+        if burst is None:
+            return
+        if burst.count:
+            self._spawn(self._flush(key, burst))
+            burst.timer = asyncio.get_running_loop().call_later(self.window, self._window_closed, key)
+        else:
+            del self._bursts[key]
+
+    async def drain(self) -> None:
+        """Flush every open burst now; used on shutdown and in tests."""
+        for key, burst in list(self._bursts.items()):
+            if burst.timer is not None:
+                burst.timer.cancel()
+            self._spawn(self._flush(key, burst))
+            self._bursts.pop(key, None)
+        while self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
+
+    async def _flush(self, key, burst: _Burst) -> None:
+        async with burst.lock:
+            count, sender_name, content = burst.count, burst.sender_name, burst.content
+            if not count:
+                return
+            burst.count = 0
+
+            user_id, thread_id = key
+            link = f"/dm/{thread_id}"
+
+            async with self.session_factory() as db:
+                notif = None
+                if burst.notification_id is not None:
+                    notif = (await db.execute(
+                        select(models.Notification)
+                        .where(models.Notification.id == burst.notification_id)
+                        .where(models.Notification.is_read == False)
+                    )).scalar_one_or_none()
+
+                if notif is None:
+                    notif = models.Notification(
+                        user_id=user_id, type="dm_message", link=link, item_count=0,
+                    )
+                    db.add(notif)
+
+                notif.item_count += count
+                notif.title = dm_notification_title(sender_name, notif.item_count)
+                notif.message = content
+                notif.created_at = datetime.utcnow()
+                await db.commit()
+                burst.notification_id = notif.id
+
+            await self.publish(user_id, notif)
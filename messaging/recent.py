@@ -0,0 +1,138 @@
+"""Per-room ring buffer of recent messages.
+
+Managers record every chat frame they deliver while the worker is
+subscribed to the room, so a room's window is complete for ids above its
+floor: the first id recorded after subscribing, raised as old entries fall
+off. Page renders can seed a subscribed room's window from the history
+query they had to run anyway, which also tells it whether older messages
+exist. A room's window is dropped when its last local socket leaves, since
+frames published while unsubscribed are never seen, and whole rooms are
+evicted least-recently-used first past RECENT_MAX_ROOMS.
+
+The window serves reconnect replay (frames) and the initial history of
+chats_room / dm_thread (rows).
+"""
+import bisect
+import json
+import os
+import threading
+from collections import OrderedDict, deque
+from datetime import datetime
+
+from messaging.history import HistoryRow, history_payload
+from realtime.frames import encode_frame
+
+RECENT_PER_ROOM = int(os.environ.get("CHAT_RECENT_PER_ROOM", "200"))
+RECENT_MAX_ROOMS = int(os.environ.get("CHAT_RECENT_MAX_ROOMS", "1000"))
+
+
+class _RoomWindow:
+    __slots__ = ("maxlen", "floor", "older_exists", "entries")
+
+    def __init__(self, maxlen: int):
+        self.maxlen = maxlen
+        self.floor = None
+        # Whether the room has messages at or below the floor; None if unknown
+        self.older_exists = None
+        # Kept in id order; frames from other workers can arrive out of order
+        self.entries: deque[tuple[HistoryRow, str]] = deque()
+
+    def append(self, row: HistoryRow, frame: str) -> None:
+        if self.floor is None:
+            self.floor = row.id - 1
+        elif row.id <= self.floor:
+            return
+
+        if not self.entries or row.id > self.entries[-1][0].id:
+            self.entries.append((row, frame))
+        else:
+            index = bisect.bisect_left(self.entries, row.id, key=lambda entry: entry[0].id)
+            if self.entries[index][0].id == row.id:
+                return
+            self.entries.insert(index, (row, frame))
+
+        if len(self.entries) > self.maxlen:
+            self.floor = self.entries.popleft()[0].id
+            self.older_exists = True
+
+
+def _row_from_frame(message: dict) -> HistoryRow:
+    return HistoryRow(
+        message["id"],
+        message["sender_persona_id"],
+        message["sender_name"],
+        bool(message.get("is_verified")),
+        message["content"],
+        datetime.fromisoformat(message["created_at"]),
+    )
+
+
+class RecentMessages:
+    def __init__(self, per_room: int = RECENT_PER_ROOM, max_rooms: int = RECENT_MAX_ROOMS):
+        self.per_room = per_room
+        self.max_rooms = max_rooms
+        self._rooms: OrderedDict[str, _RoomWindow] = OrderedDict()
+        # Page renders run in the threadpool; sockets on the event loop
+        self._lock = threading.Lock()
+
+    def _window(self, room: str, create: bool = False) -> _RoomWindow | None:
+        window = self._rooms.get(room)
+        if window is not None:
+            self._rooms.move_to_end(room)
+        elif create:
+            window = self._rooms[room] = _RoomWindow(self.per_room)
+            while len(self._rooms) > self.max_rooms:
+                self._rooms.popitem(last=False)
+        return window
+
+    def record(self, room: str, frame: str) -> None:
+        message = json.loads(frame)
+        if message.get("id") is None or "sender_persona_id" not in message:
+            return
+        row = _row_from_frame(message)
+        with self._lock:
+            self._window(room, create=True).append(row, frame)
+
+    def seed(self, room: str, rows: list[HistoryRow], has_older: bool) -> None:
+        """Warm a room from the newest ``rows`` of a history query.
+
+        Rows reaching down to the floor of a window that live traffic
+        already started extend it downwards; rows entirely below the floor
+        only tell it that older messages exist.
+        """
+        if not rows:
+            return
+        with self._lock:
+            window = self._window(room, create=True)
+            if window.floor is None or rows[0].id - 1 <= window.floor <= rows[-1].id:
+                window.floor = rows[0].id - 1
+                window.older_exists = has_older
+                for row in rows:
+                    window.append(row, encode_frame(history_payload(row, None)))
+            elif rows[-1].id < window.floor and window.older_exists is None:
+                window.older_exists = True
+
+    def since(self, room: str, after_id: int) -> list[str] | None:
+        """Frames newer than ``after_id``, or None if the window can't vouch for the range."""
+        with self._lock:
+            window = self._window(room)
+            if window is None or window.floor is None or after_id < window.floor:
+                return None
+            return [frame for row, frame in window.entries if row.id > after_id]
+
+    def latest(self, room: str, limit: int) -> tuple[list[HistoryRow], bool] | None:
+        """The newest ``limit`` rows and whether older ones exist, or None when cold."""
+        with self._lock:
+            window = self._window(room)
+            if window is None:
+                return None
+            rows = [row for row, _ in window.entries]
+            if len(rows) > limit:
+                return rows[-limit:], True
+            if window.older_exists is None:
+                return None
+            return rows, window.older_exists
+
+    def forget(self, room: str) -> None:
+        with self._lock:
+            self._rooms.pop(room, None)
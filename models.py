@@ -1,5 +1,5 @@
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, DateTime
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, DateTime, Index, event
+from sqlalchemy.orm import object_session, relationship
 from datetime import datetime
 from database import Base
 
@@ -29,11 +29,29 @@ class Persona(Base):
     description = Column(String, nullable=True)                 
     is_public = Column(Boolean, default=False)
 
+    # Denormalized from external_identities; maintained by the link callbacks
+    is_verified = Column(Boolean, default=False, nullable=False)
+    verified_providers = Column(Integer, default=0, nullable=False)  # provider bitmask
+
+    # Denormalized from persona_follows; maintained by follows.add_follow / remove_follow
+    follower_count = Column(Integer, default=0, nullable=False)
+    following_count = Column(Integer, default=0, nullable=False)
+    mutual_count = Column(Integer, default=0, nullable=False)
+
+    # Bumped on every update; API ETags are built from it
+    version = Column(Integer, default=1, nullable=False)
+
     created_at = Column(DateTime, default=datetime.utcnow)
 
     user = relationship("User", back_populates="personas")
     profile = relationship("PersonaProfile", back_populates="persona", uselist=False)
 
+    __table_args__ = (
+        Index("ix_personas_category_public_name", "category", "is_public", "name"),
+        Index("ix_personas_public_name", "is_public", "name"),
+        Index("ix_personas_user_id", "user_id"),
+    )
+
 class PersonaProfile(Base):
     __tablename__ = "persona_profiles"
 
@@ -56,6 +74,10 @@ class CategoryMessage(Base):
 
     sender_persona = relationship("Persona")
 
+    __table_args__ = (
+        Index("ix_category_messages_category_id", "category", "id"),
+    )
+
 class DMThread(Base):
     __tablename__ = "dm_threads"
 
@@ -63,11 +85,17 @@ class DMThread(Base):
     persona_a_id = Column(Integer, ForeignKey("personas.id"), nullable=False)
     persona_b_id = Column(Integer, ForeignKey("personas.id"), nullable=False)
     category = Column(String, nullable=False) 
+    version = Column(Integer, default=1, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
 
     persona_a = relationship("Persona", foreign_keys=[persona_a_id])
     persona_b = relationship("Persona", foreign_keys=[persona_b_id])
 
+    __table_args__ = (
+        Index("ix_dm_threads_pair_category", "persona_a_id", "persona_b_id", "category"),
+        Index("ix_dm_threads_persona_b_id", "persona_b_id"),
+    )
+
 class DMMessage(Base):
     __tablename__ = "dm_messages"
 
@@ -80,6 +108,10 @@ class DMMessage(Base):
     thread = relationship("DMThread")
     sender_persona = relationship("Persona")
 
+    __table_args__ = (
+        Index("ix_dm_messages_thread_id_id", "thread_id", "id"),
+    )
+
 class ExternalIdentity(Base):
     __tablename__ = "external_identities"
 
@@ -98,7 +130,11 @@ class ExternalIdentity(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
 
     persona = relationship("Persona")
-    
+
+    __table_args__ = (
+        Index("ix_external_identities_persona_id", "persona_id"),
+        Index("uq_external_identities_provider_user", "provider", "provider_user_id", unique=True),
+    )
 
 class PersonaFollow(Base):
     __tablename__ = "persona_follows"
@@ -111,6 +147,11 @@ class PersonaFollow(Base):
     follower_persona = relationship("Persona", foreign_keys=[follower_persona_id])
     following_persona = relationship("Persona", foreign_keys=[following_persona_id])
 
+    __table_args__ = (
+        Index("uq_persona_follows_pair", "follower_persona_id", "following_persona_id", unique=True),
+        Index("ix_persona_follows_following", "following_persona_id", "follower_persona_id"),
+    )
+
 
 class Notification(Base):
     __tablename__ = "notifications"
@@ -126,10 +167,24 @@ class Notification(Base):
     link = Column(String, nullable=True)
     is_read = Column(Boolean, default=False, nullable=False)
 
+    # Events folded into this notification while it stayed unread
+    item_count = Column(Integer, default=1, nullable=False)
+
+    version = Column(Integer, default=1, nullable=False)
+
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
 
     user = relationship("User")
 
+    __table_args__ = (
+        Index("ix_notifications_user_id_id", "user_id", "id"),
+    )
+
 
+def _bump_version(mapper, connection, target):
+    if object_session(target).is_modified(target, include_collections=False):
+        target.version = (target.version or 0) + 1
 
 
+for _versioned in (Persona, Notification, DMThread):
+    event.listen(_versioned, "before_update", _bump_version)
@@ -0,0 +1,60 @@
+import base64
+import json
+
+from fastapi import HTTPException
+from sqlalchemy import func, tuple_
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 100
+
+
+def encode_cursor(*values) -> str:
+    raw = json.dumps(list(values), separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> list:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    if not isinstance(values, list):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values
+
+
+def _matches_column(value, column) -> bool:
+    # bool is an int subclass, but never a valid key value
+    return isinstance(value, column.type.python_type) and not isinstance(value, bool)
+
+
+def keyset_page(query, order_columns, cursor: str | None, limit: int):
+    """Fetch one page of ``query`` ordered by ``order_columns`` (ascending).
+
+    Returns (rows, next_cursor); next_cursor is None on the last page. The
+    cursor carries the order-column values of the last row, so each page is
+    an index range scan instead of an OFFSET.
+    """
+    if cursor:
+        values = decode_cursor(cursor)
+        if len(values) != len(order_columns) or not all(
+            _matches_column(value, column) for value, column in zip(values, order_columns)
+        ):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        query = query.filter(tuple_(*order_columns) > tuple_(*values))
+
+    rows = query.order_by(*order_columns).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(*(getattr(last, col.key) for col in order_columns))
+
+    return rows, next_cursor
+
+
+def count_rows(query, column) -> int:
+    return query.with_entities(func.count(column)).order_by(None).scalar()
@@ -0,0 +1,182 @@
+"""Per-worker cache of immutable persona snapshots keyed by id.
+
+Authenticated routes and websocket handlers read the active persona on
+almost every request; they take a PersonaSnapshot from here instead of
+loading the row. Snapshots carry the fields IdentityPolicy checks plus what
+pages render, and are dropped least-recently-used first past
+PERSONA_CACHE_SIZE. Writers call persona_cache.invalidate() after
+committing a change to a persona (or invalidate_user() after a username
+change); PERSONA_CACHE_TTL_S bounds how long other workers can serve the
+old values.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, NamedTuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+import models
+
+PERSONA_CACHE_SIZE = int(os.environ.get("PERSONA_CACHE_SIZE", "10000"))
+PERSONA_CACHE_TTL = float(os.environ.get("PERSONA_CACHE_TTL_S", "60"))
+FRAGMENT_CACHE_SIZE = int(os.environ.get("FRAGMENT_CACHE_SIZE", "1000"))
+
+
+class PersonaSnapshot(NamedTuple):
+    id: int
+    user_id: int
+    owner_username: str | None
+    name: str
+    category: str
+    description: str | None
+    is_public: bool
+    is_verified: bool
+    verified_providers: int
+
+    @classmethod
+    def from_row(cls, persona: models.Persona, owner_username: str | None) -> "PersonaSnapshot":
+        return cls(
+            persona.id,
+            persona.user_id,
+            owner_username,
+            persona.name,
+            persona.category,
+            persona.description,
+            bool(persona.is_public),
+            bool(persona.is_verified),
+            persona.verified_providers or 0,
+        )
+
+
+def _snapshot_query(persona_id: int):
+    return (
+        select(models.Persona, models.User.username)
+        .outerjoin(models.User, models.User.id == models.Persona.user_id)
+        .where(models.Persona.id == persona_id)
+    )
+
+
+class PersonaCache:
+    def __init__(self, max_size: int = PERSONA_CACHE_SIZE, ttl: float = PERSONA_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: OrderedDict[int, tuple[PersonaSnapshot, float]] = OrderedDict()
+        # Bumped by invalidate() so a load racing a write can't store old values
+        self._generations: dict[int, int] = {}
+        # Sync routes run in the threadpool; sockets on the event loop
+        self._lock = threading.Lock()
+
+    def _cached(self, persona_id: int) -> tuple[PersonaSnapshot | None, int]:
+        with self._lock:
+            generation = self._generations.get(persona_id, 0)
+            entry = self._entries.get(persona_id)
+            if entry is None:
+                return None, generation
+            snapshot, loaded_at = entry
+            if time.monotonic() - loaded_at > self.ttl:
+                del self._entries[persona_id]
+                return None, generation
+            self._entries.move_to_end(persona_id)
+            return snapshot, generation
+
+    def _store(self, snapshot: PersonaSnapshot, generation: int) -> None:
+        with self._lock:
+            if self._generations.get(snapshot.id, 0) != generation:
+                return
+            self._entries[snapshot.id] = (snapshot, time.monotonic())
+            self._entries.move_to_end(snapshot.id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def get(self, db: Session, persona_id: int | None) -> PersonaSnapshot | None:
+        """The persona's snapshot, loaded through ``db`` on a miss; None if it doesn't exist."""
+        if persona_id is None:
+            return None
+        snapshot, generation = self._cached(persona_id)
+        if snapshot is not None:
+            return snapshot
+
+        row = db.execute(_snapshot_query(persona_id)).first()
+        if row is None:
+            return None
+        snapshot = PersonaSnapshot.from_row(*row)
+        self._store(snapshot, generation)
+        return snapshot
+
+    async def aget(
+        self, session_factory: Callable[[], AsyncSession], persona_id: int | None,
+    ) -> PersonaSnapshot | None:
+        """Like get(), opening a short-lived async session only on a miss."""
+        if persona_id is None:
+            return None
+        snapshot, generation = self._cached(persona_id)
+        if snapshot is not None:
+            return snapshot
+
+        async with session_factory() as db:
+            row = (await db.execute(_snapshot_query(persona_id))).first()
+        if row is None:
+            return None
+        snapshot = PersonaSnapshot.from_row(*row)
+        self._store(snapshot, generation)
+        return snapshot
+
+    def invalidate(self, persona_id: int) -> None:
+        """Drop a persona's snapshot; call after committing a change to it."""
+        with self._lock:
+            self._generations[persona_id] = self._generations.get(persona_id, 0) + 1
+            self._entries.pop(persona_id, None)
+
+    def invalidate_user(self, user_id: int) -> None:
+        """Drop every cached persona owned by ``user_id``."""
+        with self._lock:
+            stale = [pid for pid, (snapshot, _) in self._entries.items() if snapshot.user_id == user_id]
+        for persona_id in stale:
+            self.invalidate(persona_id)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._generations.clear()
+
+
+class FragmentCache:
+    """Viewer-independent HTML rendered from a persona snapshot.
+
+    The snapshot an entry was rendered from is its version: an entry is
+    reused only while it equals the persona's current snapshot, so anything
+    that invalidates the persona (an edit, an identity link) retires its
+    fragments too.
+    """
+
+    def __init__(self, render: Callable[[PersonaSnapshot], str], max_size: int = FRAGMENT_CACHE_SIZE):
+        self.render = render
+        self.max_size = max_size
+        self._entries: OrderedDict[int, tuple[PersonaSnapshot, str]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, snapshot: PersonaSnapshot) -> str:
+        with self._lock:
+            entry = self._entries.get(snapshot.id)
+            if entry is not None and entry[0] == snapshot:
+                self._entries.move_to_end(snapshot.id)
+                return entry[1]
+
+        html = self.render(snapshot)
+        with self._lock:
+            self._entries[snapshot.id] = (snapshot, html)
+            self._entries.move_to_end(snapshot.id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return html
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+persona_cache = PersonaCache()
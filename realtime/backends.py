@@ -0,0 +1,150 @@
+"""Broadcast backends that fan socket messages out across worker processes.
+
+Messages are already-encoded text frames (see realtime.frames), so a
+payload is serialized once no matter how many workers or sockets receive
+it. Managers subscribe a handler per channel ("room:<key>", "user:<id>") while
+they hold at least one local socket for it, and publish through the backend
+instead of writing to their own sockets. MemoryBackend delivers in-process
+(single worker); UnixSocketBackend relays through realtime.broker so every
+worker subscribed to the channel receives the message, including the one
+that published it.
+"""
+import asyncio
+import json
+import os
+from typing import Awaitable, Callable
+
+BROADCAST_URL = os.environ.get("BROADCAST_URL", "memory://")
+
+SUBSCRIBE_TIMEOUT = 5.0
+
+Handler = Callable[[str], Awaitable[None]]
+
+
+class BroadcastBackend:
+    def __init__(self):
+        self._handlers: dict[str, Handler] = {}
+
+    async def subscribe(self, channel: str, handler: Handler) -> None:
+        self._handlers[channel] = handler
+
+    def unsubscribe(self, channel: str) -> None:
+        self._handlers.pop(channel, None)
+
+    async def publish(self, channel: str, message: str) -> None:
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        pass
+
+    async def _deliver(self, channel: str, message: str) -> None:
+        handler = self._handlers.get(channel)
+        if handler is not None:
+            await handler(message)
+
+
+class MemoryBackend(BroadcastBackend):
+    async def publish(self, channel: str, message: str) -> None:
+        await self._deliver(channel, message)
+
+
+class UnixSocketBackend(BroadcastBackend):
+    """Client for the line-delimited JSON broker in realtime.broker.
+
+    Connects lazily on the running event loop and resubscribes every
+    channel after reconnecting.
+    """
+
+    def __init__(self, path: str):
+        super().__init__()
+        self.path = path
+        self._loop = None
+        self._lock = None
+        self._writer: asyncio.StreamWriter | None = None
+        self._reader_task: asyncio.Task | None = None
+        # Pending subscribe attempts per channel; the broker acks each "sub" in order
+        self._acks: dict[str, list[asyncio.Future]] = {}
+
+    async def _connection(self) -> asyncio.StreamWriter:
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop, self._lock, self._writer = loop, asyncio.Lock(), None
+            self._acks = {}
+
+        async with self._lock:
+            if self._writer is None or self._writer.is_closing():
+                reader, writer = await asyncio.open_unix_connection(self.path)
+                self._writer = writer
+                self._reader_task = loop.create_task(self._read(reader))
+                for channel in self._handlers:
+                    self._send({"op": "sub", "channel": channel})
+            return self._writer
+
+    def _send(self, frame: dict) -> None:
+        if self._writer is not None and not self._writer.is_closing():
+            self._writer.write(json.dumps(frame, separators=(",", ":")).encode() + b"\n")
+
+    async def _read(self, reader: asyncio.StreamReader) -> None:
+        while line := await reader.readline():
+            frame = json.loads(line)
+            if frame.get("subscribed"):
+                pending = self._acks.get(frame["channel"])
+                if pending:
+                    ack = pending.pop(0)
+                    if not ack.done():
+                        ack.set_result(None)
+                continue
+            try:
+                await self._deliver(frame["channel"], frame["message"])
+            except Exception:
+                # One failing handler must not stop delivery for the worker
+                pass
+
+    async def subscribe(self, channel: str, handler: Handler) -> None:
+        """Returns once the broker has registered the subscription.
+
+        Raises ConnectionError if the broker doesn't confirm it within
+        SUBSCRIBE_TIMEOUT.
+        """
+        # Connect first: a new connection resubscribes every known channel
+        await self._connection()
+        await super().subscribe(channel, handler)
+        ack = self._loop.create_future()
+        pending = self._acks.setdefault(channel, [])
+        pending.append(ack)
+        self._send({"op": "sub", "channel": channel})
+        try:
+            await asyncio.wait_for(ack, SUBSCRIBE_TIMEOUT)
+        except asyncio.TimeoutError:
+            raise ConnectionError(f"broker did not confirm the subscription to {channel}") from None
+        finally:
+            if ack in pending:
+                pending.remove(ack)
+            if not pending and self._acks.get(channel) is pending:
+                del self._acks[channel]
+
+    def unsubscribe(self, channel: str) -> None:
+        super().unsubscribe(channel)
+        self._send({"op": "unsub", "channel": channel})
+
+    async def publish(self, channel: str, message: str) -> None:
+        writer = await self._connection()
+        self._send({"op": "pub", "channel": channel, "message": message})
+        await writer.drain()
+
+    async def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        if self._reader_task is not None:
+            self._reader_task.cancel()
+            self._reader_task = None
+
+
+def backend_from_url(url: str = BROADCAST_URL) -> BroadcastBackend:
+    """``memory://`` or ``unix:///path/to/broker.sock``."""
+    if url.startswith("unix://"):
+        return UnixSocketBackend(url[len("unix://"):])
+    if url.startswith("memory://"):
+        return MemoryBackend()
+    raise ValueError(f"Unsupported BROADCAST_URL: {url}")
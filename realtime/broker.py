@@ -0,0 +1,75 @@
+"""Minimal pub/sub broker for running the app on several workers.
+
+Workers connect over a Unix socket and exchange newline-delimited JSON
+frames: {"op": "sub"|"unsub", "channel": ...} and
+{"op": "pub", "channel": ..., "message": "<frame>"}. Published messages are
+forwarded as {"channel": ..., "message": "<frame>"} to every connection
+subscribed to the channel, in the order the broker received them. A "sub"
+is acknowledged with {"channel": ..., "subscribed": true}.
+"""
+import asyncio
+import json
+import os
+from collections import defaultdict
+
+# A worker that stops reading is dropped rather than buffering without bound
+MAX_CLIENT_BUFFER = 8 * 1024 * 1024
+
+
+class Broker:
+    def __init__(self, path: str):
+        self.path = path
+        self.subscribers: dict[str, set[asyncio.StreamWriter]] = defaultdict(set)
+        self._server: asyncio.AbstractServer | None = None
+
+    async def start(self) -> None:
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self._server = await asyncio.start_unix_server(self._handle, self.path)
+
+    async def serve_forever(self) -> None:
+        await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        for writers in self.subscribers.values():
+            for writer in writers:
+                writer.close()
+        self.subscribers.clear()
+
+    def _drop(self, writer: asyncio.StreamWriter) -> None:
+        for channel in list(self.subscribers):
+            self.subscribers[channel].discard(writer)
+            if not self.subscribers[channel]:
+                del self.subscribers[channel]
+        writer.close()
+
+    def _publish(self, channel: str, message: str) -> None:
+        line = json.dumps({"channel": channel, "message": message}, separators=(",", ":")).encode() + b"\n"
+        for writer in list(self.subscribers.get(channel, ())):
+            if writer.transport.get_write_buffer_size() > MAX_CLIENT_BUFFER:
+                self._drop(writer)
+                continue
+            writer.write(line)
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while line := await reader.readline():
+                frame = json.loads(line)
+                op, channel = frame.get("op"), frame.get("channel")
+                if op == "sub":
+                    self.subscribers[channel].add(writer)
+                    writer.write(json.dumps({"channel": channel, "subscribed": True}).encode() + b"\n")
+                elif op == "unsub":
+                    self.subscribers.get(channel, set()).discard(writer)
+                elif op == "pub":
+                    self._publish(channel, frame.get("message"))
+        except (ConnectionError, ValueError):
+            pass
+        finally:
+            self._drop(writer)
@@ -0,0 +1,17 @@
+"""Encode a broadcast payload once into the text frame every socket gets.
+
+orjson is used when installed; otherwise the stdlib encoder, producing the
+same compact output Starlette's send_json would.
+"""
+import json
+
+try:
+    import orjson
+except ImportError:  # optional speedup
+    orjson = None
+
+
+def encode_frame(message: dict) -> str:
+    if orjson is not None:
+        return orjson.dumps(message).decode()
+    return json.dumps(message, separators=(",", ":"), ensure_ascii=False)
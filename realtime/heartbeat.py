@@ -0,0 +1,54 @@
+"""Server-driven heartbeats and the idle-connection reaper.
+
+Every HEARTBEAT_INTERVAL seconds each managed socket is sent a
+{"type": "ping"} frame; clients answer with {"type": "pong"}, and any
+inbound frame counts as activity. Sockets with no activity for
+IDLE_TIMEOUT seconds, or whose writer has already failed, are closed and
+unregistered.
+"""
+import asyncio
+import logging
+import os
+import time
+
+from realtime.frames import encode_frame
+
+HEARTBEAT_INTERVAL = float(os.environ.get("WS_HEARTBEAT_INTERVAL_S", "25"))
+IDLE_TIMEOUT = float(os.environ.get("WS_IDLE_TIMEOUT_S", "75"))
+
+CLOSE_GOING_AWAY = 1001
+
+PING_FRAME = encode_frame({"type": "ping"})
+
+logger = logging.getLogger(__name__)
+
+
+class Reaper:
+    def __init__(self, managers, interval: float = HEARTBEAT_INTERVAL, idle_timeout: float = IDLE_TIMEOUT):
+        self.managers = list(managers)
+        self.interval = interval
+        self.idle_timeout = idle_timeout
+        self.total_reaped = 0
+
+    def sweep(self, now: float | None = None) -> int:
+        """Ping live sockets and reap stale ones; returns how many were reaped."""
+        now = time.monotonic() if now is None else now
+        reaped = 0
+
+        for manager in self.managers:
+            for websocket, last_seen in list(manager.last_seen.items()):
+                send_queue = manager.send_queues.get(websocket)
+                stale = now - last_seen > self.idle_timeout
+                if stale or send_queue is None or not send_queue.offer(PING_FRAME):
+                    manager.reap(websocket, CLOSE_GOING_AWAY)
+                    reaped += 1
+
+        self.total_reaped += reaped
+        if reaped:
+            logger.info("Reaped %d idle websocket(s)", reaped)
+        return reaped
+
+    async def run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            self.sweep()
@@ -0,0 +1,79 @@
+"""In-memory index of this worker's sockets by room, with presence.
+
+Adding or removing a socket is O(1); a room's entry disappears with its
+last socket. Presence counts each persona once however many tabs it has
+open in the room.
+"""
+from collections import Counter
+from typing import Hashable, NamedTuple
+
+from fastapi import WebSocket
+
+
+class Presence(NamedTuple):
+    persona_id: int
+    name: str
+    is_verified: bool
+    is_public: bool
+
+
+class RoomRegistry:
+    def __init__(self):
+        self._rooms: dict[Hashable, set[WebSocket]] = {}
+        self._owners: dict[WebSocket, tuple[Hashable, Presence | None]] = {}
+        self._online: dict[Hashable, Counter] = {}
+
+    def add(self, room: Hashable, websocket: WebSocket, presence: Presence | None = None) -> bool:
+        """Register a socket; True when it is the room's first."""
+        sockets = self._rooms.setdefault(room, set())
+        first = not sockets
+        sockets.add(websocket)
+        self._owners[websocket] = (room, presence)
+        if presence is not None:
+            self._online.setdefault(room, Counter())[presence] += 1
+        return first
+
+    def remove(self, websocket: WebSocket) -> tuple[Hashable, bool] | None:
+        """Unregister a socket; returns (room, room_now_empty) or None."""
+        owner = self._owners.pop(websocket, None)
+        if owner is None:
+            return None
+        room, presence = owner
+
+        sockets = self._rooms[room]
+        sockets.discard(websocket)
+
+        if presence is not None:
+            online = self._online[room]
+            online[presence] -= 1
+            if online[presence] <= 0:
+                del online[presence]
+            if not online:
+                del self._online[room]
+
+        if not sockets:
+            del self._rooms[room]
+            return room, True
+        return room, False
+
+    def sockets(self, room: Hashable) -> tuple[WebSocket, ...]:
+        return tuple(self._rooms.get(room, ()))
+
+    def has_room(self, room: Hashable) -> bool:
+        return room in self._rooms
+
+    def room_of(self, websocket: WebSocket) -> Hashable | None:
+        owner = self._owners.get(websocket)
+        return owner[0] if owner else None
+
+    def online(self, room: Hashable) -> list[Presence]:
+        return sorted(self._online.get(room, ()), key=lambda p: (p.name.lower(), p.persona_id))
+
+    def online_ids(self, room: Hashable) -> set[int]:
+        return {p.persona_id for p in self._online.get(room, ())}
+
+    def rooms(self) -> list[Hashable]:
+        return list(self._rooms)
+
+    def __contains__(self, websocket: WebSocket) -> bool:
+        return websocket in self._owners
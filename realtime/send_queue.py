@@ -0,0 +1,96 @@
+"""Per-connection outbound queues for websocket fan-out.
+
+Each socket gets a bounded buffer drained by its own writer task, so
+broadcasting is a non-blocking append and one slow client only ever delays
+itself. When a client's buffer is full, SLOW_CLIENT_POLICY decides what
+happens: "drop_oldest" discards its oldest undelivered message, while
+"disconnect" closes the socket with 1013 (try again later). A queue can
+start held, so a reconnecting client's replay goes out ahead of live
+frames that arrived while it was being built.
+"""
+import asyncio
+import os
+from collections import deque
+
+from fastapi import WebSocket
+
+SEND_QUEUE_SIZE = int(os.environ.get("WS_SEND_QUEUE_SIZE", "256"))
+SLOW_CLIENT_POLICY = os.environ.get("WS_SLOW_CLIENT_POLICY", "drop_oldest")
+
+DROP_OLDEST = "drop_oldest"
+DISCONNECT = "disconnect"
+
+CLOSE_TRY_AGAIN_LATER = 1013
+
+
+class SendQueue:
+    def __init__(
+        self,
+        websocket: WebSocket,
+        maxsize: int = SEND_QUEUE_SIZE,
+        policy: str = SLOW_CLIENT_POLICY,
+        held: bool = False,
+    ):
+        if policy not in (DROP_OLDEST, DISCONNECT):
+            raise ValueError(f"Unknown slow client policy: {policy}")
+
+        self.websocket = websocket
+        self.maxsize = maxsize
+        self.policy = policy
+        self.closed = False
+        self.dropped = 0
+        self.held = held
+
+        self._buffer: deque = deque()
+        self._ready = asyncio.Event()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def offer(self, frame: str) -> bool:
+        """Queue an encoded text frame; False once the connection should be dropped."""
+        if self.closed:
+            return False
+
+        if len(self._buffer) >= self.maxsize:
+            if self.policy == DISCONNECT:
+                self.close(code=CLOSE_TRY_AGAIN_LATER)
+                return False
+            self._buffer.popleft()
+            self.dropped += 1
+
+        self._buffer.append(frame)
+        if not self.held:
+            self._ready.set()
+        return True
+
+    def release(self, frames: list[str] = ()) -> None:
+        """Start sending; ``frames`` go out ahead of anything queued while held."""
+        self._buffer.extendleft(reversed(frames))
+        self.held = False
+        self._ready.set()
+
+    def close(self, code: int | None = None) -> None:
+        if self.closed and code is None:
+            return
+        self.closed = True
+        self._task.cancel()
+        if code is not None:
+            asyncio.get_running_loop().create_task(self._close_socket(code))
+
+    async def _close_socket(self, code: int) -> None:
+        try:
+            await self.websocket.close(code=code)
+        except Exception:
+            pass
+
+    async def _run(self) -> None:
+        try:
+            while True:
+                await self._ready.wait()
+                while self._buffer:
+                    await self.websocket.send_text(self._buffer.popleft())
+                self._ready.clear()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # The socket is gone; the manager drops it on the next offer
+            self.closed = True
@@ -1,61 +1,90 @@
-from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from sqlalchemy.orm import Session
 
-from database import get_db
+from database import get_db, get_read_db
+from etags import compute_etag, etag_matches, not_modified
+from follows import PERSONA_ORDER, followers_query, following_query, mutuals_query
 import models
+from pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, count_rows, keyset_page
+from messaging.history import category_history, dm_history, history_payload
+from messaging.inbox import inbox_page, inbox_versions
+from routers.chat import get_active_persona_for_category, manager
+from security.identity_policy import IdentityPolicy
 
 router = APIRouter(prefix="/api", tags=["api"])
 
+MAX_HISTORY_PAGE = 100
 
-def is_persona_verified(db: Session, persona_id: int) -> bool:
-    return (
-        db.query(models.ExternalIdentity)
-        .filter(models.ExternalIdentity.persona_id == persona_id)
-        .first()
-        is not None
-    )
 
-
-def serialize_persona(db: Session, persona: models.Persona) -> dict:
+def serialize_persona(persona: models.Persona) -> dict:
+    # follower_count / following_count / mutual_count are the stored totals,
+    # private personas included. The followers, following and connections
+    # endpoints report *_count for the public personas they list instead.
     return {
         "id": persona.id,
         "name": persona.name,
         "category": persona.category,
         "description": persona.description,
         "is_public": bool(persona.is_public),
-        "is_verified": is_persona_verified(db, persona.id),
+        "is_verified": bool(persona.is_verified),
+        "follower_count": persona.follower_count,
+        "following_count": persona.following_count,
+        "mutual_count": persona.mutual_count,
     }
 
 
 @router.get("/personas/public")
-def list_public_personas(category: str | None = None, db: Session = Depends(get_db)):
+def list_public_personas(
+    request: Request,
+    response: Response,
+    category: str | None = None,
+    cursor: str | None = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: Session = Depends(get_read_db),
+):
     query = db.query(models.Persona).filter(models.Persona.is_public == True)
 
     if category:
         query = query.filter(models.Persona.category == category)
 
-    personas = query.order_by(models.Persona.name.asc()).all()
+    total = count_rows(query, models.Persona.id)
+    versions, _ = keyset_page(
+        query.with_entities(models.Persona.id, models.Persona.name, models.Persona.version),
+        PERSONA_ORDER, cursor, limit,
+    )
+    etag = compute_etag(total, [(p.id, p.version) for p in versions])
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
+    personas, next_cursor = keyset_page(query, PERSONA_ORDER, cursor, limit)
 
-    return [serialize_persona(db, p) for p in personas]
+    # The body stays a plain list; paging metadata travels in headers
+    response.headers["ETag"] = etag
+    response.headers["X-Total-Count"] = str(total)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+
+    return [serialize_persona(p) for p in personas]
 
 
 @router.get("/personas/public/{persona_id}")
-def get_public_persona(persona_id: int, db: Session = Depends(get_db)):
-    persona = (
-        db.query(models.Persona)
+def get_public_persona(
+    persona_id: int, request: Request, response: Response, db: Session = Depends(get_db),
+):
+    version = (
+        db.query(models.Persona.version)
         .filter(models.Persona.id == persona_id)
         .filter(models.Persona.is_public == True)
-        .first()
+        .scalar()
     )
 
-    if not persona:
+    if version is None:
         raise HTTPException(status_code=404, detail="Public persona not found")
 
-    return serialize_persona(db, persona)
-
+    etag = compute_etag(persona_id, version)
+    if etag_matches(request, etag):
+        return not_modified(etag)
 
-@router.get("/personas/public/{persona_id}/connections")
-def get_public_persona_connections(persona_id: int, db: Session = Depends(get_db)):
     persona = (
         db.query(models.Persona)
         .filter(models.Persona.id == persona_id)
@@ -66,46 +95,36 @@ def get_public_persona_connections(persona_id: int, db: Session = Depends(get_db
     if not persona:
         raise HTTPException(status_code=404, detail="Public persona not found")
 
-    # Following
-    following = (
-        db.query(models.Persona)
-        .join(
-            models.PersonaFollow,
-            models.PersonaFollow.following_persona_id == models.Persona.id
-        )
-        .filter(models.PersonaFollow.follower_persona_id == persona.id)
-        .filter(models.Persona.is_public == True)
-        .all()
-    )
+    response.headers["ETag"] = etag
+    return serialize_persona(persona)
+
 
-    # Followers
-    followers = (
+@router.get("/personas/public/{persona_id}/connections")
+def get_public_persona_connections(
+    persona_id: int,
+    cursor: str | None = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: Session = Depends(get_db),
+):
+    persona = (
         db.query(models.Persona)
-        .join(
-            models.PersonaFollow,
-            models.PersonaFollow.follower_persona_id == models.Persona.id
-        )
-        .filter(models.PersonaFollow.following_persona_id == persona.id)
+        .filter(models.Persona.id == persona_id)
         .filter(models.Persona.is_public == True)
-        .all()
+        .first()
     )
 
-    following_ids = {p.id for p in following}
-    follower_ids = {p.id for p in followers}
-    connection_ids = following_ids.intersection(follower_ids)
+    if not persona:
+        raise HTTPException(status_code=404, detail="Public persona not found")
 
-    connections = (
-        db.query(models.Persona)
-        .filter(models.Persona.id.in_(connection_ids))
-        .filter(models.Persona.is_public == True)
-        .all()
-        if connection_ids else []
-    )
+    # Mutual follows, resolved in one self-join instead of two full lists
+    connections_query = mutuals_query(db, persona.id).filter(models.Persona.is_public == True)
+    connections, next_cursor = keyset_page(connections_query, PERSONA_ORDER, cursor, limit)
 
     return {
         "persona_id": persona.id,
-        "connections_count": len(connections),
-        "connections": [serialize_persona(db, p) for p in connections],
+        "connections_count": count_rows(connections_query, models.Persona.id),
+        "connections": [serialize_persona(p) for p in connections],
+        "next_cursor": next_cursor,
     }
 
 
@@ -145,19 +164,26 @@ def get_persona_verification_status(persona_id: int, request: Request, db: Sessi
 
 
 @router.get("/notifications")
-def get_notifications(request: Request, db: Session = Depends(get_db)):
+def get_notifications(request: Request, response: Response, db: Session = Depends(get_db)):
     user_id = request.session.get("user_id")
     if not user_id:
         raise HTTPException(status_code=401, detail="Not authenticated")
 
-    notifications = (
+    query = (
         db.query(models.Notification)
         .filter(models.Notification.user_id == user_id)
         .order_by(models.Notification.id.desc())
         .limit(50)
-        .all()
     )
 
+    versions = query.with_entities(models.Notification.id, models.Notification.version).all()
+    etag = compute_etag(user_id, [tuple(v) for v in versions])
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
+    notifications = query.all()
+    response.headers["ETag"] = etag
+
     return [
         {
             "id": n.id,
@@ -166,6 +192,7 @@ def get_notifications(request: Request, db: Session = Depends(get_db)):
             "message": n.message,
             "link": n.link,
             "is_read": bool(n.is_read),
+            "count": n.item_count,
             "created_at": n.created_at.isoformat(timespec="seconds"),
         }
         for n in notifications
@@ -173,72 +200,145 @@ def get_notifications(request: Request, db: Session = Depends(get_db)):
 
 
 @router.get("/dm/threads")
-def get_dm_threads(request: Request, db: Session = Depends(get_db)):
+def get_dm_threads(
+    request: Request,
+    response: Response,
+    cursor: str | None = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: Session = Depends(get_read_db),
+):
     user_id = request.session.get("user_id")
     if not user_id:
         raise HTTPException(status_code=401, detail="Not authenticated")
 
-    personas = (
-        db.query(models.Persona)
-        .filter(models.Persona.user_id == user_id)
-        .all()
-    )
-    persona_ids = [p.id for p in personas]
-
-    if not persona_ids:
-        return []
-
-    threads = (
-        db.query(models.DMThread)
-        .filter(
-            (models.DMThread.persona_a_id.in_(persona_ids)) |
-            (models.DMThread.persona_b_id.in_(persona_ids))
-        )
-        .order_by(models.DMThread.id.desc())
-        .all()
-    )
-
-    payload = []
-
-    for t in threads:
-        if t.persona_a_id in persona_ids:
-            my_persona_id = t.persona_a_id
-            other_id = t.persona_b_id
-        else:
-            my_persona_id = t.persona_b_id
-            other_id = t.persona_a_id
+    etag = compute_etag(user_id, inbox_versions(db, user_id, cursor, limit))
+    if etag_matches(request, etag):
+        return not_modified(etag)
 
-        my_persona = db.query(models.Persona).filter(models.Persona.id == my_persona_id).first()
-        other = db.query(models.Persona).filter(models.Persona.id == other_id).first()
+    threads, next_cursor = inbox_page(db, user_id, cursor, limit)
+    response.headers["ETag"] = etag
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
 
-        last_message = (
-            db.query(models.DMMessage)
-            .filter(models.DMMessage.thread_id == t.id)
-            .order_by(models.DMMessage.id.desc())
-            .first()
-        )
-
-        payload.append({
-            "thread_id": t.id,
+    return [
+        {
+            "thread_id": t.thread_id,
             "category": t.category,
             "my_persona": {
-                "id": my_persona.id,
-                "name": my_persona.name,
-            } if my_persona else None,
+                "id": t.my_persona.id,
+                "name": t.my_persona.name,
+            },
             "other_persona": {
-                "id": other.id,
-                "name": other.name,
-                "is_verified": is_persona_verified(db, other.id),
-            } if other else None,
+                "id": t.other_persona.id,
+                "name": t.other_persona.name,
+                "is_verified": t.other_persona.is_verified,
+            },
             "last_message": {
-                "id": last_message.id,
-                "content": last_message.content,
-                "created_at": last_message.created_at.isoformat(timespec="seconds"),
-                "sender_persona_id": last_message.sender_persona_id,
-            } if last_message else None
-        })
+                "id": t.last_message.id,
+                "content": t.last_message.content,
+                "created_at": t.last_message.created_at.isoformat(timespec="seconds"),
+                "sender_persona_id": t.last_message.sender_persona_id,
+            } if t.last_message else None,
+        }
+        for t in threads
+    ]
 
-    return payload
+def history_page(rows, limit: int, viewer_persona_id: int, after_id: int | None) -> dict:
+    has_more = len(rows) > limit
+    if has_more:
+        # One extra row was fetched to detect another page in this direction
+        rows = rows[:limit] if after_id is not None else rows[1:]
+
+    return {
+        "messages": [history_payload(row, viewer_persona_id) for row in rows],
+        "has_more": has_more,
+        "next_before_id": rows[0].id if rows else None,
+        "next_after_id": rows[-1].id if rows else after_id,
+    }
+
+
+def check_cursors(before_id: int | None, after_id: int | None):
+    if before_id is not None and after_id is not None:
+        raise HTTPException(status_code=400, detail="Use either before_id or after_id")
+
+
+@router.get("/chats/{category}/messages")
+def get_category_messages(
+    category: str,
+    request: Request,
+    before_id: int | None = None,
+    after_id: int | None = None,
+    limit: int = Query(50, ge=1, le=MAX_HISTORY_PAGE),
+    db: Session = Depends(get_read_db),
+):
+    check_cursors(before_id, after_id)
+
+    category = IdentityPolicy.normalize_category(category)
+    user_id, persona = get_active_persona_for_category(request, db, category)
+    if not user_id:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    if not persona:
+        raise HTTPException(status_code=403, detail="Not allowed")
+
+    rows = category_history(db, category, limit=limit + 1, before_id=before_id, after_id=after_id)
+    return history_page(rows, limit, persona.id, after_id)
+
+
+@router.get("/chats/{category}/presence")
+def get_category_presence(
+    category: str,
+    request: Request,
+    db: Session = Depends(get_read_db),
+):
+    # Served from the socket registry; the active persona usually comes from persona_cache
+    category = IdentityPolicy.normalize_category(category)
+    user_id, persona = get_active_persona_for_category(request, db, category)
+    if not user_id:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    if not persona:
+        raise HTTPException(status_code=403, detail="Not allowed")
+
+    online = manager.online(category)
+    return {
+        "category": category,
+        "count": len(online),
+        "online": [
+            {"id": p.persona_id, "name": p.name, "is_verified": p.is_verified}
+            for p in online
+        ],
+    }
+
+
+@router.get("/dm/{thread_id}/messages")
+def get_dm_messages(
+    thread_id: int,
+    request: Request,
+    before_id: int | None = None,
+    after_id: int | None = None,
+    limit: int = Query(50, ge=1, le=MAX_HISTORY_PAGE),
+    db: Session = Depends(get_read_db),
+):
+    check_cursors(before_id, after_id)
+
+    user_id = request.session.get("user_id")
+    if not user_id:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+
+    thread = db.query(models.DMThread).filter(models.DMThread.id == thread_id).first()
+    if not thread:
+        raise HTTPException(status_code=404, detail="Thread not found")
+
+    my_persona = (
+        db.query(models.Persona)
+        .filter(models.Persona.user_id == user_id)
+        .filter(models.Persona.id.in_([thread.persona_a_id, thread.persona_b_id]))
+        .first()
+    )
+    if not my_persona or not IdentityPolicy.can_access_dm(my_persona, thread):
+        raise HTTPException(status_code=403, detail="Not allowed")
+
+    rows = dm_history(db, thread.id, limit=limit + 1, before_id=before_id, after_id=after_id)
+    return history_page(rows, limit, my_persona.id, after_id)
 
 @router.get("/personas/me")
 def get_my_personas(request: Request, db: Session = Depends(get_db)):
@@ -253,11 +353,17 @@ def get_my_personas(request: Request, db: Session = Depends(get_db)):
         .all()
     )
 
-    return [serialize_persona(db, p) for p in personas]
+    return [serialize_persona(p) for p in personas]
 
 
 @router.get("/personas/{persona_id}/followers")
-def get_persona_followers(persona_id: int, db: Session = Depends(get_db)):
+def get_persona_followers(
+    persona_id: int,
+    request: Request,
+    cursor: str | None = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: Session = Depends(get_db),
+):
     persona = (
         db.query(models.Persona)
         .filter(models.Persona.id == persona_id)
@@ -267,31 +373,33 @@ def get_persona_followers(persona_id: int, db: Session = Depends(get_db)):
     if not persona:
         raise HTTPException(status_code=404, detail="Persona not found")
 
-    # Only expose followers publicly if the persona itself is public
-    if not persona.is_public:
+    # Only expose followers publicly if the persona itself is public; the
+    # owner sees the whole list, private personas included
+    is_owner = request.session.get("user_id") == persona.user_id
+    if not persona.is_public and not is_owner:
         raise HTTPException(status_code=403, detail="Persona is private")
 
-    followers = (
-        db.query(models.Persona)
-        .join(
-            models.PersonaFollow,
-            models.PersonaFollow.follower_persona_id == models.Persona.id
-        )
-        .filter(models.PersonaFollow.following_persona_id == persona.id)
-        .filter(models.Persona.is_public == True)
-        .order_by(models.Persona.name.asc())
-        .all()
-    )
+    visible_followers = followers_query(db, persona.id)
+    if not is_owner:
+        visible_followers = visible_followers.filter(models.Persona.is_public == True)
+    followers, next_cursor = keyset_page(visible_followers, PERSONA_ORDER, cursor, limit)
 
     return {
         "persona_id": persona.id,
-        "followers_count": len(followers),
-        "followers": [serialize_persona(db, p) for p in followers],
+        "followers_count": count_rows(visible_followers, models.Persona.id),
+        "followers": [serialize_persona(p) for p in followers],
+        "next_cursor": next_cursor,
     }
 
 
 @router.get("/personas/{persona_id}/following")
-def get_persona_following(persona_id: int, db: Session = Depends(get_db)):
+def get_persona_following(
+    persona_id: int,
+    request: Request,
+    cursor: str | None = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: Session = Depends(get_db),
+):
     persona = (
         db.query(models.Persona)
         .filter(models.Persona.id == persona_id)
@@ -301,26 +409,22 @@ def get_persona_following(persona_id: int, db: Session = Depends(get_db)):
     if not persona:
         raise HTTPException(status_code=404, detail="Persona not found")
 
-    # Only expose following publicly if the persona itself is public
-    if not persona.is_public:
+    # Only expose following publicly if the persona itself is public; the
+    # owner sees the whole list, private personas included
+    is_owner = request.session.get("user_id") == persona.user_id
+    if not persona.is_public and not is_owner:
         raise HTTPException(status_code=403, detail="Persona is private")
 
-    following = (
-        db.query(models.Persona)
-        .join(
-            models.PersonaFollow,
-            models.PersonaFollow.following_persona_id == models.Persona.id
-        )
-        .filter(models.PersonaFollow.follower_persona_id == persona.id)
-        .filter(models.Persona.is_public == True)
-        .order_by(models.Persona.name.asc())
-        .all()
-    )
+    visible_following = following_query(db, persona.id)
+    if not is_owner:
+        visible_following = visible_following.filter(models.Persona.is_public == True)
+    following, next_cursor = keyset_page(visible_following, PERSONA_ORDER, cursor, limit)
 
     return {
         "persona_id": persona.id,
-        "following_count": len(following),
-        "following": [serialize_persona(db, p) for p in following],
+        "following_count": count_rows(visible_following, models.Persona.id),
+        "following": [serialize_persona(p) for p in following],
+        "next_cursor": next_cursor,
     }
 
 
@@ -5,6 +5,8 @@ from sqlalchemy.orm import Session
 import models
 from database import get_db
 from security.oauth import oauth
+from persona_cache import persona_cache
+from security.verification import mark_identity_linked
 
 router = APIRouter()
 
@@ -68,7 +70,9 @@ async def google_link_callback(request: Request, db: Session = Depends(get_db)):
     )
 
     db.add(identity)
+    mark_identity_linked(persona, provider)
     db.commit()
+    persona_cache.invalidate(persona.id)
     db.refresh(identity)
 
     print("CALLBACK saved identity id =", identity.id)
@@ -1,19 +1,34 @@
+import time
+
 from fastapi import APIRouter, Request, Form, Depends
 from fastapi.responses import HTMLResponse, RedirectResponse
 from fastapi.templating import Jinja2Templates
 from sqlalchemy.orm import Session
 
 from fastapi import WebSocket, WebSocketDisconnect
-from collections import defaultdict
 
 import models
-from database import SessionLocal, get_db
-
+from database import AsyncSessionLocal, get_db
+from persona_cache import persona_cache
+
+from messaging.history import category_history, dm_history, history_payload
+from messaging.inbox import inbox_page
+from messaging.notifications import DMNotificationCoalescer
+from messaging.recent import RecentMessages
+from messaging.write_queue import MessageWriteQueue
+from realtime.backends import BroadcastBackend, backend_from_url
+from realtime.frames import encode_frame
+from realtime.heartbeat import Reaper
+from realtime.registry import Presence, RoomRegistry
+from realtime.send_queue import CLOSE_TRY_AGAIN_LATER, SendQueue
 from security.identity_policy import IdentityPolicy
 
 router = APIRouter()
 templates = Jinja2Templates(directory="templates")
 
+# Messages rendered with the page; older ones load through /api/.../messages
+INITIAL_HISTORY = 50
+
 """
 def get_db():
     db = SessionLocal()
@@ -22,59 +37,185 @@ def get_db():
     finally:
         db.close()
 """
-def is_persona_verified(db: Session, persona_id: int) -> bool:
-    return (
-        db.query(models.ExternalIdentity)
-        .filter(models.ExternalIdentity.persona_id == persona_id)
-        .first()
-        is not None
-    )
-
 class ConnectionManager:
-    def __init__(self):
-        self.active_connections = defaultdict(list) 
-
-    async def connect(self, category: str, websocket: WebSocket):
+    """Sockets connected to this worker, fanned out through a broadcast backend.
+
+    broadcast() encodes the message once and publishes the frame to the
+    backend; every worker holding sockets for the key (this one included)
+    hands that frame to each socket's SendQueue without waiting for the
+    client.
+    """
+    channel_prefix = "room"
+
+    def __init__(self, backend: BroadcastBackend, recent: RecentMessages | None = None):
+        self.backend = backend
+        self.recent = recent
+        self.registry = RoomRegistry()
+        self.send_queues: dict[WebSocket, SendQueue] = {}
+        self.last_seen: dict[WebSocket, float] = {}
+        # Keys whose backend subscription completed; a failed subscribe
+        # leaves the key out so the room's next socket retries it
+        self.subscribed: set = set()
+
+    def channel(self, key) -> str:
+        return f"{self.channel_prefix}:{key}"
+
+    async def connect(
+        self, key, websocket: WebSocket, presence: Presence | None = None, held: bool = False,
+    ):
+        """Register a socket; with ``held`` nothing is sent until resume().
+
+        If the backend can't subscribe the room, the socket is closed and
+        unregistered and the error propagates.
+        """
         await websocket.accept()
-        self.active_connections[category].append(websocket)
-
-    def disconnect(self, category: str, websocket: WebSocket):
-        if websocket in self.active_connections[category]:
-            self.active_connections[category].remove(websocket)
+        self.send_queues[websocket] = SendQueue(websocket, held=held)
+        self.touch(websocket)
+        self.registry.add(key, websocket, presence)
+        if key in self.subscribed:
+            return
 
-    async def broadcast(self, category: str, message: dict):
-        dead = []
-        for connection in self.active_connections[category]:
-            try:
-                await connection.send_json(message)
-            except Exception:
-                dead.append(connection)
+        try:
+            await self.backend.subscribe(self.channel(key), lambda frame: self.deliver(key, frame))
+        except Exception:
+            self.reap(websocket, CLOSE_TRY_AGAIN_LATER)
+            if not self.registry.has_room(key):
+                self.backend.unsubscribe(self.channel(key))
+            raise
+        if self.registry.has_room(key):
+            self.subscribed.add(key)
+        else:
+            # Every socket left while the subscribe was in flight
+            self.backend.unsubscribe(self.channel(key))
+
+    def touch(self, websocket: WebSocket):
+        """Record inbound activity; the reaper closes sockets that go quiet."""
+        if websocket in self.send_queues:
+            self.last_seen[websocket] = time.monotonic()
+
+    def reap(self, websocket: WebSocket, code: int):
+        """Close a socket from the server side and unregister it."""
+        send_queue = self.send_queues.get(websocket)
+        if send_queue is not None:
+            send_queue.close(code=code)
+        self.disconnect(self.registry.room_of(websocket), websocket)
+
+    def disconnect(self, key, websocket: WebSocket):
+        self.last_seen.pop(websocket, None)
+        send_queue = self.send_queues.pop(websocket, None)
+        if send_queue is not None:
+            send_queue.close()
+
+        removed = self.registry.remove(websocket)
+        if removed is not None and removed[1]:
+            if removed[0] in self.subscribed:
+                self.subscribed.discard(removed[0])
+                self.backend.unsubscribe(self.channel(removed[0]))
+            if self.recent is not None:
+                self.recent.forget(removed[0])
+
+    def resume(self, websocket: WebSocket, frames: list[str]):
+        send_queue = self.send_queues.get(websocket)
+        if send_queue is not None:
+            send_queue.release(frames)
+
+    def online(self, key) -> list[Presence]:
+        """Public personas with an open socket for ``key``.
+
+        Presence is per worker with either broadcast backend: the broker
+        relays messages, not registries, so with several workers each one
+        reports only the sockets it holds.
+        """
+        return [p for p in self.registry.online(key) if p.is_public]
+
+    async def broadcast(self, key, message: dict):
+        await self.backend.publish(self.channel(key), encode_frame(message))
+
+    async def deliver(self, key, frame: str):
+        if self.recent is not None:
+            self.recent.record(key, frame)
+        for connection in self.registry.sockets(key):
+            send_queue = self.send_queues.get(connection)
+            if send_queue is None or not send_queue.offer(frame):
+                self.disconnect(key, connection)
+
+broadcast_backend = backend_from_url()
+manager = ConnectionManager(broadcast_backend, RecentMessages())
+
+def initial_history(room_key: str, load_history) -> tuple[list, bool]:
+    """Newest INITIAL_HISTORY rows for a page render and whether older exist.
+
+    Served from the room's ring buffer when warm. Otherwise queried, and the
+    result seeds the buffer if this worker is subscribed to the room, since
+    only then do later messages keep it current.
+    """
+    cached = manager.recent.latest(room_key, INITIAL_HISTORY)
+    if cached is not None:
+        return cached
+
+    rows = load_history(INITIAL_HISTORY + 1)
+    has_older = len(rows) > INITIAL_HISTORY
+    rows = rows[-INITIAL_HISTORY:]
+
+    if room_key in manager.subscribed:
+        manager.recent.seed(room_key, rows, has_older)
+    return rows, has_older
+
+# Most messages replayed to a reconnecting socket; past this it reloads
+REPLAY_LIMIT = 200
+RESYNC_FRAME = encode_frame({"type": "resync"})
+
+async def replay_frames(room_key: str, after_id: int, load_history) -> list[str]:
+    """Frames a client reconnecting after ``after_id`` missed, oldest first.
+
+    Served from the room's in-memory window when it covers the gap,
+    otherwise from an (room, id) range query.
+    """
+    frames = manager.recent.since(room_key, after_id)
+    if frames is None:
+        async with AsyncSessionLocal() as db:
+            rows = await db.run_sync(
+                lambda session: load_history(session, limit=REPLAY_LIMIT + 1, after_id=after_id)
+            )
+        frames = [encode_frame(history_payload(row, None)) for row in rows]
 
-        for connection in dead:
-            self.disconnect(category, connection)
+    if len(frames) > REPLAY_LIMIT:
+        return [RESYNC_FRAME]
+    return frames
 
-manager = ConnectionManager()
+# Looked up at flush time so the session factory can be swapped in tests
+category_writes = MessageWriteQueue(lambda: AsyncSessionLocal())
 
 @router.websocket("/ws/chats/{category}/{persona_id}")
-async def websocket_category_chat(websocket: WebSocket, category: str, persona_id: int):
-    db = SessionLocal()
+async def websocket_category_chat(
+    websocket: WebSocket, category: str, persona_id: int, after_id: int | None = None,
+):
     category = category.strip().lower()
 
-    try:
-        persona = db.query(models.Persona).filter(models.Persona.id == persona_id).first()
+    # No session is held while the socket is open; see persona_cache
+    sender = await persona_cache.aget(AsyncSessionLocal, persona_id)
 
-        if not persona:
-            await websocket.close(code=1008)
-            return
+    if not sender:
+        await websocket.close(code=1008)
+        return
 
-        if not IdentityPolicy.can_enter_category(persona, category):
-            await websocket.close(code=1008)
-            return
+    if not IdentityPolicy.can_enter_category(sender, category):
+        await websocket.close(code=1008)
+        return
 
-        await manager.connect(category, websocket)
+    await manager.connect(
+        category, websocket, Presence(sender.id, sender.name, sender.is_verified, sender.is_public),
+        held=after_id is not None,
+    )
+    if after_id is not None:
+        manager.resume(websocket, await replay_frames(
+            category, after_id, lambda db, **page: category_history(db, category, **page),
+        ))
 
+    try:
         while True:
             data = await websocket.receive_json()
+            manager.touch(websocket)
             content = data.get("content", "").strip()
 
             if not content:
@@ -83,52 +224,63 @@ async def websocket_category_chat(websocket: WebSocket, category: str, persona_i
             if len(content) > 500:
                 content = content[:500]
 
-            msg = models.CategoryMessage(
+            sender = await persona_cache.aget(AsyncSessionLocal, sender.id)
+            if not sender or not IdentityPolicy.can_enter_category(sender, category):
+                manager.reap(websocket, 1008)
+                return
+
+            msg = await category_writes.submit(models.CategoryMessage(
                 category=category,
-                sender_persona_id=persona.id,
+                sender_persona_id=sender.id,
                 content=content
-            )
-            db.add(msg)
-            db.commit()
-            db.refresh(msg)
+            ))
 
             payload = {
                 "id": msg.id,
-                "sender_name": persona.name,
+                "sender_persona_id": sender.id,
+                "sender_name": sender.name,
                 "content": msg.content,
                 "created_at": msg.created_at.isoformat(timespec="seconds"),
                 "is_me": False,
-                "is_verified": is_persona_verified(db, persona.id),
+                "is_verified": sender.is_verified,
             }
 
             await manager.broadcast(category, payload)
 
     except WebSocketDisconnect:
         manager.disconnect(category, websocket)
-    finally:
-        db.close()
 
 @router.websocket("/ws/dm/{thread_id}/{persona_id}")
-async def websocket_dm_chat(websocket: WebSocket, thread_id: int, persona_id: int):
-    db = SessionLocal()
+async def websocket_dm_chat(
+    websocket: WebSocket, thread_id: int, persona_id: int, after_id: int | None = None,
+):
+    sender = await persona_cache.aget(AsyncSessionLocal, persona_id)
+    async with AsyncSessionLocal() as db:
+        thread = await db.get(models.DMThread, thread_id)
 
-    try:
-        persona = db.query(models.Persona).filter(models.Persona.id == persona_id).first()
-        thread = db.query(models.DMThread).filter(models.DMThread.id == thread_id).first()
+    if not sender or not thread:
+        await websocket.close(code=1008)
+        return
 
-        if not persona or not thread:
-            await websocket.close(code=1008)
-            return
+    if not IdentityPolicy.can_access_dm(sender, thread):
+        await websocket.close(code=1008)
+        return
 
-        if not IdentityPolicy.can_access_dm(persona, thread):
-            await websocket.close(code=1008)
-            return
+    # Participants never change, so the recipient is resolved once
+    other_persona_id = thread.persona_b_id if sender.id == thread.persona_a_id else thread.persona_a_id
+    recipient = await persona_cache.aget(AsyncSessionLocal, other_persona_id)
 
-        room_key = f"dm:{thread_id}"
-        await manager.connect(room_key, websocket)
+    room_key = f"dm:{thread_id}"
+    await manager.connect(room_key, websocket, held=after_id is not None)
+    if after_id is not None:
+        manager.resume(websocket, await replay_frames(
+            room_key, after_id, lambda db, **page: dm_history(db, thread_id, **page),
+        ))
 
+    try:
         while True:
             data = await websocket.receive_json()
+            manager.touch(websocket)
             content = data.get("content", "").strip()
 
             if not content:
@@ -137,59 +289,37 @@ async def websocket_dm_chat(websocket: WebSocket, thread_id: int, persona_id: in
             if len(content) > 500:
                 content = content[:500]
 
-            msg = models.DMMessage(
-                thread_id=thread.id,
-                sender_persona_id=persona.id,
-                content=content
-            )
-            db.add(msg)
-            db.commit()
-            db.refresh(msg)
-
-            other_persona_id = thread.persona_b_id if persona.id == thread.persona_a_id else thread.persona_a_id
-            other_persona = db.query(models.Persona).filter(models.Persona.id == other_persona_id).first()
-
-            if other_persona:
-                recipient_user_id = other_persona.user_id
-
-                notif = models.Notification(
-                    user_id=recipient_user_id,
-                    type="dm_message",
-                    title=f"New DM from {persona.name}",
-                    message=content,
-                    link=f"/dm/{thread.id}"
-                )
-                db.add(notif)
-                db.commit()
-                db.refresh(notif)
-
-                await notification_manager.send_to_user(
-                    recipient_user_id,
-                    {
-                        "id": notif.id,
-                        "type": notif.type,
-                        "title": notif.title,
-                        "message": notif.message,
-                        "link": notif.link,
-                        "created_at": notif.created_at.isoformat(timespec="seconds"),
-                    }
+            sender = await persona_cache.aget(AsyncSessionLocal, sender.id)
+            if not sender:
+                manager.reap(websocket, 1008)
+                return
+
+            async with AsyncSessionLocal() as db:
+                msg = models.DMMessage(
+                    thread_id=thread_id,
+                    sender_persona_id=sender.id,
+                    content=content
                 )
+                db.add(msg)
+                await db.commit()
+
+            if recipient:
+                dm_notifications.add(recipient.user_id, thread_id, sender.name, content)
 
             payload = {
                 "id": msg.id,
-                "sender_name": persona.name,
+                "sender_persona_id": sender.id,
+                "sender_name": sender.name,
                 "content": msg.content,
                 "created_at": msg.created_at.isoformat(timespec="seconds"),
                 "is_me": False,
-                "is_verified": is_persona_verified(db, persona.id),
+                "is_verified": sender.is_verified,
             }
 
             await manager.broadcast(room_key, payload)
 
     except WebSocketDisconnect:
-        manager.disconnect(f"dm:{thread_id}", websocket)
-    finally:
-        db.close()
+        manager.disconnect(room_key, websocket)
 
 @router.get("/chats", response_class=HTMLResponse)
 def chats_home(request: Request, db: Session = Depends(get_db)):
@@ -244,11 +374,7 @@ def chats_enter(
     category = category.strip().lower()
 
     # Security check: ensure persona belongs to the user AND matches chosen category
-    persona = (
-        db.query(models.Persona)
-        .filter(models.Persona.id == persona_id)
-        .first()
-    )
+    persona = persona_cache.get(db, persona_id)
 
     if not IdentityPolicy.can_use_persona(user_id, persona):
         return RedirectResponse(url="/chats", status_code=303)
@@ -271,7 +397,7 @@ def get_active_persona_for_category(request: Request, db: Session, category: str
     if not active_persona_id:
         return user_id, None
 
-    persona = db.query(models.Persona).filter(models.Persona.id == active_persona_id).first()
+    persona = persona_cache.get(db, active_persona_id)
 
     if not IdentityPolicy.can_use_persona(user_id, persona):
         return user_id, None
@@ -291,24 +417,9 @@ def chats_room(category: str, request: Request, db: Session = Depends(get_db)):
 
     category_norm = category.strip().lower()
 
-    rows = (
-        db.query(models.CategoryMessage, models.Persona.name)
-        .join(models.Persona, models.Persona.id == models.CategoryMessage.sender_persona_id)
-        .filter(models.CategoryMessage.category == category_norm)
-        .order_by(models.CategoryMessage.id.desc())
-        .limit(50)
-        .all()
+    rows, has_older = initial_history(
+        category_norm, lambda limit: category_history(db, category_norm, limit=limit)
     )
-    rows.reverse()
-
-    messages = [{
-        "id": m.id,
-        "sender_name": sender_name,
-        "content": m.content,
-        "created_at": m.created_at.isoformat(timespec="seconds"),
-        "is_me": (m.sender_persona_id == active_persona.id),
-        "is_verified": is_persona_verified(db, m.sender_persona_id),
-    } for m, sender_name in rows]
 
     people = (
     db.query(models.Persona)
@@ -320,12 +431,19 @@ def chats_room(category: str, request: Request, db: Session = Depends(get_db)):
     .all()
     )
 
+    messages = [history_payload(row, active_persona.id) for row in rows]
+
+    # Presence comes from this worker's socket registry, not the database
+    online = manager.online(category_norm)
+    online_ids = {p.persona_id for p in online}
+
     people_data = [
         {
             "id": p.id,
             "name": p.name,
             "description": p.description,
-            "is_verified": is_persona_verified(db, p.id),
+            "is_verified": bool(p.is_verified),
+            "is_online": p.id in online_ids,
         }
         for p in people
     ]
@@ -337,7 +455,9 @@ def chats_room(category: str, request: Request, db: Session = Depends(get_db)):
             "category": category_norm,
             "active_persona": {"id": active_persona.id, "name": active_persona.name},
             "messages": messages,
+            "has_older": has_older,
             "people": people_data,
+            "online_count": len(online),
         }
     )
 
@@ -355,8 +475,8 @@ def dm_start(
     if not active_persona_id:
         return RedirectResponse(url="/chats", status_code=303)
 
-    active = db.query(models.Persona).filter(models.Persona.id == active_persona_id).first()
-    target = db.query(models.Persona).filter(models.Persona.id == target_persona_id).first()
+    active = persona_cache.get(db, active_persona_id)
+    target = persona_cache.get(db, target_persona_id)
 
     if not IdentityPolicy.can_use_persona(user_id, active):
         return RedirectResponse(url="/chats", status_code=303)
@@ -400,7 +520,7 @@ def require_active_persona(request: Request, db: Session):
     if not active_persona_id:
         return user_id, None
 
-    persona = db.query(models.Persona).filter(models.Persona.id == active_persona_id).first()
+    persona = persona_cache.get(db, active_persona_id)
 
     if not IdentityPolicy.can_use_persona(user_id, persona):
         return user_id, None
@@ -408,61 +528,31 @@ def require_active_persona(request: Request, db: Session):
     return user_id, persona
 
 @router.get("/dm", response_class=HTMLResponse)
-def dm_inbox(request: Request, db: Session = Depends(get_db)):
+def dm_inbox(request: Request, cursor: str | None = None, db: Session = Depends(get_db)):
     user_id = request.session.get("user_id")
     if not user_id:
         return RedirectResponse(url="/login", status_code=303)
 
-    personas = (
-        db.query(models.Persona)
-        .filter(models.Persona.user_id == user_id)
-        .all()
-    )
-
-    persona_ids = [p.id for p in personas]
-
-    if not persona_ids:
-        return templates.TemplateResponse(
-            "dm_inbox.html",
-            {"request": request, "active_persona": None, "threads": []}
-        )
-
-    threads = (
-        db.query(models.DMThread)
-        .filter(
-            (models.DMThread.persona_a_id.in_(persona_ids)) |
-            (models.DMThread.persona_b_id.in_(persona_ids))
-        )
-        .order_by(models.DMThread.id.desc())
-        .limit(50)
-        .all()
-    )
-
-    items = []
-    for t in threads:
-        if t.persona_a_id in persona_ids:
-            my_persona_id = t.persona_a_id
-            other_id = t.persona_b_id
-        else:
-            my_persona_id = t.persona_b_id
-            other_id = t.persona_a_id
+    threads, next_cursor = inbox_page(db, user_id, cursor)
 
-        my_persona = db.query(models.Persona).filter(models.Persona.id == my_persona_id).first()
-        other = db.query(models.Persona).filter(models.Persona.id == other_id).first()
-
-        items.append({
-            "thread_id": t.id,
+    items = [
+        {
+            "thread_id": t.thread_id,
             "category": t.category,
-            "my_persona_name": my_persona.name if my_persona else "Unknown",
-            "other_name": other.name if other else "Unknown",
-        })
+            "my_persona_name": t.my_persona.name,
+            "other_name": t.other_persona.name,
+            "last_message": t.last_message.content if t.last_message else None,
+        }
+        for t in threads
+    ]
 
     return templates.TemplateResponse(
         "dm_inbox.html",
         {
             "request": request,
             "active_persona": request.session.get("active_persona_id"),
-            "threads": items
+            "threads": items,
+            "next_cursor": next_cursor,
         }
     )
 
@@ -476,33 +566,22 @@ def dm_thread(thread_id: int, request: Request, db: Session = Depends(get_db)):
     if not thread:
         return RedirectResponse(url="/dm", status_code=303)
 
-    # Load all personas belonging to this user
-    user_personas = (
-        db.query(models.Persona)
-        .filter(models.Persona.user_id == user_id)
-        .all()
-    )
-
-    persona_ids = [p.id for p in user_personas]
-
     # Determine which persona of the user participates in this thread
-    my_persona_id = None
-    if thread.persona_a_id in persona_ids:
-        my_persona_id = thread.persona_a_id
-    elif thread.persona_b_id in persona_ids:
-        my_persona_id = thread.persona_b_id
-
-    if not my_persona_id:
+    persona_a = persona_cache.get(db, thread.persona_a_id)
+    persona_b = persona_cache.get(db, thread.persona_b_id)
+
+    if IdentityPolicy.can_use_persona(user_id, persona_a):
+        active, other = persona_a, persona_b
+    elif IdentityPolicy.can_use_persona(user_id, persona_b):
+        active, other = persona_b, persona_a
+    else:
         return RedirectResponse(url="/dm", status_code=303)
 
+    my_persona_id = active.id
+
     # Automatically switch active persona
     request.session["active_persona_id"] = my_persona_id
 
-    active = db.query(models.Persona).filter(models.Persona.id == my_persona_id).first()
-
-    other_id = thread.persona_b_id if my_persona_id == thread.persona_a_id else thread.persona_a_id
-    other = db.query(models.Persona).filter(models.Persona.id == other_id).first()
-
     active_persona = active
 
     already_following = (
@@ -515,24 +594,11 @@ def dm_thread(thread_id: int, request: Request, db: Session = Depends(get_db)):
 
     can_follow = IdentityPolicy.can_follow_persona(active_persona, other)
 
-    rows = (
-        db.query(models.DMMessage, models.Persona.name)
-        .join(models.Persona, models.Persona.id == models.DMMessage.sender_persona_id)
-        .filter(models.DMMessage.thread_id == thread.id)
-        .order_by(models.DMMessage.id.desc())
-        .limit(50)
-        .all()
+    rows, has_older = initial_history(
+        f"dm:{thread.id}", lambda limit: dm_history(db, thread.id, limit=limit)
     )
-    rows.reverse()
 
-    messages = [{
-        "id": m.id,
-        "sender_name": sender_name,
-        "content": m.content,
-        "created_at": m.created_at.isoformat(timespec="seconds"),
-        "is_me": (m.sender_persona_id == my_persona_id),
-        "is_verified": is_persona_verified(db, m.sender_persona_id),
-    } for m, sender_name in rows]
+    messages = [history_payload(row, my_persona_id) for row in rows]
 
     return templates.TemplateResponse(
         "dm_thread.html",
@@ -543,37 +609,38 @@ def dm_thread(thread_id: int, request: Request, db: Session = Depends(get_db)):
             "active_persona": {"id": active.id, "name": active.name},
             "other_persona": other,
             "other_name": other.name if other else "Unknown",
-            "other_verified": is_persona_verified(db, other.id),
+            "other_verified": bool(other.is_verified),
             "messages": messages,
+            "has_older": has_older,
             "already_following": already_following,
             "can_follow": can_follow,
         }
     )
 
-class NotificationManager:
-    def __init__(self):
-        self.active_connections = defaultdict(list)  # user_id -> sockets
+class NotificationManager(ConnectionManager):
+    channel_prefix = "user"  # keyed by user_id
 
-    async def connect(self, user_id: int, websocket: WebSocket):
-        await websocket.accept()
-        self.active_connections[user_id].append(websocket)
+    async def send_to_user(self, user_id: int, payload: dict):
+        await self.broadcast(user_id, payload)
 
-    def disconnect(self, user_id: int, websocket: WebSocket):
-        if websocket in self.active_connections[user_id]:
-            self.active_connections[user_id].remove(websocket)
+notification_manager = NotificationManager(broadcast_backend)
+reaper = Reaper([manager, notification_manager])
 
-    async def send_to_user(self, user_id: int, payload: dict):
-        dead = []
-        for ws in self.active_connections[user_id]:
-            try:
-                await ws.send_json(payload)
-            except Exception:
-                dead.append(ws)
+def notification_payload(notif: models.Notification) -> dict:
+    return {
+        "id": notif.id,
+        "type": notif.type,
+        "title": notif.title,
+        "message": notif.message,
+        "link": notif.link,
+        "count": notif.item_count or 1,
+        "created_at": notif.created_at.isoformat(timespec="seconds"),
+    }
 
-        for ws in dead:
-            self.disconnect(user_id, ws)
+async def publish_notification(user_id: int, notif: models.Notification):
+    await notification_manager.send_to_user(user_id, notification_payload(notif))
 
-notification_manager = NotificationManager()
+dm_notifications = DMNotificationCoalescer(lambda: AsyncSessionLocal(), publish_notification)
 
 @router.websocket("/ws/notifications/{user_id}")
 async def websocket_notifications(websocket: WebSocket, user_id: int):
@@ -582,5 +649,6 @@ async def websocket_notifications(websocket: WebSocket, user_id: int):
     try:
         while True:
             await websocket.receive_text()
+            notification_manager.touch(websocket)
     except WebSocketDisconnect:
         notification_manager.disconnect(user_id, websocket)
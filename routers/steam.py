@@ -4,6 +4,8 @@ from sqlalchemy.orm import Session
 
 from database import get_db
 import models
+from persona_cache import persona_cache
+from security.verification import mark_identity_linked
 
 import requests
 import re
@@ -42,6 +44,10 @@ def steam_callback(request: Request, db: Session = Depends(get_db)):
     if not persona_id or not user_id:
         return RedirectResponse("/dashboard", status_code=303)
 
+    persona = db.query(models.Persona).filter(models.Persona.id == persona_id).first()
+    if not persona:
+        return RedirectResponse("/dashboard", status_code=303)
+
     # Get SteamID from OpenID response
     claimed_id = request.query_params.get("openid.claimed_id")
 
@@ -54,6 +60,17 @@ def steam_callback(request: Request, db: Session = Depends(get_db)):
 
     steam_id = match.group(1)
 
+    existing = (
+        db.query(models.ExternalIdentity)
+        .filter(models.ExternalIdentity.provider == "steam")
+        .filter(models.ExternalIdentity.provider_user_id == steam_id)
+        .first()
+    )
+
+    if existing:
+        request.session.pop("link_persona_id", None)
+        return RedirectResponse(f"/personas/{persona_id}", status_code=303)
+
     # Fetch profile from Steam API
     url = f"https://api.steampowered.com/ISteamUser/GetPlayerSummaries/v0002/?key={STEAM_API_KEY}&steamids={steam_id}"
     data = requests.get(url).json()
@@ -71,7 +88,9 @@ def steam_callback(request: Request, db: Session = Depends(get_db)):
     )
 
     db.add(identity)
+    mark_identity_linked(persona, "steam")
     db.commit()
+    persona_cache.invalidate(persona.id)
 
     request.session.pop("link_persona_id", None)
 
@@ -1,9 +1,11 @@
 from fastapi import APIRouter, Request, Form, Depends
 from fastapi.responses import HTMLResponse, RedirectResponse
 from fastapi.templating import Jinja2Templates
+from starlette.concurrency import run_in_threadpool
+from markupsafe import Markup
 from sqlalchemy.orm import Session
 
-from routers.chat import notification_manager
+from routers.chat import notification_manager, notification_payload
 
 from collections import defaultdict
 
@@ -13,11 +15,17 @@ import base64
 import pyotp
 import qrcode
 
-from database import SessionLocal, get_db
+from database import SessionLocal, get_db, get_read_db
 import models
+from follows import (
+    PERSONA_ORDER, add_follow, followers_query, following_query, mutuals_query, remove_follow,
+)
+from pagination import DEFAULT_PAGE_SIZE, keyset_page
+from persona_cache import FragmentCache, persona_cache
 from auth_utils import hash_password, verify_password
 
 from security.identity_policy import IdentityPolicy
+from security.verification import providers_from_mask
 
 router = APIRouter()
 templates = Jinja2Templates(directory="templates")
@@ -31,14 +39,6 @@ def get_db():
         db.close()
 """
 
-def is_persona_verified(db: Session, persona_id: int) -> bool:
-    return (
-        db.query(models.ExternalIdentity)
-        .filter(models.ExternalIdentity.persona_id == persona_id)
-        .first()
-        is not None
-    )
-
 @router.get("/mfa/setup", response_class=HTMLResponse)
 def mfa_setup(request: Request, db: Session = Depends(get_db)):
     user_id = require_user_id(request)
@@ -233,7 +233,7 @@ def register_user(
     return RedirectResponse(url="/dashboard", status_code=303)
 
 @router.get("/dashboard", response_class=HTMLResponse)
-def dashboard(request: Request, db: Session = Depends(get_db)):
+def dashboard(request: Request, db: Session = Depends(get_read_db)):
     user_id = request.session.get("user_id")
     if not user_id:
         return RedirectResponse(url="/login", status_code=303)
@@ -244,12 +244,6 @@ def dashboard(request: Request, db: Session = Depends(get_db)):
     grouped = defaultdict(list)
 
     for p in raw_personas:
-        identities = (
-            db.query(models.ExternalIdentity)
-            .filter(models.ExternalIdentity.persona_id == p.id)
-            .all()
-        )
-
         cat = (p.category or "other").lower()
         grouped[cat].append({
             "id": p.id,
@@ -257,8 +251,8 @@ def dashboard(request: Request, db: Session = Depends(get_db)):
             "category": p.category,
             "description": p.description,
             "is_public": p.is_public,
-            "is_verified": len(identities) > 0,
-            "providers": [i.provider for i in identities],
+            "is_verified": bool(p.is_verified),
+            "providers": providers_from_mask(p.verified_providers),
         })
 
     grouped_sorted = {
@@ -358,11 +352,19 @@ def edit_persona_save(
     persona.is_public = True if is_public == "1" else False
 
     db.commit()
+    persona_cache.invalidate(persona.id)
 
     return RedirectResponse(url="/dashboard", status_code=303)
 
 @router.get("/personas/{persona_id}", response_class=HTMLResponse)
-def view_persona(persona_id: int, request: Request, db: Session = Depends(get_db)):
+def view_persona(
+    persona_id: int,
+    request: Request,
+    following_cursor: str | None = None,
+    followers_cursor: str | None = None,
+    connections_cursor: str | None = None,
+    db: Session = Depends(get_read_db),
+):
     user_id = request.session.get("user_id")
     if not user_id:
         return RedirectResponse(url="/login", status_code=303)
@@ -386,48 +388,23 @@ def view_persona(persona_id: int, request: Request, db: Session = Depends(get_db
             "name": p.name,
             "description": p.description,
             "owner_username": owner_username,
-            "is_verified": is_persona_verified(db, p.id),
+            "is_verified": bool(p.is_verified),
         })
 
-    following = (
-        db.query(models.Persona)
-        .join(
-            models.PersonaFollow,
-            models.PersonaFollow.following_persona_id == models.Persona.id
-        )
-        .filter(models.PersonaFollow.follower_persona_id == persona.id)
-        .all()
+    # One page of each list; "More" links carry the next cursor
+    following, following_next = keyset_page(
+        following_query(db, persona.id), PERSONA_ORDER, following_cursor, DEFAULT_PAGE_SIZE,
     )
-
-    followers = (
-        db.query(models.Persona)
-        .join(
-            models.PersonaFollow,
-            models.PersonaFollow.follower_persona_id == models.Persona.id
-        )
-        .filter(models.PersonaFollow.following_persona_id == persona.id)
-        .all()
+    followers, followers_next = keyset_page(
+        followers_query(db, persona.id), PERSONA_ORDER, followers_cursor, DEFAULT_PAGE_SIZE,
     )
 
-    following_ids = {p.id for p in following}
-    follower_ids = {p.id for p in followers}
-    connection_ids = following_ids.intersection(follower_ids)
-
-    connections = (
-        db.query(models.Persona)
-        .filter(models.Persona.id.in_(connection_ids))
-        .all()
-        if connection_ids else []
+    connections, connections_next = keyset_page(
+        mutuals_query(db, persona.id), PERSONA_ORDER, connections_cursor, DEFAULT_PAGE_SIZE,
     )
 
-    identities = (
-        db.query(models.ExternalIdentity)
-        .filter(models.ExternalIdentity.persona_id == persona.id)
-        .all()
-    )
+    verified = bool(persona.is_verified)
 
-    verified = len(identities) > 0
-    
     return templates.TemplateResponse(
         "persona_view.html",
         {
@@ -436,21 +413,25 @@ def view_persona(persona_id: int, request: Request, db: Session = Depends(get_db
             "others": others_clean,
             "verified": verified,
             "following": following,
+            "following_next": following_next,
             "followers": followers,
+            "followers_next": followers_next,
             "connections": connections,
+            "connections_next": connections_next,
         }
     )
 
+def render_public_profile(persona) -> str:
+    return templates.get_template("persona_public_card.html").render(persona=persona)
+
+# Shared profile links are hot; only can_dm depends on the viewer
+public_profiles = FragmentCache(render_public_profile)
+
 @router.get("/public/{username}/{persona_id}", response_class=HTMLResponse)
 def view_public_persona(username: str, persona_id: int, request: Request, db: Session = Depends(get_db)):
-    persona = (
-        db.query(models.Persona)
-        .join(models.User, models.User.id == models.Persona.user_id)
-        .filter(models.User.username == username)
-        .filter(models.Persona.id == persona_id)
-        .filter(models.Persona.is_public == True)
-        .first()
-    )
+    persona = persona_cache.get(db, persona_id)
+    if persona and (persona.owner_username != username or not persona.is_public):
+        persona = None
 
     user_id = request.session.get("user_id")
 
@@ -459,15 +440,13 @@ def view_public_persona(username: str, persona_id: int, request: Request, db: Se
             "persona_public.html",
             {"request": request, "error": "Public profile not found."}
         )
-    
-    verified = is_persona_verified(db, persona.id)
 
     active_persona_id = request.session.get("active_persona_id")
     active_persona = None
     can_dm = False
 
     if active_persona_id:
-        active_persona = db.query(models.Persona).filter(models.Persona.id == active_persona_id).first()
+        active_persona = persona_cache.get(db, active_persona_id)
 
         if active_persona and IdentityPolicy.can_use_persona(user_id, active_persona):
             can_dm = IdentityPolicy.can_start_dm(active_persona, persona)
@@ -477,7 +456,7 @@ def view_public_persona(username: str, persona_id: int, request: Request, db: Se
         {
             "request": request, 
             "persona": persona,
-            "verified": verified,
+            "profile_html": Markup(public_profiles.get(persona)),
             "active_persona": active_persona,
             "can_dm": can_dm,
         }
@@ -517,28 +496,24 @@ def create_persona(
 
     db.add(persona)
     db.commit()
+    persona_cache.invalidate(persona.id)
 
     return RedirectResponse(url="/dashboard", status_code=303)
 
-@router.post("/personas/{target_persona_id}/follow")
-async def follow_persona(target_persona_id: int, request: Request, db: Session = Depends(get_db)):
-    user_id = request.session.get("user_id")
-    active_persona_id = request.session.get("active_persona_id")
+def record_follow(db: Session, user_id: int, active_persona_id: int, target_persona_id: int):
+    """Create the follow and its notification.
 
-    if not user_id:
-        return RedirectResponse(url="/login", status_code=303)
-
-    if not active_persona_id:
-        return RedirectResponse(url="/chats", status_code=303)
-
-    follower = db.query(models.Persona).filter(models.Persona.id == active_persona_id).first()
-    target = db.query(models.Persona).filter(models.Persona.id == target_persona_id).first()
+    Returns (redirect_url, (recipient_user_id, payload) or None). Runs in the
+    threadpool because the request session is synchronous.
+    """
+    follower = persona_cache.get(db, active_persona_id)
+    target = persona_cache.get(db, target_persona_id)
 
     if not IdentityPolicy.can_use_persona(user_id, follower):
-        return RedirectResponse(url="/dashboard", status_code=303)
+        return "/dashboard", None
 
     if not IdentityPolicy.can_follow_persona(follower, target):
-        return RedirectResponse(url=f"/personas/{target_persona_id}", status_code=303)
+        return f"/personas/{target_persona_id}", None
 
     existing = (
         db.query(models.PersonaFollow)
@@ -547,38 +522,45 @@ async def follow_persona(target_persona_id: int, request: Request, db: Session =
         .first()
     )
 
-    if not existing:
-        follow = models.PersonaFollow(
-            follower_persona_id=follower.id,
-            following_persona_id=target.id
-        )
-        db.add(follow)
-        db.commit()
+    if existing:
+        return f"/personas/{target_persona_id}", None
 
-        notif = models.Notification(
-            user_id=target.user_id,
-            type="persona_follow",
-            title=f"{follower.name} followed {target.name}",
-            message=f"{follower.name} is now following this persona.",
-            link=f"/personas/{target.id}"
-        )
-        db.add(notif)
-        db.commit()
-        db.refresh(notif)
+    add_follow(db, follower.id, target.id)
+    db.commit()
 
-        await notification_manager.send_to_user(
-            target.user_id,
-            {
-                "id": notif.id,
-                "type": notif.type,
-                "title": notif.title,
-                "message": notif.message,
-                "link": notif.link,
-                "created_at": notif.created_at.isoformat(timespec="seconds"),
-            }
-        )
+    notif = models.Notification(
+        user_id=target.user_id,
+        type="persona_follow",
+        title=f"{follower.name} followed {target.name}",
+        message=f"{follower.name} is now following this persona.",
+        link=f"/personas/{target.id}"
+    )
+    db.add(notif)
+    db.commit()
+    db.refresh(notif)
 
-    return RedirectResponse(url=f"/personas/{target_persona_id}", status_code=303)
+    return f"/personas/{target_persona_id}", (notif.user_id, notification_payload(notif))
+
+@router.post("/personas/{target_persona_id}/follow")
+async def follow_persona(target_persona_id: int, request: Request, db: Session = Depends(get_db)):
+    user_id = request.session.get("user_id")
+    active_persona_id = request.session.get("active_persona_id")
+
+    if not user_id:
+        return RedirectResponse(url="/login", status_code=303)
+
+    if not active_persona_id:
+        return RedirectResponse(url="/chats", status_code=303)
+
+    redirect_url, notification = await run_in_threadpool(
+        record_follow, db, user_id, active_persona_id, target_persona_id
+    )
+
+    if notification:
+        recipient_user_id, payload = notification
+        await notification_manager.send_to_user(recipient_user_id, payload)
+
+    return RedirectResponse(url=redirect_url, status_code=303)
 
 @router.post("/personas/{target_persona_id}/unfollow")
 def unfollow_persona(target_persona_id: int, request: Request, db: Session = Depends(get_db)):
@@ -591,7 +573,7 @@ def unfollow_persona(target_persona_id: int, request: Request, db: Session = Dep
     if not active_persona_id:
         return RedirectResponse(url="/chats", status_code=303)
 
-    follower = db.query(models.Persona).filter(models.Persona.id == active_persona_id).first()
+    follower = persona_cache.get(db, active_persona_id)
 
     if not IdentityPolicy.can_use_persona(user_id, follower):
         return RedirectResponse(url="/dashboard", status_code=303)
@@ -604,7 +586,7 @@ def unfollow_persona(target_persona_id: int, request: Request, db: Session = Dep
     )
 
     if follow:
-        db.delete(follow)
+        remove_follow(db, follow)
         db.commit()
 
     return RedirectResponse(url=f"/personas/{target_persona_id}", status_code=303)
@@ -723,6 +705,8 @@ def edit_account_save(
     user.email = email
 
     db.commit()
+    # Public profile URLs are resolved against the cached owner username
+    persona_cache.invalidate_user(user.id)
 
     request.session["username"] = user.username
 
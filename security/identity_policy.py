@@ -1,5 +1,3 @@
-import models
-
 class IdentityPolicy:
     @staticmethod
     def normalize_category(category: str | None) -> str:
@@ -61,15 +59,8 @@ class IdentityPolicy:
         )
 
     @staticmethod
-    def is_persona_verified(persona, db) -> bool:
+    def is_persona_verified(persona) -> bool:
         if not persona:
             return False
 
-        linked_identity = (
-            db.query(models.ExternalIdentity)
-            .filter(models.ExternalIdentity.persona_id == persona.id)
-            .first()
-        )
-
-        return linked_identity is not None
-
+        return bool(persona.is_verified)
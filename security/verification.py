@@ -0,0 +1,102 @@
+from typing import Iterable, NamedTuple
+
+from sqlalchemy.orm import Session
+
+import models
+
+
+class VerificationStatus(NamedTuple):
+    is_verified: bool
+    providers: tuple[str, ...]
+
+
+UNVERIFIED = VerificationStatus(False, ())
+
+# Bits stored in Persona.verified_providers
+PROVIDER_FLAGS = {
+    "google": 1 << 0,
+    "steam": 1 << 1,
+}
+
+
+def provider_mask(providers: Iterable[str]) -> int:
+    mask = 0
+    for provider in providers:
+        mask |= PROVIDER_FLAGS.get(provider, 0)
+    return mask
+
+
+def providers_from_mask(mask: int | None) -> list[str]:
+    return [name for name, flag in PROVIDER_FLAGS.items() if (mask or 0) & flag]
+
+
+def resolve_verification(db: Session, persona_ids: Iterable[int]) -> dict[int, VerificationStatus]:
+    """Verification status for many personas using a single grouped query.
+
+    Every requested id is present in the result; personas without a linked
+    identity map to ``UNVERIFIED``.
+    """
+    ids = {pid for pid in persona_ids if pid is not None}
+    if not ids:
+        return {}
+
+    rows = (
+        db.query(models.ExternalIdentity.persona_id, models.ExternalIdentity.provider)
+        .filter(models.ExternalIdentity.persona_id.in_(ids))
+        .group_by(models.ExternalIdentity.persona_id, models.ExternalIdentity.provider)
+        .order_by(models.ExternalIdentity.persona_id, models.ExternalIdentity.provider)
+        .all()
+    )
+
+    providers: dict[int, list[str]] = {}
+    for persona_id, provider in rows:
+        providers.setdefault(persona_id, []).append(provider)
+
+    return {
+        pid: VerificationStatus(True, tuple(providers[pid])) if pid in providers else UNVERIFIED
+        for pid in ids
+    }
+
+
+def mark_identity_linked(persona: models.Persona, provider: str) -> None:
+    """Update the stored verification state when an identity is linked.
+
+    Call before committing the new ExternalIdentity so both land in the same
+    transaction.
+    """
+    persona.is_verified = True
+    persona.verified_providers = (persona.verified_providers or 0) | provider_mask([provider])
+
+
+def backfill_verification(db: Session, batch_size: int = 500) -> int:
+    """Recompute is_verified / verified_providers for every persona.
+
+    Returns the number of personas whose stored state changed.
+    """
+    changed = 0
+    last_id = 0
+
+    while True:
+        personas = (
+            db.query(models.Persona)
+            .filter(models.Persona.id > last_id)
+            .order_by(models.Persona.id.asc())
+            .limit(batch_size)
+            .all()
+        )
+        if not personas:
+            break
+
+        statuses = resolve_verification(db, [p.id for p in personas])
+        for p in personas:
+            status = statuses[p.id]
+            mask = provider_mask(status.providers)
+            if p.is_verified != status.is_verified or p.verified_providers != mask:
+                p.is_verified = status.is_verified
+                p.verified_providers = mask
+                changed += 1
+
+        db.commit()
+        last_id = personas[-1].id
+
+    return changed
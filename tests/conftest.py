@@ -1,7 +1,9 @@
 import os
+from contextlib import contextmanager
+
 import pytest
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
 
 import models
@@ -16,6 +18,7 @@ import routers.chat as chat_router
 import routers.api as api_router
 import routers.auth as auth_router
 import routers.steam as steam_router
+from database import get_read_db
 
 TEST_DB_URL = "sqlite:///./test_identity.db"
 
@@ -33,6 +36,7 @@ def client_factory(db_session):
         app.dependency_overrides[chat_router.get_db] = override_get_db
         app.dependency_overrides[auth_router.get_db] = override_get_db
         app.dependency_overrides[steam_router.get_db] = override_get_db
+        app.dependency_overrides[get_read_db] = override_get_db
         return TestClient(app)
 
     clients = []
@@ -96,8 +100,73 @@ def client(db_session):
     # Override DB dependency used by routers
     app.dependency_overrides[users_router.get_db] = override_get_db
     app.dependency_overrides[chat_router.get_db] = override_get_db
+    app.dependency_overrides[get_read_db] = override_get_db
 
     with TestClient(app) as c:
         yield c
 
     app.dependency_overrides.clear()
+
+
+@pytest.fixture()
+def live_db(tmp_path, monkeypatch):
+    """
+    File-backed database for websocket handlers, which open their own
+    AsyncSessionLocal sessions instead of using the request-scoped get_db.
+    Yields a sync sessionmaker for seeding and assertions.
+    """
+    from sqlalchemy.ext.asyncio import async_sessionmaker
+    from sqlalchemy.pool import NullPool
+    from database import build_async_engine
+
+    path = tmp_path / "live.db"
+    sync_engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    models.Base.metadata.create_all(bind=sync_engine)
+
+    # NullPool: TestClient runs the app on its own event loop per client
+    async_engine = build_async_engine(f"sqlite+aiosqlite:///{path}", poolclass=NullPool)
+    monkeypatch.setattr(
+        chat_router,
+        "AsyncSessionLocal",
+        async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False),
+    )
+
+    yield sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=sync_engine)
+
+    sync_engine.dispose()
+
+
+@pytest.fixture()
+def count_queries(db_session):
+    """
+    Collects the SQL statements run on the test connection:
+    ``with count_queries() as statements: ...``
+    """
+    @contextmanager
+    def counting():
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        bind = db_session.get_bind()
+        event.listen(bind, "before_cursor_execute", record)
+        try:
+            yield statements
+        finally:
+            event.remove(bind, "before_cursor_execute", record)
+
+    return counting
+
+
+@pytest.fixture(autouse=True)
+def fresh_persona_cache():
+    """
+    Test transactions are rolled back, so SQLite hands the same persona ids
+    to the next test; cached snapshots must not outlive a test.
+    """
+    from persona_cache import persona_cache
+
+    persona_cache.clear()
+    yield
+    persona_cache.clear()
@@ -227,4 +227,253 @@ def test_mark_notification_read_success(client, db_session):
     assert data["is_read"] is True
 
     db_session.refresh(notif)
-    assert notif.is_read is True
\ No newline at end of file
+    assert notif.is_read is True
+
+def test_resolve_verification_batches_providers(client, db_session):
+    from security.verification import resolve_verification
+
+    register_and_login(client)
+
+    linked_name = uniq("Linked")
+    plain_name = uniq("Plain")
+    create_persona(client, "gaming", linked_name, is_public="1")
+    create_persona(client, "gaming", plain_name, is_public="1")
+
+    linked = db_session.query(Persona).filter(Persona.name == linked_name).first()
+    plain = db_session.query(Persona).filter(Persona.name == plain_name).first()
+
+    db_session.add_all([
+        ExternalIdentity(persona_id=linked.id, provider="steam", provider_user_id=uniq("steam")),
+        ExternalIdentity(persona_id=linked.id, provider="google", provider_user_id=uniq("google")),
+    ])
+    db_session.commit()
+
+    result = resolve_verification(db_session, [linked.id, plain.id])
+
+    assert result[linked.id].is_verified is True
+    assert result[linked.id].providers == ("google", "steam")
+    assert result[plain.id].is_verified is False
+    assert result[plain.id].providers == ()
+
+
+def test_public_personas_query_count_does_not_grow_with_results(client, db_session, count_queries):
+    register_and_login(client)
+    category = uniq("cat").lower()
+
+    def queries_for_listing():
+        with count_queries() as statements:
+            r = client.get(f"/api/personas/public?category={category}")
+        assert r.status_code == 200
+        return len(statements)
+
+    create_persona(client, category, uniq("First"), is_public="1")
+    baseline = queries_for_listing()
+
+    for _ in range(5):
+        create_persona(client, category, uniq("More"), is_public="1")
+
+    assert queries_for_listing() == baseline
+
+
+def test_backfill_verification_sets_flag_and_provider_mask(client, db_session):
+    from security.verification import backfill_verification, providers_from_mask
+
+    register_and_login(client)
+    name = uniq("Backfill")
+    create_persona(client, "gaming", name, is_public="1")
+
+    persona = db_session.query(Persona).filter(Persona.name == name).first()
+    assert persona.is_verified is False
+
+    db_session.add(ExternalIdentity(persona_id=persona.id, provider="steam", provider_user_id=uniq("steam")))
+    db_session.commit()
+
+    assert backfill_verification(db_session) >= 1
+
+    db_session.refresh(persona)
+    assert persona.is_verified is True
+    assert providers_from_mask(persona.verified_providers) == ["steam"]
+
+    r = client.get(f"/api/personas/public/{persona.id}")
+    assert r.json()["is_verified"] is True
+
+
+def test_public_personas_cursor_pagination(client, db_session):
+    register_and_login(client)
+    category = uniq("pagecat").lower()
+
+    names = sorted(uniq("P") for _ in range(5))
+    for name in names:
+        create_persona(client, category, name, is_public="1")
+
+    seen = []
+    cursor = None
+    while True:
+        url = f"/api/personas/public?category={category}&limit=2"
+        if cursor:
+            url += f"&cursor={cursor}"
+        r = client.get(url)
+        assert r.status_code == 200
+        assert r.headers["X-Total-Count"] == "5"
+
+        page = r.json()
+        assert len(page) <= 2
+        seen.extend(p["name"] for p in page)
+
+        cursor = r.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+
+    assert seen == names
+    assert client.get("/api/personas/public?cursor=not-a-cursor").status_code == 400
+
+    from pagination import encode_cursor
+    for values in (({"a": 1}, 1), ([1], 2), ("x", True), (1, "x")):
+        r = client.get(f"/api/personas/public?cursor={encode_cursor(*values)}")
+        assert r.status_code == 400
+
+
+def test_dm_threads_one_page_query_with_last_message_and_pagination(client, db_session, count_queries):
+    from models import DMMessage, DMThread
+
+    register_and_login(client)
+    my_name = uniq("Me")
+    create_persona(client, "gaming", my_name, is_public="1")
+    me = db_session.query(Persona).filter(Persona.name == my_name).first()
+
+    other_user = User(username=uniq("other"), email=f"{uniq('o')}@example.com", password_hash="x")
+    db_session.add(other_user)
+    db_session.flush()
+
+    threads = []
+    for i in range(3):
+        other = Persona(user_id=other_user.id, category="gaming", name=uniq("Other"), is_public=True)
+        db_session.add(other)
+        db_session.flush()
+        # Alternate sides so both halves of the OR are exercised
+        a, b = (me, other) if i % 2 == 0 else (other, me)
+        thread = DMThread(persona_a_id=a.id, persona_b_id=b.id, category="gaming")
+        db_session.add(thread)
+        db_session.flush()
+        db_session.add(DMMessage(thread_id=thread.id, sender_persona_id=other.id, content="first"))
+        db_session.add(DMMessage(thread_id=thread.id, sender_persona_id=me.id, content=f"latest {i}"))
+        threads.append((thread, other))
+    db_session.commit()
+
+    with count_queries() as statements:
+        r = client.get("/api/dm/threads?limit=2")
+
+    assert r.status_code == 200
+    # The ETag version probe, then the page itself in one query
+    assert len(statements) == 2
+    assert sum("dm_messages.content" in st for st in statements) == 1
+
+    first = r.json()
+    assert [t["thread_id"] for t in first] == [threads[2][0].id, threads[1][0].id]
+    for item, i in zip(first, (2, 1)):
+        assert item["my_persona"]["id"] == me.id
+        assert item["other_persona"]["id"] == threads[i][1].id
+        assert item["last_message"]["content"] == f"latest {i}"
+
+    r = client.get(f"/api/dm/threads?limit=2&cursor={r.headers['X-Next-Cursor']}")
+    assert [t["thread_id"] for t in r.json()] == [threads[0][0].id]
+    assert "X-Next-Cursor" not in r.headers
+
+    page = client.get("/dm")
+    assert page.status_code == 200
+    assert "latest 0" in page.text
+
+
+def test_public_persona_etag_answers_304_until_edited(client, db_session, count_queries):
+    register_and_login(client)
+    name = uniq("Tagged")
+    create_persona(client, "gaming", name, is_public="1")
+    persona_id = db_session.query(Persona.id).filter(Persona.name == name).scalar()
+
+    r = client.get(f"/api/personas/public/{persona_id}")
+    etag = r.headers["ETag"]
+
+    with count_queries() as statements:
+        cached = client.get(f"/api/personas/public/{persona_id}", headers={"If-None-Match": etag})
+
+    assert cached.status_code == 304
+    assert cached.headers["ETag"] == etag
+    assert len(statements) == 1
+
+    client.post(
+        f"/personas/{persona_id}/edit",
+        data={"category": "gaming", "name": name, "description": "new bio", "is_public": "1"},
+        follow_redirects=False,
+    )
+
+    r = client.get(f"/api/personas/public/{persona_id}", headers={"If-None-Match": etag})
+    assert r.status_code == 200
+    assert r.json()["description"] == "new bio"
+    assert r.headers["ETag"] != etag
+
+
+def test_public_personas_etag_changes_when_listing_changes(client, db_session):
+    register_and_login(client)
+    category = uniq("cat")
+    create_persona(client, category, uniq("First"), is_public="1")
+
+    r = client.get(f"/api/personas/public?category={category}")
+    etag = r.headers["ETag"]
+
+    cached = client.get(f"/api/personas/public?category={category}", headers={"If-None-Match": f'W/{etag}'})
+    assert cached.status_code == 304
+
+    create_persona(client, category, uniq("Second"), is_public="1")
+    r = client.get(f"/api/personas/public?category={category}", headers={"If-None-Match": etag})
+    assert r.status_code == 200
+    assert len(r.json()) == 2
+    assert r.headers["X-Total-Count"] == "2"
+
+
+def test_notifications_etag_changes_when_marked_read(client, db_session):
+    username, _ = register_and_login(client)
+    user = db_session.query(User).filter(User.username == username).first()
+
+    notif = Notification(user_id=user.id, type="test", title=uniq("Poll"), link="/x")
+    db_session.add(notif)
+    db_session.commit()
+    notif_id = notif.id
+
+    etag = client.get("/api/notifications").headers["ETag"]
+    assert client.get("/api/notifications", headers={"If-None-Match": etag}).status_code == 304
+
+    client.post(f"/api/notifications/{notif_id}/read")
+
+    r = client.get("/api/notifications", headers={"If-None-Match": etag})
+    assert r.status_code == 200
+    assert r.json()[0]["is_read"] is True
+
+
+def test_dm_threads_etag_changes_with_new_message(client, db_session):
+    from models import DMMessage, DMThread
+
+    register_and_login(client)
+    my_name = uniq("Me")
+    create_persona(client, "gaming", my_name, is_public="1")
+    me = db_session.query(Persona).filter(Persona.name == my_name).first()
+
+    other_user = User(username=uniq("other"), email=f"{uniq('o')}@example.com", password_hash="x")
+    db_session.add(other_user)
+    db_session.flush()
+    other = Persona(user_id=other_user.id, category="gaming", name=uniq("Other"), is_public=True)
+    db_session.add(other)
+    db_session.flush()
+    thread = DMThread(persona_a_id=me.id, persona_b_id=other.id, category="gaming")
+    db_session.add(thread)
+    db_session.commit()
+    thread_id, other_id = thread.id, other.id
+
+    etag = client.get("/api/dm/threads").headers["ETag"]
+    assert client.get("/api/dm/threads", headers={"If-None-Match": etag}).status_code == 304
+
+    db_session.add(DMMessage(thread_id=thread_id, sender_persona_id=other_id, content="hello"))
+    db_session.commit()
+
+    r = client.get("/api/dm/threads", headers={"If-None-Match": etag})
+    assert r.status_code == 200
+    assert r.json()[0]["last_message"]["content"] == "hello"
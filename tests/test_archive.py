@@ -0,0 +1,183 @@
+import os
+from datetime import datetime, timedelta
+
+import messaging.archive as archive_mod
+from messaging.archive import RoomArchive, archive_messages, category_room
+from messaging.history import category_history
+from models import User, Persona, CategoryMessage
+
+
+def record(i):
+    return {
+        "id": i,
+        "sender_persona_id": 1,
+        "content": f"message {i}",
+        "created_at": datetime(2025, 1, 1).isoformat(),
+    }
+
+
+def test_room_archive_reads_across_segments(tmp_path, monkeypatch):
+    monkeypatch.setattr(archive_mod, "SEGMENT_MAX_BYTES", 2000)
+    monkeypatch.setattr(archive_mod, "INDEX_STRIDE_BYTES", 300)
+
+    room = RoomArchive("category:gaming", root=str(tmp_path))
+    ids = list(range(1, 200, 2))  # gaps, like a shared autoincrement
+    assert room.append([record(i) for i in ids]) == len(ids)
+
+    assert len(room.segments()) > 1
+    assert room.last_id() == ids[-1]
+
+    # Re-appending already archived ids is a no-op
+    assert room.append([record(i) for i in ids[-5:]]) == 0
+
+    before = room.read_before(100, 10)
+    assert [r["id"] for r in before] == [i for i in ids if i < 100][-10:]
+
+    after = room.read_after(100, 10)
+    assert [r["id"] for r in after] == [i for i in ids if i > 100][:10]
+
+    newest = room.read_before(None, 3)
+    assert [r["id"] for r in newest] == ids[-3:]
+
+
+def test_partial_trailing_record_is_ignored_then_truncated(tmp_path, monkeypatch):
+    monkeypatch.setattr(archive_mod, "INDEX_STRIDE_BYTES", 1)
+
+    room = RoomArchive("category:gaming", root=str(tmp_path))
+    room.append([record(i) for i in (1, 2, 3)])
+
+    # A crash while writing record 4 leaves half a line and its index entry
+    segment = room.segments()[-1]
+    with open(segment.index_path, "ab") as f:
+        f.write(archive_mod._INDEX_ENTRY.pack(4, os.path.getsize(segment.path)))
+    with open(segment.path, "ab") as f:
+        f.write(b'{"id":4,"sender_pers')
+
+    assert room.last_id() == 3
+    assert [r["id"] for r in room.read_before(None, 10)] == [1, 2, 3]
+    assert [r["id"] for r in room.read_after(2, 10)] == [3]
+
+    assert room.append([record(i) for i in (4, 5)]) == 2
+    assert [r["id"] for r in room.read_before(None, 10)] == [1, 2, 3, 4, 5]
+    assert [r["id"] for r in room.read_after(3, 10)] == [4, 5]
+
+
+def test_archive_messages_moves_old_rows_and_history_reads_through(db_session, tmp_path, monkeypatch):
+    monkeypatch.setattr(archive_mod, "ARCHIVE_DIR", str(tmp_path))
+    monkeypatch.setattr(archive_mod, "KEEP_LIVE_PER_ROOM", 5)
+
+    user = User(username="archiver", email="archiver@example.com", password_hash="x")
+    db_session.add(user)
+    db_session.flush()
+    persona = Persona(user_id=user.id, name="Archivist", category="retro", is_public=True)
+    db_session.add(persona)
+    db_session.flush()
+
+    old = datetime.utcnow() - timedelta(days=90)
+    for i in range(20):
+        db_session.add(CategoryMessage(
+            category="retro", sender_persona_id=persona.id, content=f"m{i}", created_at=old,
+        ))
+    db_session.commit()
+
+    all_ids = [
+        m.id for m in
+        db_session.query(CategoryMessage)
+        .filter(CategoryMessage.category == "retro")
+        .order_by(CategoryMessage.id.asc())
+    ]
+
+    moved = archive_messages(db_session, older_than=timedelta(days=30))
+    assert moved == 15
+
+    live = db_session.query(CategoryMessage).filter(CategoryMessage.category == "retro").count()
+    assert live == 5
+    assert RoomArchive(category_room("retro")).last_id() == all_ids[14]
+
+    page = category_history(db_session, "retro", limit=8)
+    assert [r.id for r in page] == all_ids[-8:]
+    assert [r.content for r in page[:3]] == ["m12", "m13", "m14"]
+    assert all(r.sender_name == "Archivist" for r in page)
+
+    older = category_history(db_session, "retro", limit=50, before_id=page[0].id)
+    assert [r.id for r in older] == all_ids[:12]
+
+
+def test_archive_moves_rows_by_id_even_when_created_at_is_out_of_order(db_session, tmp_path, monkeypatch):
+    monkeypatch.setattr(archive_mod, "ARCHIVE_DIR", str(tmp_path))
+    monkeypatch.setattr(archive_mod, "KEEP_LIVE_PER_ROOM", 5)
+
+    user = User(username="archiver2", email="archiver2@example.com", password_hash="x")
+    db_session.add(user)
+    db_session.flush()
+    persona = Persona(user_id=user.id, name="Archivist", category="arcade", is_public=True)
+    db_session.add(persona)
+    db_session.flush()
+
+    old = datetime.utcnow() - timedelta(days=90)
+    recent = datetime.utcnow() - timedelta(days=1)
+    for i in range(20):
+        db_session.add(CategoryMessage(
+            category="arcade", sender_persona_id=persona.id, content=f"m{i}",
+            created_at=recent if i == 3 else old,
+        ))
+    db_session.commit()
+
+    all_ids = [
+        m.id for m in
+        db_session.query(CategoryMessage)
+        .filter(CategoryMessage.category == "arcade")
+        .order_by(CategoryMessage.id.asc())
+    ]
+
+    assert archive_messages(db_session, older_than=timedelta(days=30), batch_size=4) == 15
+    # Nothing older than the archive's last id is left behind to be skipped later
+    assert archive_messages(db_session, older_than=timedelta(hours=1), batch_size=4) == 0
+
+    archived = RoomArchive(category_room("arcade")).read_after(0, 50)
+    assert [r["id"] for r in archived] == all_ids[:15]
+    live = [
+        m.id for m in
+        db_session.query(CategoryMessage).filter(CategoryMessage.category == "arcade")
+    ]
+    assert sorted(live) == all_ids[15:]
+
+
+def test_rows_archived_by_a_crashed_run_are_deleted_next_time(db_session, tmp_path, monkeypatch):
+    monkeypatch.setattr(archive_mod, "ARCHIVE_DIR", str(tmp_path))
+    monkeypatch.setattr(archive_mod, "KEEP_LIVE_PER_ROOM", 5)
+
+    user = User(username="archiver3", email="archiver3@example.com", password_hash="x")
+    db_session.add(user)
+    db_session.flush()
+    persona = Persona(user_id=user.id, name="Archivist", category="pinball", is_public=True)
+    db_session.add(persona)
+    db_session.flush()
+
+    old = datetime.utcnow() - timedelta(days=90)
+    for i in range(30):
+        db_session.add(CategoryMessage(
+            category="pinball", sender_persona_id=persona.id, content=f"m{i}", created_at=old,
+        ))
+    db_session.commit()
+
+    messages = (
+        db_session.query(CategoryMessage)
+        .filter(CategoryMessage.category == "pinball")
+        .order_by(CategoryMessage.id.asc())
+        .all()
+    )
+    all_ids = [m.id for m in messages]
+
+    # A run that crashed after the segment was fsynced, before the DELETE
+    RoomArchive(category_room("pinball")).append([archive_mod._record(m) for m in messages[:10]])
+
+    assert archive_messages(db_session, older_than=timedelta(days=30), batch_size=4) == 25
+    live = db_session.query(CategoryMessage).filter(CategoryMessage.category == "pinball").count()
+    assert live == 5
+
+    seen, before_id = [], None
+    while page := category_history(db_session, "pinball", limit=7, before_id=before_id):
+        seen = [r.id for r in page] + seen
+        before_id = page[0].id
+    assert seen == all_ids
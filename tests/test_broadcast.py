@@ -0,0 +1,444 @@
+import asyncio
+import json
+from datetime import datetime
+
+import pytest
+
+from realtime.backends import MemoryBackend, UnixSocketBackend, backend_from_url
+from messaging.recent import RecentMessages
+from realtime.broker import Broker
+from realtime.frames import encode_frame
+from realtime.heartbeat import CLOSE_GOING_AWAY, Reaper
+from realtime.registry import Presence, RoomRegistry
+from realtime.send_queue import CLOSE_TRY_AGAIN_LATER, DISCONNECT, DROP_OLDEST, SendQueue
+from routers.chat import ConnectionManager, NotificationManager
+
+
+class FakeSocket:
+    def __init__(self):
+        self.sent = []
+        self.close_code = None
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, frame):
+        self.sent.append(json.loads(frame))
+
+    async def close(self, code=1000):
+        self.close_code = code
+
+
+class StalledSocket(FakeSocket):
+    """Accepts the first send, then blocks until released."""
+
+    def __init__(self):
+        super().__init__()
+        self.release = asyncio.Event()
+
+    async def send_text(self, frame):
+        if self.sent:
+            await self.release.wait()
+        self.sent.append(json.loads(frame))
+
+
+class BrokenSocket(FakeSocket):
+    async def send_text(self, frame):
+        raise RuntimeError("gone")
+
+
+async def settle(predicate, timeout=2.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not predicate():
+        assert asyncio.get_running_loop().time() < deadline, "timed out waiting for delivery"
+        await asyncio.sleep(0.01)
+
+
+def test_backend_from_url():
+    assert isinstance(backend_from_url("memory://"), MemoryBackend)
+    assert backend_from_url("unix:///tmp/x.sock").path == "/tmp/x.sock"
+
+
+def test_memory_backend_delivers_and_drops_dead_sockets():
+    async def run():
+        manager = ConnectionManager(MemoryBackend())
+        ok, broken = FakeSocket(), BrokenSocket()
+        await manager.connect("gaming", ok)
+        await manager.connect("gaming", broken)
+
+        await manager.broadcast("gaming", {"n": 1})
+        await manager.broadcast("other", {"n": 2})
+        await settle(lambda: ok.sent)
+
+        # The failed writer is noticed on the next delivery
+        await manager.broadcast("gaming", {"n": 3})
+        await settle(lambda: len(ok.sent) == 2)
+        return manager, ok
+
+    manager, ok = asyncio.run(run())
+    assert ok.sent == [{"n": 1}, {"n": 3}]
+    assert manager.registry.sockets("gaming") == (ok,)
+
+
+def test_broadcast_encodes_payload_once(monkeypatch):
+    import routers.chat as chat_router
+
+    encoded = []
+
+    def counting_encode(message):
+        encoded.append(message)
+        return encode_frame(message)
+
+    monkeypatch.setattr(chat_router, "encode_frame", counting_encode)
+
+    async def run():
+        manager = ConnectionManager(MemoryBackend())
+        sockets = [FakeSocket() for _ in range(5)]
+        for ws in sockets:
+            await manager.connect("gaming", ws)
+
+        await manager.broadcast("gaming", {"content": "héllo"})
+        await settle(lambda: all(ws.sent for ws in sockets))
+        return sockets
+
+    sockets = asyncio.run(run())
+    assert len(encoded) == 1
+    assert all(ws.sent == [{"content": "héllo"}] for ws in sockets)
+
+
+def test_slow_client_does_not_hold_up_the_room():
+    async def run():
+        fast, slow = FakeSocket(), StalledSocket()
+        fast_queue = SendQueue(fast, maxsize=2)
+        slow_queue = SendQueue(slow, maxsize=2, policy=DROP_OLDEST)
+
+        for i in range(5):
+            assert fast_queue.offer(encode_frame({"n": i}))
+            assert slow_queue.offer(encode_frame({"n": i}))
+            await asyncio.sleep(0)
+
+        await settle(lambda: len(fast.sent) == 5)
+        slow.release.set()
+        await settle(lambda: len(slow.sent) == 4)
+        return fast, slow, slow_queue
+
+    fast, slow, slow_queue = asyncio.run(run())
+    assert [m["n"] for m in fast.sent] == [0, 1, 2, 3, 4]
+    # Stuck sending 1 while 2..4 arrived; only the two newest stayed queued
+    assert [m["n"] for m in slow.sent] == [0, 1, 3, 4]
+    assert slow_queue.dropped == 1
+
+
+def test_disconnect_policy_closes_full_connection():
+    async def run():
+        manager = ConnectionManager(MemoryBackend())
+        slow = StalledSocket()
+        await manager.connect("gaming", slow)
+        manager.send_queues[slow] = SendQueue(slow, maxsize=1, policy=DISCONNECT)
+
+        for i in range(4):
+            await manager.broadcast("gaming", {"n": i})
+            await asyncio.sleep(0)
+        await settle(lambda: slow.close_code is not None)
+        return manager, slow
+
+    manager, slow = asyncio.run(run())
+    assert slow.close_code == CLOSE_TRY_AGAIN_LATER
+    assert "gaming" not in manager.registry.rooms()
+
+
+def test_rooms_and_notifications_fan_out_across_workers(tmp_path):
+    path = str(tmp_path / "broker.sock")
+
+    async def run():
+        broker = Broker(path)
+        await broker.start()
+
+        # Two workers, each with its own backend connection to the broker
+        backend_1, backend_2 = UnixSocketBackend(path), UnixSocketBackend(path)
+        rooms_1, rooms_2 = ConnectionManager(backend_1), ConnectionManager(backend_2)
+        notes_1, notes_2 = NotificationManager(backend_1), NotificationManager(backend_2)
+
+        alice, bob, bob_notes = FakeSocket(), FakeSocket(), FakeSocket()
+        await rooms_1.connect("gaming", alice)
+        await rooms_2.connect("gaming", bob)
+        await notes_2.connect(7, bob_notes)
+
+        for i in range(3):
+            await rooms_1.broadcast("gaming", {"n": i})
+        await notes_1.send_to_user(7, {"type": "dm_message"})
+
+        await settle(lambda: len(alice.sent) == 3 and len(bob.sent) == 3 and bob_notes.sent)
+
+        # Once the last local socket leaves, the worker stops receiving the room
+        rooms_2.disconnect("gaming", bob)
+        await rooms_1.broadcast("gaming", {"n": 3})
+        await settle(lambda: len(alice.sent) == 4)
+
+        await backend_1.close()
+        await backend_2.close()
+        await broker.close()
+        return alice, bob, bob_notes
+
+    alice, bob, bob_notes = asyncio.run(run())
+    assert alice.sent == [{"n": i} for i in range(4)]
+    assert bob.sent == [{"n": i} for i in range(3)]
+    assert bob_notes.sent == [{"type": "dm_message"}]
+
+
+class FlakyBackend(MemoryBackend):
+    """Fails the first subscribe, like a broker that is briefly unreachable."""
+
+    def __init__(self):
+        super().__init__()
+        self.failures = 1
+
+    async def subscribe(self, channel, handler):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionRefusedError(channel)
+        await super().subscribe(channel, handler)
+
+
+def test_failed_subscribe_closes_the_socket_and_the_next_one_retries():
+    async def run():
+        manager = ConnectionManager(FlakyBackend())
+        first, second = FakeSocket(), FakeSocket()
+
+        with pytest.raises(ConnectionRefusedError):
+            await manager.connect("gaming", first)
+        await settle(lambda: first.close_code is not None)
+        assert manager.registry.rooms() == []
+
+        await manager.connect("gaming", second)
+        await manager.broadcast("gaming", {"n": 1})
+        await settle(lambda: second.sent)
+        return manager, first, second
+
+    manager, first, second = asyncio.run(run())
+    assert first.close_code == CLOSE_TRY_AGAIN_LATER
+    assert second.sent == [{"n": 1}]
+    assert manager.subscribed == {"gaming"}
+
+
+def test_unacknowledged_subscribe_times_out_and_the_next_one_retries(tmp_path, monkeypatch):
+    import realtime.backends as backends
+    monkeypatch.setattr(backends, "SUBSCRIBE_TIMEOUT", 0.1)
+    path = str(tmp_path / "broker.sock")
+
+    async def run():
+        subs, served = [], asyncio.Event()
+
+        # Acknowledges every subscription except the first
+        async def serve(reader, writer):
+            while line := await reader.readline():
+                frame = json.loads(line)
+                if frame["op"] == "sub":
+                    subs.append(frame["channel"])
+                    if len(subs) > 1:
+                        writer.write(json.dumps({"channel": frame["channel"], "subscribed": True}).encode() + b"\n")
+                        await writer.drain()
+            served.set()
+
+        server = await asyncio.start_unix_server(serve, path)
+        backend = UnixSocketBackend(path)
+        manager = ConnectionManager(backend)
+        first, second = FakeSocket(), FakeSocket()
+
+        with pytest.raises(ConnectionError):
+            await manager.connect("gaming", first)
+        await settle(lambda: first.close_code is not None)
+        assert manager.registry.rooms() == []
+
+        await manager.connect("gaming", second)
+        pending = dict(backend._acks)
+
+        await backend.close()
+        await served.wait()
+        server.close()
+        return manager, first, pending
+
+    manager, first, pending = asyncio.run(run())
+    assert first.close_code == CLOSE_TRY_AGAIN_LATER
+    assert manager.subscribed == {"gaming"}
+    assert pending == {}
+
+
+def test_registry_tracks_owners_and_collects_empty_rooms():
+    registry = RoomRegistry()
+    a, b, c = FakeSocket(), FakeSocket(), FakeSocket()
+    alice, bob = Presence(1, "alice", False, True), Presence(2, "Bob", True, True)
+
+    assert registry.add("gaming", a, alice) is True
+    assert registry.add("gaming", b, alice) is False
+    assert registry.add("gaming", c, bob) is False
+
+    assert registry.online("gaming") == [alice, bob]
+    assert registry.room_of(c) == "gaming"
+
+    assert registry.remove(a) == ("gaming", False)
+    assert registry.online("gaming") == [alice, bob]
+    assert registry.remove(b) == ("gaming", False)
+    assert registry.online_ids("gaming") == {2}
+
+    assert registry.remove(c) == ("gaming", True)
+    assert registry.remove(c) is None
+    assert registry.rooms() == []
+    assert registry.online("gaming") == []
+
+
+def test_reaper_pings_active_sockets_and_reaps_idle_ones():
+    async def run():
+        manager = ConnectionManager(MemoryBackend())
+        active, idle = FakeSocket(), FakeSocket()
+        await manager.connect("gaming", active)
+        await manager.connect("gaming", idle)
+
+        reaper = Reaper([manager], interval=1, idle_timeout=30)
+        now = manager.last_seen[idle] + 60
+        manager.last_seen[active] = now
+
+        reaped = reaper.sweep(now=now)
+        await settle(lambda: active.sent and idle.close_code is not None)
+        return manager, reaper, reaped, active, idle
+
+    manager, reaper, reaped, active, idle = asyncio.run(run())
+    assert reaped == 1
+    assert reaper.total_reaped == 1
+    assert active.sent == [{"type": "ping"}]
+    assert idle.close_code == CLOSE_GOING_AWAY
+    assert manager.registry.sockets("gaming") == (active,)
+    assert idle not in manager.last_seen
+
+
+def test_reaper_reaps_sockets_whose_writer_failed():
+    async def run():
+        manager = ConnectionManager(MemoryBackend())
+        broken = BrokenSocket()
+        await manager.connect("gaming", broken)
+        await manager.broadcast("gaming", {"n": 1})
+        await settle(lambda: manager.send_queues[broken].closed)
+        return manager, Reaper([manager]).sweep()
+
+    manager, reaped = asyncio.run(run())
+    assert reaped == 1
+    assert manager.registry.rooms() == []
+
+
+def chat_frame(message_id):
+    return encode_frame({
+        "id": message_id,
+        "sender_persona_id": 1,
+        "sender_name": "Alice",
+        "content": f"m{message_id}",
+        "created_at": "2026-10-17T12:00:00",
+        "is_me": False,
+        "is_verified": False,
+    })
+
+
+def test_recent_window_only_vouches_for_ids_it_has_seen():
+    recent = RecentMessages(per_room=3)
+    assert recent.since("gaming", 0) is None
+
+    for message_id in (10, 12, 15):
+        recent.record("gaming", chat_frame(message_id))
+
+    assert recent.since("gaming", 9) == [chat_frame(i) for i in (10, 12, 15)]
+    assert recent.since("gaming", 12) == [chat_frame(15)]
+    assert recent.since("gaming", 8) is None
+
+    # Evicting 10 means ids up to 10 can no longer be vouched for
+    recent.record("gaming", chat_frame(20))
+    assert recent.since("gaming", 9) is None
+    assert recent.since("gaming", 10) == [chat_frame(i) for i in (12, 15, 20)]
+
+    recent.forget("gaming")
+    assert recent.since("gaming", 10) is None
+
+
+def test_recent_window_keeps_frames_that_arrive_out_of_order():
+    recent = RecentMessages(per_room=3)
+
+    for message_id in (9, 11, 10, 11):
+        recent.record("gaming", chat_frame(message_id))
+    assert recent.since("gaming", 9) == [chat_frame(i) for i in (10, 11)]
+
+    # A late frame that would be the oldest is evicted straight away
+    recent.record("gaming", chat_frame(13))
+    recent.record("gaming", chat_frame(12))
+    assert recent.since("gaming", 10) == [chat_frame(i) for i in (11, 12, 13)]
+    recent.record("gaming", chat_frame(8))
+    assert recent.since("gaming", 10) == [chat_frame(i) for i in (11, 12, 13)]
+
+
+def test_recent_window_serves_initial_history_and_evicts_whole_rooms():
+    from messaging.history import HistoryRow
+
+    recent = RecentMessages(per_room=5, max_rooms=2)
+
+    # Recorded from live traffic only: how much is older is unknown
+    recent.record("a", chat_frame(1))
+    assert recent.latest("a", 3) is None
+    for message_id in (2, 3, 4):
+        recent.record("a", chat_frame(message_id))
+    rows, has_older = recent.latest("a", 3)
+    assert [r.id for r in rows] == [2, 3, 4]
+    assert has_older is True
+
+    # Seeded from a page query that found the whole room
+    seeded = [HistoryRow(i, 1, "Alice", False, f"m{i}", datetime(2026, 10, 17)) for i in (7, 8)]
+    recent.seed("b", seeded, has_older=False)
+    recent.record("b", chat_frame(9))
+    rows, has_older = recent.latest("b", 3)
+    assert [r.id for r in rows] == [7, 8, 9]
+    assert has_older is False
+
+    # Touching "a" makes "b" the least recently used room
+    recent.latest("a", 3)
+    recent.record("c", chat_frame(11))
+    assert recent.latest("b", 3) is None
+    assert recent.latest("a", 3) is not None
+
+
+def test_seed_warms_a_window_started_by_live_traffic():
+    from messaging.history import HistoryRow
+
+    def rows(*ids):
+        return [HistoryRow(i, 1, "Alice", False, f"m{i}", datetime(2026, 10, 17)) for i in ids]
+
+    recent = RecentMessages(per_room=10)
+
+    # A message arrives before any page render for the room
+    recent.record("a", chat_frame(5))
+    assert recent.latest("a", 3) is None
+
+    recent.seed("a", rows(3, 4, 5), has_older=False)
+    result, has_older = recent.latest("a", 3)
+    assert [r.id for r in result] == [3, 4, 5]
+    assert has_older is False
+    assert recent.since("a", 2) is not None
+
+    # A stale query entirely below the floor only proves older messages exist
+    recent.record("b", chat_frame(20))
+    recent.seed("b", rows(7, 8), has_older=False)
+    result, has_older = recent.latest("b", 3)
+    assert [r.id for r in result] == [20]
+    assert has_older is True
+    assert recent.since("b", 18) is None
+
+
+def test_held_queue_sends_replay_before_live_frames():
+    async def run():
+        ws = FakeSocket()
+        queue = SendQueue(ws, held=True)
+        queue.offer(encode_frame({"id": 3}))
+        await asyncio.sleep(0.01)
+        assert ws.sent == []
+
+        queue.release([encode_frame({"id": 1}), encode_frame({"id": 2})])
+        await settle(lambda: len(ws.sent) == 3)
+        return ws
+
+    ws = asyncio.run(run())
+    assert [m["id"] for m in ws.sent] == [1, 2, 3]
@@ -144,4 +144,144 @@ def test_dm_start_reuses_existing_thread(db_session, client_factory):
         follow_redirects=False,
     )
     assert r.status_code in (302, 303)
-    assert r.headers["location"] == f"/dm/{existing.id}"
\ No newline at end of file
+    assert r.headers["location"] == f"/dm/{existing.id}"
+
+def test_category_history_api_pages_with_cursors(client, db_session):
+    from models import CategoryMessage
+
+    register_and_login(client)
+    name = uniq("Pager")
+    create_persona(client, "gaming", name, is_public="1")
+    persona = db_session.query(Persona).filter(Persona.name == name).first()
+    select_active_persona(client, "gaming", persona.id)
+
+    msgs = [CategoryMessage(category="gaming", sender_persona_id=persona.id, content=f"c{i}") for i in range(5)]
+    db_session.add_all(msgs)
+    db_session.commit()
+    ids = [m.id for m in msgs]
+
+    r = client.get("/api/chats/gaming/messages?limit=2")
+    assert r.status_code == 200
+    page = r.json()
+    newest = [m["id"] for m in page["messages"]]
+    assert newest == sorted(newest)
+    assert page["has_more"] is True
+    assert all(m["is_me"] for m in page["messages"])
+
+    r = client.get(f"/api/chats/gaming/messages?limit=2&before_id={page['next_before_id']}")
+    older = r.json()
+    assert [m["id"] for m in older["messages"]] == [i for i in ids if i < newest[0]][-2:]
+
+    r = client.get(f"/api/chats/gaming/messages?limit=10&after_id={ids[1]}")
+    assert [m["id"] for m in r.json()["messages"]][:3] == ids[2:]
+
+    assert client.get("/api/chats/gaming/messages?limit=1000").status_code == 422
+    assert client.get("/api/chats/gaming/messages?before_id=5&after_id=1").status_code == 400
+    assert client.get("/api/chats/academic/messages").status_code == 403
+
+
+def test_dm_history_api_requires_participant(db_session, client_factory):
+    from models import DMMessage
+
+    client_a = client_factory()
+    client_b = client_factory()
+    client_c = client_factory()
+
+    register_and_login(client_a)
+    register_and_login(client_b)
+    register_and_login(client_c)
+
+    a_name, b_name = uniq("AliceGaming"), uniq("BobGaming")
+    create_persona(client_a, "gaming", a_name, is_public="1")
+    create_persona(client_b, "gaming", b_name, is_public="1")
+
+    alice = db_session.query(Persona).filter(Persona.name == a_name).first()
+    bob = db_session.query(Persona).filter(Persona.name == b_name).first()
+
+    thread = DMThread(persona_a_id=alice.id, persona_b_id=bob.id, category="gaming")
+    db_session.add(thread)
+    db_session.flush()
+    db_session.add(DMMessage(thread_id=thread.id, sender_persona_id=alice.id, content="hey"))
+    db_session.commit()
+
+    r = client_b.get(f"/api/dm/{thread.id}/messages")
+    assert r.status_code == 200
+    data = r.json()
+    assert [m["content"] for m in data["messages"]] == ["hey"]
+    assert data["messages"][0]["is_me"] is False
+    assert data["has_more"] is False
+
+    assert client_c.get(f"/api/dm/{thread.id}/messages").status_code == 403
+
+
+def test_category_presence_reports_online_personas(client, db_session):
+    from routers.chat import manager
+    from realtime.registry import Presence
+
+    assert client.get("/api/chats/gaming/presence").status_code == 401
+
+    register_and_login(client)
+    category = uniq("room").lower()
+
+    # Only personas in the room's category may see who is online
+    assert client.get(f"/api/chats/{category}/presence").status_code == 403
+    name = uniq("Viewer")
+    create_persona(client, category, name)
+    viewer = db_session.query(Persona).filter(Persona.name == name).first()
+    select_active_persona(client, category, viewer.id)
+
+    alice, bob, carol = object(), object(), object()
+    presence = Presence(1, "Alice", True, True)
+
+    # Two tabs for the same persona count once; private personas are left out
+    manager.registry.add(category, alice, presence)
+    manager.registry.add(category, bob, presence)
+    manager.registry.add(category, carol, Presence(2, "Carol", False, False))
+    try:
+        r = client.get(f"/api/chats/{category.upper()}/presence")
+        assert r.status_code == 200
+        assert r.json() == {
+            "category": category,
+            "count": 1,
+            "online": [{"id": 1, "name": "Alice", "is_verified": True}],
+        }
+
+        # The room page counts the same personas as the API
+        page = client.get(f"/chats/{category}")
+        assert '<span id="onlineCount">1</span>' in page.text
+    finally:
+        manager.registry.remove(alice)
+        manager.registry.remove(bob)
+        manager.registry.remove(carol)
+
+    assert client.get(f"/api/chats/{category}/presence").json()["count"] == 0
+    assert category not in manager.registry.rooms()
+
+
+def test_initial_history_served_from_ring_buffer_once_warm():
+    from datetime import datetime
+
+    from messaging.history import HistoryRow
+    from routers.chat import INITIAL_HISTORY, initial_history, manager
+
+    room = f"dm:{uuid.uuid4().int % 10**9}"
+    rows = [HistoryRow(i, 1, "Alice", False, f"m{i}", datetime(2026, 10, 17)) for i in range(1, 6)]
+    loads = []
+
+    def load(limit):
+        loads.append(limit)
+        return rows
+
+    # Not subscribed on this worker: always queried, never cached
+    assert initial_history(room, load) == (rows, False)
+    assert initial_history(room, load) == (rows, False)
+    assert loads == [INITIAL_HISTORY + 1] * 2
+
+    manager.subscribed.add(room)
+    try:
+        initial_history(room, load)
+        assert initial_history(room, load) == (rows, False)
+        assert len(loads) == 3
+    finally:
+        manager.subscribed.discard(room)
+        manager.recent.forget(room)
@@ -0,0 +1,102 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from database import build_engine, read_url_for, SQLITE_BUSY_TIMEOUT_MS, DB_POOL_SIZE
+
+
+def test_sqlite_engine_applies_pragmas(tmp_path):
+    engine = build_engine(f"sqlite:///{tmp_path / 'profile.db'}")
+    try:
+        with engine.connect() as conn:
+            assert conn.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+            # NORMAL == 1
+            assert conn.execute(text("PRAGMA synchronous")).scalar() == 1
+            assert conn.execute(text("PRAGMA busy_timeout")).scalar() == SQLITE_BUSY_TIMEOUT_MS
+            # MEMORY == 2
+            assert conn.execute(text("PRAGMA temp_store")).scalar() == 2
+            assert conn.execute(text("PRAGMA cache_size")).scalar() < 0
+
+        assert engine.pool.size() == DB_POOL_SIZE
+    finally:
+        engine.dispose()
+
+
+def test_in_memory_sqlite_engine_still_works():
+    engine = build_engine("sqlite://")
+    try:
+        with engine.connect() as conn:
+            assert conn.execute(text("SELECT 1")).scalar() == 1
+    finally:
+        engine.dispose()
+
+
+def test_read_url_defaults_to_read_only_sqlite():
+    assert read_url_for("sqlite:///./app.db") == "sqlite:///file:./app.db?mode=ro&uri=true"
+    assert read_url_for("sqlite://") is None
+    assert read_url_for("sqlite:///./app.db", "sqlite:///./replica.db") == "sqlite:///./replica.db"
+
+
+def test_read_only_engine_rejects_writes(tmp_path):
+
+    path = tmp_path / "primary.db"
+    primary = build_engine(f"sqlite:///{path}")
+    with primary.begin() as conn:
+        conn.execute(text("CREATE TABLE t (id INTEGER PRIMARY KEY)"))
+        conn.execute(text("INSERT INTO t (id) VALUES (1)"))
+
+    replica = build_engine(read_url_for(f"sqlite:///{path}"))
+    try:
+        with replica.connect() as conn:
+            assert conn.execute(text("SELECT COUNT(*) FROM t")).scalar() == 1
+            with pytest.raises(OperationalError):
+                conn.execute(text("INSERT INTO t (id) VALUES (2)"))
+    finally:
+        replica.dispose()
+        primary.dispose()
+
+
+def test_read_db_uses_primary_right_after_a_write():
+    import database
+    from starlette.requests import Request
+
+    request = Request({"type": "http", "session": {}})
+
+    def factory_used():
+        gen = database.get_read_db(request)
+        db = next(gen)
+        bind = db.get_bind()
+        gen.close()
+        return bind
+
+    assert database.recently_wrote(request) is False
+    assert factory_used() is database.ReadSessionLocal.kw["bind"]
+
+    database.mark_write(request)
+    assert database.recently_wrote(request) is True
+    assert factory_used() is database.SessionLocal.kw["bind"]
+
+
+def test_concurrent_startup_migrations_all_succeed(tmp_path):
+    import os
+    import subprocess
+    import sys
+
+    import database
+
+    env = dict(
+        os.environ,
+        DATABASE_URL=f"sqlite:///{tmp_path / 'fresh.db'}",
+        MIGRATION_LOCK_PATH=str(tmp_path / "migrate.lock"),
+    )
+    script = "from database import run_migrations; run_migrations()"
+    workers = [
+        subprocess.Popen(
+            [sys.executable, "-c", script], cwd=database.BASE_DIR, env=env,
+            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+        )
+        for _ in range(4)
+    ]
+    results = [(w.returncode, err.decode()) for w in workers for _, err in [w.communicate(timeout=60)]]
+
+    assert [code for code, _ in results] == [0, 0, 0, 0], results
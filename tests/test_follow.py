@@ -1,4 +1,7 @@
+import html
+import re
 import uuid
+from follows import add_follow, repair_follow_counts
 from models import Persona, PersonaFollow, Notification
 
 
@@ -127,4 +130,208 @@ def test_unfollow_persona_removes_follow(db_session, client_factory):
         .filter(PersonaFollow.following_persona_id == bob.id)
         .first()
     )
-    assert follow is None
\ No newline at end of file
+    assert follow is None
+
+def test_followers_api_paginates_with_total_count(db_session, client_factory):
+    target_client = client_factory()
+    register_and_login(target_client)
+    target_name = uniq("Target")
+    create_persona(target_client, "gaming", target_name, is_public="1")
+    target = db_session.query(Persona).filter(Persona.name == target_name).first()
+
+    follower_ids = []
+    for _ in range(3):
+        c = client_factory()
+        register_and_login(c)
+        name = uniq("Fan")
+        create_persona(c, "gaming", name, is_public="1")
+        fan = db_session.query(Persona).filter(Persona.name == name).first()
+        add_follow(db_session, fan.id, target.id)
+        follower_ids.append(fan.id)
+    db_session.commit()
+
+    r = target_client.get(f"/api/personas/{target.id}/followers?limit=2")
+    first = r.json()
+    assert first["followers_count"] == 3
+    assert len(first["followers"]) == 2
+    assert first["next_cursor"]
+
+    r = target_client.get(f"/api/personas/{target.id}/followers?limit=2&cursor={first['next_cursor']}")
+    second = r.json()
+    assert second["next_cursor"] is None
+
+    ids = [p["id"] for p in first["followers"] + second["followers"]]
+    assert sorted(ids) == sorted(follower_ids)
+
+
+def test_list_counts_match_the_public_lists(db_session, client_factory):
+    client, viewer = client_factory(), client_factory()
+    register_and_login(client)
+    register_and_login(viewer)
+
+    names = [uniq(n) for n in ("Alice", "Bob", "Hidden")]
+    for name, is_public in zip(names, ("1", "1", "0")):
+        create_persona(client, "gaming", name, is_public=is_public)
+    alice, bob, hidden = (
+        db_session.query(Persona).filter(Persona.name == name).first() for name in names
+    )
+
+    for other in (bob, hidden):
+        add_follow(db_session, alice.id, other.id)
+        add_follow(db_session, other.id, alice.id)
+    db_session.commit()
+
+    followers = viewer.get(f"/api/personas/{alice.id}/followers").json()
+    following = viewer.get(f"/api/personas/{alice.id}/following").json()
+    connections = viewer.get(f"/api/personas/public/{alice.id}/connections").json()
+
+    assert (followers["followers_count"], len(followers["followers"])) == (1, 1)
+    assert (following["following_count"], len(following["following"])) == (1, 1)
+    assert (connections["connections_count"], len(connections["connections"])) == (1, 1)
+
+
+def test_owner_sees_private_follow_lists(db_session, client_factory):
+    owner, viewer = client_factory(), client_factory()
+    register_and_login(owner)
+    register_and_login(viewer)
+
+    names = [uniq("Private"), uniq("Hidden")]
+    for name in names:
+        create_persona(owner, "gaming", name, is_public="0")
+    private, hidden = (
+        db_session.query(Persona).filter(Persona.name == name).first() for name in names
+    )
+    add_follow(db_session, hidden.id, private.id)
+    db_session.commit()
+
+    assert viewer.get(f"/api/personas/{private.id}/followers").status_code == 403
+
+    r = owner.get(f"/api/personas/{private.id}/followers")
+    assert r.status_code == 200
+    assert r.json()["followers_count"] == 1
+    assert [p["id"] for p in r.json()["followers"]] == [hidden.id]
+    assert owner.get(f"/api/personas/{hidden.id}/following").json()["following_count"] == 1
+
+
+def test_persona_page_links_to_the_next_page_of_each_list(db_session, client_factory, monkeypatch):
+    import routers.users as users_router
+    monkeypatch.setattr(users_router, "DEFAULT_PAGE_SIZE", 1)
+
+    client, other = client_factory(), client_factory()
+    register_and_login(client)
+    register_and_login(other)
+
+    alice_name = uniq("Alice")
+    create_persona(client, "gaming", alice_name, is_public="1")
+    fan_names = [uniq("Bob"), uniq("Carol")]
+    for name in fan_names:
+        create_persona(other, "gaming", name, is_public="1")
+    alice = db_session.query(Persona).filter(Persona.name == alice_name).first()
+    bob, carol = (db_session.query(Persona).filter(Persona.name == name).first() for name in fan_names)
+    for fan in (bob, carol):
+        add_follow(db_session, fan.id, alice.id)
+    db_session.commit()
+
+    def followers_section(page):
+        return page.text.split("Followers (")[1].split("Connections (")[0]
+
+    first = client.get(f"/personas/{alice.id}")
+    assert first.status_code == 200
+    assert bob.name in followers_section(first) and carol.name not in followers_section(first)
+
+    link = re.search(r'href="(/personas/\d+\?followers_cursor=[^"]+)"', first.text)
+    assert link
+    second = client.get(html.unescape(link.group(1)))
+    assert carol.name in followers_section(second) and bob.name not in followers_section(second)
+    assert "followers_cursor=" not in second.text
+
+
+def test_connections_are_mutual_follows_only(db_session, client):
+    register_and_login(client)
+
+    names = [uniq(n) for n in ("Alice", "Bob", "Carol", "Dave")]
+    for name in names:
+        create_persona(client, "gaming", name, is_public="1")
+    alice, bob, carol, dave = (
+        db_session.query(Persona).filter(Persona.name == name).first() for name in names
+    )
+
+    for follower, following in ((alice, bob), (bob, alice), (alice, carol), (dave, alice), (alice, dave)):
+        add_follow(db_session, follower.id, following.id)
+    db_session.commit()
+
+    r = client.get(f"/api/personas/public/{alice.id}/connections?limit=1")
+    assert r.status_code == 200
+    data = r.json()
+    assert data["connections_count"] == 2
+    assert [p["id"] for p in data["connections"]] == [bob.id]
+
+    r = client.get(f"/api/personas/public/{alice.id}/connections?limit=1&cursor={data['next_cursor']}")
+    assert [p["id"] for p in r.json()["connections"]] == [dave.id]
+    assert r.json()["next_cursor"] is None
+
+    assert client.get(f"/personas/{alice.id}").status_code == 200
+
+
+def test_follow_and_unfollow_maintain_counters(db_session, monkeypatch, client_factory):
+    async def fake_send_to_user(user_id, payload):
+        return None
+
+    from routers.users import notification_manager
+    monkeypatch.setattr(notification_manager, "send_to_user", fake_send_to_user)
+
+    client_a = client_factory()
+    client_b = client_factory()
+    register_and_login(client_a)
+    register_and_login(client_b)
+
+    alice_name, bob_name = uniq("Alice"), uniq("Bob")
+    create_persona(client_a, "gaming", alice_name, is_public="1")
+    create_persona(client_b, "gaming", bob_name, is_public="1")
+    alice = db_session.query(Persona).filter(Persona.name == alice_name).first()
+    bob = db_session.query(Persona).filter(Persona.name == bob_name).first()
+
+    select_active_persona(client_a, "gaming", alice.id)
+    select_active_persona(client_b, "gaming", bob.id)
+
+    client_a.post(f"/personas/{bob.id}/follow", follow_redirects=False)
+    client_b.post(f"/personas/{alice.id}/follow", follow_redirects=False)
+
+    db_session.refresh(alice)
+    db_session.refresh(bob)
+    assert (alice.follower_count, alice.following_count, alice.mutual_count) == (1, 1, 1)
+    assert (bob.follower_count, bob.following_count, bob.mutual_count) == (1, 1, 1)
+
+    r = client_a.get(f"/api/personas/public/{bob.id}")
+    assert (r.json()["follower_count"], r.json()["mutual_count"]) == (1, 1)
+
+    client_a.post(f"/personas/{bob.id}/unfollow", follow_redirects=False)
+
+    db_session.refresh(alice)
+    db_session.refresh(bob)
+    assert (alice.follower_count, alice.following_count, alice.mutual_count) == (1, 0, 0)
+    assert (bob.follower_count, bob.following_count, bob.mutual_count) == (0, 1, 0)
+
+
+def test_repair_follow_counts_fixes_drift(db_session, client):
+    register_and_login(client)
+    names = [uniq("Alice"), uniq("Bob")]
+    for name in names:
+        create_persona(client, "gaming", name, is_public="1")
+    alice, bob = (db_session.query(Persona).filter(Persona.name == name).first() for name in names)
+
+    # Rows written behind the counters' back
+    db_session.add_all([
+        PersonaFollow(follower_persona_id=alice.id, following_persona_id=bob.id),
+        PersonaFollow(follower_persona_id=bob.id, following_persona_id=alice.id),
+    ])
+    alice.follower_count = 7
+    db_session.commit()
+
+    assert repair_follow_counts(db_session, batch_size=1) >= 2
+
+    db_session.refresh(alice)
+    db_session.refresh(bob)
+    assert (alice.follower_count, alice.following_count, alice.mutual_count) == (1, 1, 1)
+    assert (bob.follower_count, bob.following_count, bob.mutual_count) == (1, 1, 1)
+    assert repair_follow_counts(db_session) == 0
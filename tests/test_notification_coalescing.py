@@ -0,0 +1,111 @@
+import asyncio
+
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+
+import models
+from database import build_async_engine
+from messaging.notifications import DMNotificationCoalescer
+
+
+def make_factory(tmp_path):
+    path = tmp_path / "notifications.db"
+    sync_engine = create_engine(f"sqlite:///{path}")
+    models.Base.metadata.create_all(bind=sync_engine)
+
+    with sessionmaker(bind=sync_engine)() as db:
+        user = models.User(username="bob", email="bob@example.com", password_hash="x")
+        db.add(user)
+        db.commit()
+        user_id = user.id
+
+    async_engine = build_async_engine(f"sqlite+aiosqlite:///{path}", poolclass=NullPool)
+    return sync_engine, async_sessionmaker(async_engine, expire_on_commit=False), user_id
+
+
+def test_burst_pushes_leading_update_then_one_coalesced_update(tmp_path):
+    sync_engine, factory, user_id = make_factory(tmp_path)
+    pushed = []
+
+    async def publish(uid, notif):
+        pushed.append((uid, notif.id, notif.item_count, notif.title))
+
+    coalescer = DMNotificationCoalescer(factory, publish, window=0.05)
+
+    async def run():
+        for i in range(5):
+            coalescer.add(user_id, 7, "Alice", f"m{i}")
+            await asyncio.sleep(0)  # messages arrive on separate socket reads
+        await asyncio.sleep(0.2)
+        # A second thread gets its own notification
+        coalescer.add(user_id, 8, "Carol", "hey")
+        await coalescer.drain()
+
+    asyncio.run(run())
+
+    thread_7 = [p for p in pushed if p[3].endswith("Alice")]
+    assert [p[2] for p in thread_7] == [1, 5]
+    assert thread_7[0][1] == thread_7[1][1]
+    assert thread_7[1][3] == "5 new messages from Alice"
+
+    with sessionmaker(bind=sync_engine)() as db:
+        rows = db.query(models.Notification).order_by(models.Notification.id).all()
+        assert [(r.link, r.item_count) for r in rows] == [("/dm/7", 5), ("/dm/8", 1)]
+    sync_engine.dispose()
+
+
+def test_read_notification_starts_a_new_one(tmp_path):
+    sync_engine, factory, user_id = make_factory(tmp_path)
+
+    async def publish(uid, notif):
+        pass
+
+    coalescer = DMNotificationCoalescer(factory, publish, window=0.01)
+
+    async def burst():
+        coalescer.add(user_id, 7, "Alice", "first")
+        await coalescer.drain()
+
+    asyncio.run(burst())
+    with sessionmaker(bind=sync_engine)() as db:
+        db.query(models.Notification).update({"is_read": True})
+        db.commit()
+
+    asyncio.run(burst())
+    with sessionmaker(bind=sync_engine)() as db:
+        assert db.query(models.Notification).count() == 2
+    sync_engine.dispose()
+
+
+def test_new_burst_does_not_refresh_an_old_unread_notification(tmp_path):
+    sync_engine, factory, user_id = make_factory(tmp_path)
+
+    async def publish(uid, notif):
+        pass
+
+    coalescer = DMNotificationCoalescer(factory, publish, window=0.01)
+
+    async def burst(content):
+        coalescer.add(user_id, 7, "Alice", content)
+        await coalescer.drain()
+
+    # An unread notification from an earlier burst, now far down the list
+    asyncio.run(burst("long ago"))
+    with sessionmaker(bind=sync_engine)() as db:
+        for i in range(3):
+            db.add(models.Notification(user_id=user_id, type="follow", title=f"n{i}", message=""))
+        db.commit()
+
+    asyncio.run(burst("just now"))
+    with sessionmaker(bind=sync_engine)() as db:
+        newest = (
+            db.query(models.Notification)
+            .filter(models.Notification.user_id == user_id)
+            .order_by(models.Notification.id.desc())
+            .first()
+        )
+        assert (newest.type, newest.message, newest.item_count) == ("dm_message", "just now", 1)
+        assert db.query(models.Notification).filter(models.Notification.type == "dm_message").count() == 2
+    sync_engine.dispose()
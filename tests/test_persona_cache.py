@@ -0,0 +1,240 @@
+import uuid
+
+import pytest
+
+from models import Persona
+from persona_cache import PersonaCache, PersonaSnapshot, persona_cache
+
+
+def uniq(prefix="test"):
+    return f"{prefix}_{uuid.uuid4().hex[:8]}"
+
+
+def register_and_login(client, username=None, email=None, password="password123"):
+    if username is None:
+        username = uniq("user")
+    if email is None:
+        email = f"{username}@example.com"
+
+    client.post(
+        "/register",
+        data={"username": username, "email": email, "password": password},
+        follow_redirects=False,
+    )
+    client.post(
+        "/login",
+        data={"username": username, "password": password},
+        follow_redirects=False,
+    )
+    return username, email
+
+
+def create_persona(client, category, name, description="", is_public="1"):
+    return client.post(
+        "/personas/new",
+        data={
+            "category": category,
+            "name": name,
+            "description": description,
+            "is_public": is_public,
+        },
+        follow_redirects=False,
+    )
+
+
+def select_active_persona(client, category, persona_id):
+    return client.post(
+        "/chats/enter",
+        data={"category": category, "persona_id": str(persona_id)},
+        follow_redirects=False,
+    )
+
+
+def snapshot(persona_id, user_id=1, name="Alice"):
+    return PersonaSnapshot(persona_id, user_id, "alice", name, "gaming", None, True, False, 0)
+
+
+class FakeSession:
+    """Counts loads; get() only needs execute(...).first()."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.loads = 0
+
+    def execute(self, statement):
+        self.loads += 1
+        persona_id = statement.whereclause.right.value
+        row = self.rows.get(persona_id)
+
+        class Result:
+            def first(self):
+                return row
+
+        return Result()
+
+
+def persona_row(persona_id, user_id=1, name="Alice"):
+    return (
+        Persona(id=persona_id, user_id=user_id, name=name, category="gaming",
+                is_public=True, is_verified=False, verified_providers=0),
+        "alice",
+    )
+
+
+def test_cache_hits_evicts_lru_and_expires():
+    db = FakeSession({1: persona_row(1), 2: persona_row(2), 3: persona_row(3)})
+    cache = PersonaCache(max_size=2, ttl=60)
+
+    assert cache.get(db, 1).name == "Alice"
+    assert cache.get(db, 1) is cache.get(db, 1)
+    assert db.loads == 1
+
+    cache.get(db, 2)
+    cache.get(db, 1)  # 2 is now least recently used
+    cache.get(db, 3)
+    assert db.loads == 3
+    cache.get(db, 1)
+    assert db.loads == 3
+    cache.get(db, 2)
+    assert db.loads == 4
+
+    assert cache.get(db, 404) is None
+    assert cache.get(db, None) is None
+
+    cache.ttl = -1
+    cache.get(db, 1)
+    assert db.loads == 6
+
+
+def test_snapshots_are_immutable():
+    s = snapshot(1)
+    with pytest.raises(AttributeError):
+        s.name = "Mallory"
+
+
+def test_invalidate_wins_over_a_racing_load():
+    cache = PersonaCache()
+    _, generation = cache._cached(7)
+
+    # A writer commits and invalidates while the old row is being read
+    cache.invalidate(7)
+    cache._store(snapshot(7, name="Old"), generation)
+
+    db = FakeSession({7: persona_row(7, name="New")})
+    assert cache.get(db, 7).name == "New"
+
+
+def test_invalidate_user_drops_only_their_personas():
+    cache = PersonaCache()
+    cache._store(snapshot(1, user_id=10), 0)
+    cache._store(snapshot(2, user_id=10), 0)
+    cache._store(snapshot(3, user_id=11), 0)
+
+    cache.invalidate_user(10)
+
+    assert cache._cached(1)[0] is None
+    assert cache._cached(2)[0] is None
+    assert cache._cached(3)[0] is not None
+
+
+def test_follow_reuses_cached_active_persona(db_session, monkeypatch, client_factory, count_queries):
+    async def fake_send_to_user(user_id, payload):
+        return None
+
+    from routers.users import notification_manager
+    monkeypatch.setattr(notification_manager, "send_to_user", fake_send_to_user)
+
+    client_a = client_factory()
+    client_b = client_factory()
+    register_and_login(client_a)
+    register_and_login(client_b)
+
+    alice_name, bob_name = uniq("Alice"), uniq("Bob")
+    create_persona(client_a, "gaming", alice_name)
+    create_persona(client_b, "gaming", bob_name)
+    alice = db_session.query(Persona).filter(Persona.name == alice_name).first()
+    bob = db_session.query(Persona).filter(Persona.name == bob_name).first()
+
+    bob_id = bob.id
+    select_active_persona(client_a, "gaming", alice.id)
+
+    with count_queries() as statements:
+        client_a.post(f"/personas/{bob_id}/follow", follow_redirects=False)
+        client_a.post(f"/personas/{bob_id}/unfollow", follow_redirects=False)
+        client_a.post(f"/personas/{bob_id}/follow", follow_redirects=False)
+
+    # Alice was cached by /chats/enter; only Bob is loaded, once
+    assert len([s for s in statements if "FROM personas" in s]) == 1
+
+
+def test_edit_persona_refreshes_cached_snapshot(db_session, client):
+    register_and_login(client)
+    name = uniq("Alice")
+    create_persona(client, "gaming", name)
+    alice = db_session.query(Persona).filter(Persona.name == name).first()
+
+    select_active_persona(client, "gaming", alice.id)
+    assert persona_cache.get(db_session, alice.id).category == "gaming"
+
+    client.post(
+        f"/personas/{alice.id}/edit",
+        data={"category": "academic", "name": name, "description": "", "is_public": "1"},
+        follow_redirects=False,
+    )
+
+    # The old category no longer authorizes the room
+    r = client.get("/chats/gaming", follow_redirects=False)
+    assert r.status_code == 303
+    assert r.headers["location"] == "/chats"
+
+
+def test_public_profile_follows_username_change(db_session, client):
+    username, email = register_and_login(client)
+    name = uniq("Alice")
+    create_persona(client, "gaming", name)
+    alice = db_session.query(Persona).filter(Persona.name == name).first()
+
+    r = client.get(f"/public/{username}/{alice.id}")
+    assert name in r.text
+
+    renamed = uniq("renamed")
+    client.post(
+        "/account/edit",
+        data={"username": renamed, "email": email},
+        follow_redirects=False,
+    )
+
+    assert "Public profile not found." in client.get(f"/public/{username}/{alice.id}").text
+    assert name in client.get(f"/public/{renamed}/{alice.id}").text
+
+
+def test_hot_public_profile_skips_database_and_rendering(db_session, client, monkeypatch, count_queries):
+    import routers.users as users_router
+
+    username, _ = register_and_login(client)
+    name = uniq("Alice")
+    create_persona(client, "gaming", name, description="<b>hi</b>")
+    persona_id = db_session.query(Persona.id).filter(Persona.name == name).scalar()
+
+    renders = []
+    render = users_router.public_profiles.render
+    monkeypatch.setattr(users_router.public_profiles, "render", lambda p: renders.append(p) or render(p))
+
+    first = client.get(f"/public/{username}/{persona_id}")
+    assert "&lt;b&gt;hi&lt;/b&gt;" in first.text
+
+    with count_queries() as statements:
+        second = client.get(f"/public/{username}/{persona_id}")
+
+    assert second.text == first.text
+    assert statements == []
+    assert len(renders) == 1
+
+    client.post(
+        f"/personas/{persona_id}/edit",
+        data={"category": "gaming", "name": name, "description": "updated", "is_public": "1"},
+        follow_redirects=False,
+    )
+
+    assert "updated" in client.get(f"/public/{username}/{persona_id}").text
+    assert len(renders) == 2
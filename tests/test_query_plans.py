@@ -0,0 +1,212 @@
+import re
+
+import pytest
+from sqlalchemy import create_engine, tuple_
+from alembic.autogenerate import compare_metadata
+from alembic.migration import MigrationContext
+
+import models
+from database import run_migrations
+from follows import mutuals_query
+from messaging.inbox import inbox_query
+
+
+FULL_SCAN = re.compile(r"^SCAN (\w+)$")
+
+
+def explain(db_session, query):
+    sql = str(query.statement.compile(
+        dialect=db_session.get_bind().dialect,
+        compile_kwargs={"literal_binds": True},
+    ))
+    rows = db_session.connection().exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}").fetchall()
+    return [row[-1] for row in rows]
+
+
+def assert_no_full_scan(db_session, query):
+    plan = explain(db_session, query)
+    scans = [step for step in plan if FULL_SCAN.match(step)]
+    assert not scans, f"full table scan in plan: {plan}"
+
+
+HOT_QUERIES = {
+    "category_history": lambda db: (
+        db.query(models.CategoryMessage, models.Persona.name)
+        .join(models.Persona, models.Persona.id == models.CategoryMessage.sender_persona_id)
+        .filter(models.CategoryMessage.category == "gaming")
+        .order_by(models.CategoryMessage.id.desc())
+        .limit(50)
+    ),
+    "dm_history": lambda db: (
+        db.query(models.DMMessage, models.Persona.name)
+        .join(models.Persona, models.Persona.id == models.DMMessage.sender_persona_id)
+        .filter(models.DMMessage.thread_id == 1)
+        .order_by(models.DMMessage.id.desc())
+        .limit(50)
+    ),
+    "dm_history_after_cursor": lambda db: (
+        db.query(models.DMMessage)
+        .filter(models.DMMessage.thread_id == 1)
+        .filter(models.DMMessage.id > 100)
+        .order_by(models.DMMessage.id.asc())
+        .limit(50)
+    ),
+    "notifications": lambda db: (
+        db.query(models.Notification)
+        .filter(models.Notification.user_id == 1)
+        .order_by(models.Notification.id.desc())
+        .limit(50)
+    ),
+    "follow_exists": lambda db: (
+        db.query(models.PersonaFollow)
+        .filter(models.PersonaFollow.follower_persona_id == 1)
+        .filter(models.PersonaFollow.following_persona_id == 2)
+    ),
+    "followers": lambda db: (
+        db.query(models.Persona)
+        .join(models.PersonaFollow, models.PersonaFollow.follower_persona_id == models.Persona.id)
+        .filter(models.PersonaFollow.following_persona_id == 1)
+    ),
+    "mutual_connections": lambda db: mutuals_query(db, 1),
+    "dm_thread_lookup": lambda db: (
+        db.query(models.DMThread)
+        .filter(models.DMThread.category == "gaming")
+        .filter(
+            ((models.DMThread.persona_a_id == 1) & (models.DMThread.persona_b_id == 2)) |
+            ((models.DMThread.persona_a_id == 2) & (models.DMThread.persona_b_id == 1))
+        )
+    ),
+    "dm_inbox": lambda db: (
+        db.query(models.DMThread)
+        .filter(
+            (models.DMThread.persona_a_id.in_([1, 2])) |
+            (models.DMThread.persona_b_id.in_([1, 2]))
+        )
+    ),
+    "dm_inbox_page": lambda db: inbox_query(db, 1).limit(51),
+    "identities_for_persona": lambda db: (
+        db.query(models.ExternalIdentity)
+        .filter(models.ExternalIdentity.persona_id == 1)
+    ),
+    "identity_by_provider": lambda db: (
+        db.query(models.ExternalIdentity)
+        .filter(models.ExternalIdentity.provider == "google")
+        .filter(models.ExternalIdentity.provider_user_id == "abc")
+    ),
+    "public_personas_in_category": lambda db: (
+        db.query(models.Persona)
+        .filter(models.Persona.category == "gaming")
+        .filter(models.Persona.is_public == True)
+        .order_by(models.Persona.name.asc())
+    ),
+    "public_personas_page_after_cursor": lambda db: (
+        db.query(models.Persona)
+        .filter(models.Persona.is_public == True)
+        .filter(tuple_(models.Persona.name, models.Persona.id) > tuple_("m", 10))
+        .order_by(models.Persona.name, models.Persona.id)
+        .limit(51)
+    ),
+}
+
+
+@pytest.mark.parametrize("name", sorted(HOT_QUERIES))
+def test_hot_query_uses_index(db_session, name):
+    assert_no_full_scan(db_session, HOT_QUERIES[name](db_session))
+
+
+def test_migrations_match_models(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'migrated.db'}")
+    try:
+        run_migrations(engine)
+
+        with engine.connect() as connection:
+            diff = compare_metadata(MigrationContext.configure(connection), models.Base.metadata)
+    finally:
+        engine.dispose()
+
+    assert diff == []
+
+
+def migrate_to(engine, revision):
+    from alembic import command
+    from database import alembic_config
+
+    config = alembic_config()
+    with engine.begin() as connection:
+        config.attributes["connection"] = connection
+        command.upgrade(config, revision)
+
+
+def seed_identities(engine, rows):
+    with engine.begin() as connection:
+        connection.exec_driver_sql(
+            "INSERT INTO users (id, username, email, password_hash, mfa_enabled) "
+            "VALUES (1, 'alice', 'alice@example.com', 'x', 0)"
+        )
+        connection.exec_driver_sql(
+            "INSERT INTO personas (id, user_id, name, category, is_public) "
+            "VALUES (1, 1, 'Alice', 'gaming', 1), (2, 1, 'Alicia', 'gaming', 1)"
+        )
+        for persona_id, provider, provider_user_id in rows:
+            connection.exec_driver_sql(
+                "INSERT INTO external_identities (persona_id, provider, provider_user_id) "
+                f"VALUES ({persona_id}, '{provider}', '{provider_user_id}')"
+            )
+
+
+def test_identity_dedupe_keeps_verification_columns_in_step(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'dupes.db'}")
+    try:
+        migrate_to(engine, "0002")
+        seed_identities(engine, [(1, "google", "g1"), (1, "google", "g1"), (1, "steam", "s1")])
+        migrate_to(engine, "head")
+
+        with engine.connect() as connection:
+            identities = connection.exec_driver_sql("SELECT COUNT(*) FROM external_identities").scalar()
+            verification = connection.exec_driver_sql(
+                "SELECT id, is_verified, verified_providers FROM personas ORDER BY id"
+            ).all()
+    finally:
+        engine.dispose()
+
+    assert identities == 2
+    assert verification == [(1, 1, 3), (2, 0, 0)]
+
+
+def test_identity_linked_to_two_personas_stops_the_upgrade(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'conflict.db'}")
+    try:
+        migrate_to(engine, "0002")
+        seed_identities(engine, [(1, "google", "g1"), (2, "google", "g1")])
+        with pytest.raises(RuntimeError, match="google:g1"):
+            migrate_to(engine, "head")
+
+        with engine.connect() as connection:
+            identities = connection.exec_driver_sql("SELECT COUNT(*) FROM external_identities").scalar()
+    finally:
+        engine.dispose()
+
+    assert identities == 2
+
+
+def test_database_created_with_verification_columns_still_migrates(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'create_all.db'}")
+    try:
+        # What create_all() built once the models had the columns but
+        # before the migration history existed
+        migrate_to(engine, "0002")
+        seed_identities(engine, [(1, "steam", "s1")])
+        with engine.begin() as connection:
+            connection.exec_driver_sql("DROP TABLE alembic_version")
+            connection.exec_driver_sql("UPDATE personas SET is_verified = 0, verified_providers = 0")
+
+        run_migrations(engine)
+
+        with engine.connect() as connection:
+            verification = connection.exec_driver_sql(
+                "SELECT id, is_verified, verified_providers FROM personas ORDER BY id"
+            ).all()
+    finally:
+        engine.dispose()
+
+    assert verification == [(1, 1, 2), (2, 0, 0)]
@@ -0,0 +1,258 @@
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+
+from main import app
+from models import User, Persona, DMThread, CategoryMessage, DMMessage, Notification
+
+
+def uniq(prefix="test"):
+    return f"{prefix}_{uuid.uuid4().hex[:8]}"
+
+
+def seed_persona(db, category="gaming", is_public=True):
+    user = User(username=uniq("user"), email=f"{uniq('mail')}@example.com", password_hash="x")
+    db.add(user)
+    db.flush()
+
+    persona = Persona(user_id=user.id, name=uniq("Persona"), category=category, is_public=is_public)
+    db.add(persona)
+    db.commit()
+    db.refresh(persona)
+    return persona
+
+
+def test_category_socket_persists_and_broadcasts(live_db):
+    with live_db() as db:
+        alice = seed_persona(db)
+        bob = seed_persona(db)
+
+    with TestClient(app) as client:
+        with client.websocket_connect(f"/ws/chats/gaming/{alice.id}") as ws_a, \
+                client.websocket_connect(f"/ws/chats/gaming/{bob.id}") as ws_b:
+            ws_a.send_json({"content": "hello room"})
+
+            got_a = ws_a.receive_json()
+            got_b = ws_b.receive_json()
+
+    assert got_a == got_b
+    assert got_a["content"] == "hello room"
+    assert got_a["sender_name"] == alice.name
+
+    with live_db() as db:
+        stored = db.query(CategoryMessage).filter(CategoryMessage.id == got_a["id"]).first()
+        assert stored is not None
+        assert stored.sender_persona_id == alice.id
+
+
+def test_category_socket_rejects_wrong_category(live_db):
+    with live_db() as db:
+        alice = seed_persona(db, category="academic")
+
+    with TestClient(app) as client:
+        with pytest.raises(WebSocketDisconnect):
+            with client.websocket_connect(f"/ws/chats/gaming/{alice.id}") as ws:
+                ws.receive_json()
+
+
+def test_dm_socket_stores_message_and_notifies_recipient(live_db):
+    with live_db() as db:
+        alice = seed_persona(db)
+        bob = seed_persona(db)
+        thread = DMThread(persona_a_id=alice.id, persona_b_id=bob.id, category="gaming")
+        db.add(thread)
+        db.commit()
+        db.refresh(thread)
+
+    with TestClient(app) as client:
+        with client.websocket_connect(f"/ws/notifications/{bob.user_id}") as notif_ws, \
+                client.websocket_connect(f"/ws/dm/{thread.id}/{alice.id}") as dm_ws:
+            dm_ws.send_json({"content": "hi bob"})
+
+            pushed = notif_ws.receive_json()
+            echoed = dm_ws.receive_json()
+
+    assert echoed["content"] == "hi bob"
+    assert pushed["type"] == "dm_message"
+    assert pushed["link"] == f"/dm/{thread.id}"
+
+    with live_db() as db:
+        assert db.query(DMMessage).filter(DMMessage.thread_id == thread.id).count() == 1
+        assert db.query(Notification).filter(Notification.user_id == bob.user_id).count() == 1
+
+
+def test_category_socket_broadcasts_in_id_order(live_db):
+    with live_db() as db:
+        alice = seed_persona(db)
+
+    with TestClient(app) as client:
+        with client.websocket_connect(f"/ws/chats/gaming/{alice.id}") as ws:
+            for i in range(5):
+                ws.send_json({"content": f"line {i}"})
+            received = [ws.receive_json() for _ in range(5)]
+
+    assert [m["content"] for m in received] == [f"line {i}" for i in range(5)]
+    ids = [m["id"] for m in received]
+    assert ids == sorted(ids)
+
+
+def test_pong_frames_count_as_activity_without_posting(live_db):
+    from routers.chat import manager
+
+    with live_db() as db:
+        alice = seed_persona(db)
+
+    with TestClient(app) as client:
+        with client.websocket_connect(f"/ws/chats/gaming/{alice.id}") as ws:
+            ws.send_json({"type": "pong"})
+            ws.send_json({"content": "after pong"})
+            got = ws.receive_json()
+            assert len(manager.last_seen) == 1
+
+    assert got["content"] == "after pong"
+    with live_db() as db:
+        assert db.query(CategoryMessage).filter(CategoryMessage.content == "").count() == 0
+
+
+def test_sender_snapshot_refreshes_after_invalidation(live_db):
+    from persona_cache import persona_cache
+
+    with live_db() as db:
+        alice = seed_persona(db)
+
+    with TestClient(app) as client:
+        with client.websocket_connect(f"/ws/chats/gaming/{alice.id}") as ws:
+            ws.send_json({"content": "before"})
+            before = ws.receive_json()
+
+            with live_db() as db:
+                db.query(Persona).filter(Persona.id == alice.id).update({"name": "Renamed"})
+                db.commit()
+
+            # Without invalidation the cached snapshot is still used
+            ws.send_json({"content": "cached"})
+            cached = ws.receive_json()
+
+            persona_cache.invalidate(alice.id)
+            ws.send_json({"content": "after"})
+            after = ws.receive_json()
+
+    assert before["sender_name"] == alice.name
+    assert cached["sender_name"] == alice.name
+    assert after["sender_name"] == "Renamed"
+
+
+def test_category_socket_closes_when_persona_moves_category(live_db):
+    from persona_cache import persona_cache
+
+    with live_db() as db:
+        alice = seed_persona(db)
+
+    with TestClient(app) as client:
+        with client.websocket_connect(f"/ws/chats/gaming/{alice.id}") as ws:
+            with live_db() as db:
+                db.query(Persona).filter(Persona.id == alice.id).update({"category": "academic"})
+                db.commit()
+            persona_cache.invalidate(alice.id)
+
+            ws.send_json({"content": "still here?"})
+            with pytest.raises(WebSocketDisconnect) as exc:
+                ws.receive_json()
+
+    assert exc.value.code == 1008
+    with live_db() as db:
+        assert db.query(CategoryMessage).filter(CategoryMessage.sender_persona_id == alice.id).count() == 0
+
+
+def test_dm_burst_coalesces_into_one_notification(live_db):
+    with live_db() as db:
+        alice = seed_persona(db)
+        bob = seed_persona(db)
+        thread = DMThread(persona_a_id=alice.id, persona_b_id=bob.id, category="gaming")
+        db.add(thread)
+        db.commit()
+        db.refresh(thread)
+
+    with TestClient(app) as client:
+        with client.websocket_connect(f"/ws/notifications/{bob.user_id}") as notif_ws, \
+                client.websocket_connect(f"/ws/dm/{thread.id}/{alice.id}") as dm_ws:
+            for i in range(4):
+                dm_ws.send_json({"content": f"line {i}"})
+                dm_ws.receive_json()
+
+            first = notif_ws.receive_json()
+    # Leaving the client shuts the app down, which flushes the open burst
+
+    assert first["title"] == f"New DM from {alice.name}"
+    assert first["count"] == 1
+
+    with live_db() as db:
+        rows = db.query(Notification).filter(Notification.user_id == bob.user_id).all()
+        assert len(rows) == 1
+        assert rows[0].id == first["id"]
+        assert rows[0].item_count == 4
+        assert rows[0].title == f"4 new messages from {alice.name}"
+        assert rows[0].message == "line 3"
+
+
+def test_reconnect_replays_missed_messages_from_memory(live_db):
+    with live_db() as db:
+        alice = seed_persona(db)
+        bob = seed_persona(db)
+
+    with TestClient(app) as client:
+        with client.websocket_connect(f"/ws/chats/gaming/{alice.id}") as ws_a:
+            ws_a.send_json({"content": "seen"})
+            seen = ws_a.receive_json()
+            ws_a.send_json({"content": "missed 1"})
+            ws_a.send_json({"content": "missed 2"})
+            ws_a.receive_json()
+            ws_a.receive_json()
+
+            # Alice's room socket stays open, so the room window is warm
+            with client.websocket_connect(f"/ws/chats/gaming/{bob.id}?after_id={seen['id']}") as ws_b:
+                replayed = [ws_b.receive_json(), ws_b.receive_json()]
+                ws_a.send_json({"content": "live"})
+                live = ws_b.receive_json()
+
+    assert [m["content"] for m in replayed] == ["missed 1", "missed 2"]
+    assert live["content"] == "live"
+
+
+def test_reconnect_falls_back_to_database_range(live_db):
+    with live_db() as db:
+        alice = seed_persona(db)
+        thread = DMThread(persona_a_id=alice.id, persona_b_id=seed_persona(db).id, category="gaming")
+        db.add(thread)
+        db.commit()
+        sent = []
+        for i in range(3):
+            msg = DMMessage(thread_id=thread.id, sender_persona_id=alice.id, content=f"dm {i}")
+            db.add(msg)
+            db.commit()
+            sent.append(msg.id)
+
+    with TestClient(app) as client:
+        with client.websocket_connect(f"/ws/dm/{thread.id}/{alice.id}?after_id={sent[0]}") as ws:
+            replayed = [ws.receive_json(), ws.receive_json()]
+
+    assert [m["id"] for m in replayed] == sent[1:]
+    assert replayed[0]["sender_name"] == alice.name
+
+
+def test_reconnect_too_far_behind_asks_client_to_resync(live_db, monkeypatch):
+    import routers.chat as chat_router
+
+    monkeypatch.setattr(chat_router, "REPLAY_LIMIT", 2)
+
+    with live_db() as db:
+        alice = seed_persona(db)
+        for i in range(4):
+            db.add(CategoryMessage(category="gaming", sender_persona_id=alice.id, content=f"old {i}"))
+        db.commit()
+
+    with TestClient(app) as client:
+        with client.websocket_connect(f"/ws/chats/gaming/{alice.id}?after_id=0") as ws:
+            assert ws.receive_json() == {"type": "resync"}
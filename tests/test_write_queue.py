@@ -0,0 +1,76 @@
+import asyncio
+
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+
+import models
+from database import build_async_engine
+from messaging.write_queue import MessageWriteQueue
+
+
+def make_factory(tmp_path):
+    path = tmp_path / "writes.db"
+    sync_engine = create_engine(f"sqlite:///{path}")
+    models.Base.metadata.create_all(bind=sync_engine)
+
+    with sessionmaker(bind=sync_engine)() as db:
+        user = models.User(username="writer", email="writer@example.com", password_hash="x")
+        db.add(user)
+        db.flush()
+        persona = models.Persona(user_id=user.id, name="Writer", category="gaming")
+        db.add(persona)
+        db.commit()
+        persona_id = persona.id
+
+    async_engine = build_async_engine(f"sqlite+aiosqlite:///{path}", poolclass=NullPool)
+    return sync_engine, async_sessionmaker(async_engine, expire_on_commit=False), persona_id
+
+
+def test_batches_commit_in_submission_order(tmp_path):
+    sync_engine, factory, persona_id = make_factory(tmp_path)
+    sessions = []
+
+    def counting_factory():
+        sessions.append(1)
+        return factory()
+
+    queue = MessageWriteQueue(counting_factory, max_batch=4, max_delay=0.01)
+
+    async def run():
+        return await asyncio.gather(*(
+            queue.submit(models.CategoryMessage(
+                category="gaming", sender_persona_id=persona_id, content=f"m{i}",
+            ))
+            for i in range(10)
+        ))
+
+    stored = asyncio.run(run())
+
+    assert [m.content for m in stored] == [f"m{i}" for i in range(10)]
+    ids = [m.id for m in stored]
+    assert ids == sorted(ids)
+    # Two full batches of 4, then the timer flushes the last 2
+    assert len(sessions) == 3
+
+    with sessionmaker(bind=sync_engine)() as db:
+        assert db.query(models.CategoryMessage).count() == 10
+    sync_engine.dispose()
+
+
+def test_failed_batch_raises_to_every_sender(tmp_path):
+    sync_engine, factory, _ = make_factory(tmp_path)
+    queue = MessageWriteQueue(factory, max_batch=2, max_delay=0.01)
+
+    async def run():
+        # sender_persona_id is NOT NULL, so the whole batch fails
+        return await asyncio.gather(
+            queue.submit(models.CategoryMessage(category="gaming", sender_persona_id=None, content="a")),
+            queue.submit(models.CategoryMessage(category="gaming", sender_persona_id=None, content="b")),
+            return_exceptions=True,
+        )
+
+    results = asyncio.run(run())
+    assert all(isinstance(r, Exception) for r in results)
+    sync_engine.dispose()